@@ -45,21 +45,38 @@ function App() {
   const [missionTasks, setMissionTasks] = useState<AgentTask[]>([]);
   const [intelFeed, setIntelFeed] = useState<string[]>(['Satellite link established...']);
 
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null);
+
   const scrollRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLTextAreaElement>(null);
 
+  const toHistoryMessage = (m: any): Message => ({
+    id: `hist-${m.timestamp}-${m.role}`,
+    role: m.role,
+    content: m.content
+  });
+
+  const loadOlderHistory = async () => {
+    if (!historyCursor) return;
+    try {
+      const resp = await fetch(`/api/chat/history?session_id=${sessionId}&before=${encodeURIComponent(historyCursor)}`);
+      const page = await resp.json();
+      setMessages(prev => [...page.messages.map(toHistoryMessage), ...prev]);
+      setHistoryCursor(page.next_cursor);
+    } catch (err) {
+      console.error("Failed to load older history:", err);
+    }
+  };
+
   // Initialize Data
   useEffect(() => {
     const fetchData = async () => {
       try {
-        // 1. Fetch Chat History
+        // 1. Fetch Chat History (newest page; older pages load on demand)
         const histResp = await fetch(`/api/chat/history?session_id=${sessionId}`);
-        const history = await histResp.json();
-        setMessages(history.map((m: any, i: number) => ({
-          id: `hist-${i}`,
-          role: m.role,
-          content: m.content
-        })));
+        const page = await histResp.json();
+        setMessages(page.messages.map(toHistoryMessage));
+        setHistoryCursor(page.next_cursor);
 
         // 2. Fetch Mission History (Tasks)
         const taskResp = await fetch('/api/agents/tasks');
@@ -228,6 +245,9 @@ function App() {
         <main className="central-canvas">
           <div className="canvas-container">
             <div className="message-area" ref={scrollRef}>
+              {historyCursor && (
+                <button className="pill-btn" onClick={loadOlderHistory}>Load earlier messages</button>
+              )}
               {messages.length === 0 && !isLoading && (
                 <div className="canvas-empty">
                   <div className="empty-graphic">P</div>
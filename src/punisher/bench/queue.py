@@ -0,0 +1,350 @@
+"""
+Message bus benchmark suite.
+
+Measures punisher.bus.queue under the load shapes the app produces:
+N producers / M consumers (threads or processes), mixed channels, payloads
+from 100 B to 100 KB, and empty-channel polling. Each scenario reports
+msgs/s, p50/p99 enqueue-to-dequeue latency and DB file growth. Scenarios with
+backend="connect-per-call" run the pre-pooling queue as a baseline.
+
+Run via `punisher bench queue` or tests/test_queue_bench.py.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, UTC
+from pathlib import Path
+
+from punisher.bus.queue import MessageQueue
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    producers: int = 1
+    consumers: int = 1
+    mode: str = "thread"  # "thread" or "process"
+    channels: int = 1
+    payload_size: int = 100
+    messages: int = 2000  # total, split across producers
+    batch: int = 1  # >1 uses push_many / pop_many
+    backend: str = "pooled"  # "pooled" (MessageQueue) or "connect-per-call"
+
+
+SUITE = [
+    Scenario("1p1c-thread-100B"),
+    Scenario("1p1c-connect-per-call-100B", backend="connect-per-call"),
+    Scenario("1p1c-batch-100B", batch=50),
+    Scenario("4p4c-thread-mixed", producers=4, consumers=4, channels=4),
+    Scenario(
+        "4p4c-process-mixed", producers=4, consumers=4, channels=4, mode="process"
+    ),
+    Scenario("1p1c-thread-10KB", payload_size=10_000, messages=1000),
+    Scenario("1p1c-thread-100KB", payload_size=100_000, messages=200),
+]
+
+QUICK_SUITE = [
+    Scenario("1p1c-thread-100B", messages=200),
+    Scenario("1p1c-connect-per-call-100B", messages=200, backend="connect-per-call"),
+    Scenario(
+        "2p2c-process-mixed",
+        producers=2,
+        consumers=2,
+        channels=2,
+        mode="process",
+        messages=200,
+    ),
+    Scenario("1p1c-thread-100KB", payload_size=100_000, messages=20),
+]
+
+
+class ConnectPerCallQueue:
+    """
+    The pre-pooling queue: a new connection and transaction per call, one
+    SELECT + DELETE per pop. Owns its original schema, so the baseline does not
+    depend on MessageQueue internals.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.paths = [path]
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT DEFAULT 'new',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_channel_status ON queue(channel, status);"
+            )
+
+    def push(self, channel: str, message: str) -> None:
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "INSERT INTO queue (channel, payload, status) VALUES (?, ?, 'new')",
+                (channel, message),
+            )
+
+    def push_many(self, channel: str, messages: list[str]) -> None:
+        for message in messages:
+            self.push(channel, message)
+
+    def try_pop(self, channel: str) -> str | None:
+        with sqlite3.connect(self.path) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id, payload FROM queue WHERE channel = ? AND status = 'new' "
+                    "ORDER BY id ASC LIMIT 1",
+                    (channel,),
+                ).fetchone()
+                if row:
+                    conn.execute("DELETE FROM queue WHERE id = ?", (row[0],))
+                    conn.commit()
+                    return row[1]
+                conn.rollback()
+            except sqlite3.OperationalError:
+                conn.rollback()
+        return None
+
+    def try_pop_many(self, channel: str, max_n: int) -> list[str]:
+        messages = []
+        while len(messages) < max_n and (message := self.try_pop(channel)):
+            messages.append(message)
+        return messages
+
+    def close(self) -> None:
+        pass
+
+
+def _open(backend: str, path: str):
+    if backend == "connect-per-call":
+        return ConnectPerCallQueue(path)
+    return MessageQueue(path)
+
+
+def _db_size(paths: list[str]) -> int:
+    files = [f for path in paths for f in (path, f"{path}-wal")]
+    return sum(os.path.getsize(f) for f in files if os.path.exists(f))
+
+
+def _make_payload(size: int) -> str:
+    # "<enqueue ns>|" prefix carries the timestamp for latency measurement
+    stamp = f"{time.time_ns()}|"
+    return stamp + "x" * max(0, size - len(stamp))
+
+
+def _produce(
+    backend: str,
+    path: str,
+    channels: list[str],
+    count: int,
+    size: int,
+    batch: int,
+    ready,
+):
+    q = _open(backend, path)
+    ready.wait()
+    sent = 0
+    while sent < count:
+        n = min(batch, count - sent)
+        channel = channels[sent % len(channels)]
+        if batch > 1:
+            q.push_many(channel, [_make_payload(size) for _ in range(n)])
+        else:
+            q.push(channel, _make_payload(size))
+        sent += n
+    q.close()
+
+
+def _consume(
+    backend: str,
+    path: str,
+    channels: list[str],
+    total: int,
+    consumed,
+    batch: int,
+    out,
+    ready,
+):
+    """Pop until the shared consumed counter reaches total; report latencies via out."""
+    q = _open(backend, path)
+    ready.wait()
+    latencies = []
+    i = 0
+    while consumed.value < total:
+        channel = channels[i % len(channels)]
+        i += 1
+        msgs = q.try_pop_many(channel, batch) if batch > 1 else [q.try_pop(channel)]
+        msgs = [m for m in msgs if m is not None]
+        if not msgs:
+            time.sleep(0.0005)
+            continue
+        now = time.time_ns()
+        for m in msgs:
+            latencies.append((now - int(m.split("|", 1)[0])) / 1e6)
+        with consumed.get_lock():
+            consumed.value += len(msgs)
+    q.close()
+    out.put(latencies)
+
+
+class _ThreadCounter:
+    """Minimal stand-in for multiprocessing.Value with the same get_lock() API."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def get_lock(self):
+        return self._lock
+
+
+class _ListQueue(list):
+    put = list.append
+
+
+def run_scenario(scenario: Scenario, path: str) -> dict:
+    channels = [f"bench:{i}" for i in range(scenario.channels)]
+    per_producer = scenario.messages // scenario.producers
+    total = per_producer * scenario.producers
+
+    # Create the schema (on every shard) before measuring growth
+    probe = _open(scenario.backend, path)
+    paths = probe.paths
+    probe.close()
+    size_before = _db_size(paths)
+
+    # Workers block on the barrier after setup so spawn/connect time is not measured
+    parties = scenario.producers + scenario.consumers + 1
+    if scenario.mode == "process":
+        ctx = multiprocessing.get_context("spawn")
+        consumed = ctx.Value("q", 0)
+        out = ctx.Queue()
+        ready = ctx.Barrier(parties)
+        worker = ctx.Process
+    else:
+        consumed = _ThreadCounter()
+        out = _ListQueue()
+        ready = threading.Barrier(parties)
+        worker = threading.Thread
+
+    consumers = [
+        worker(
+            target=_consume,
+            args=(
+                scenario.backend,
+                path,
+                channels[i :: scenario.consumers] or channels,
+                total,
+                consumed,
+                scenario.batch,
+                out,
+                ready,
+            ),
+        )
+        for i in range(scenario.consumers)
+    ]
+    producers = [
+        worker(
+            target=_produce,
+            args=(
+                scenario.backend,
+                path,
+                channels,
+                per_producer,
+                scenario.payload_size,
+                scenario.batch,
+                ready,
+            ),
+        )
+        for _ in range(scenario.producers)
+    ]
+
+    for w in consumers + producers:
+        w.start()
+    ready.wait()
+    start = time.perf_counter()
+
+    if scenario.mode == "process":
+        latencies = []
+        for _ in consumers:
+            latencies.extend(out.get())
+    for w in consumers + producers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    if scenario.mode != "process":
+        latencies = [lat for chunk in out for lat in chunk]
+
+    latencies.sort()
+    return {
+        **asdict(scenario),
+        "delivered": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "msgs_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3)
+        if latencies
+        else None,
+        "db_growth_bytes": _db_size(paths) - size_before,
+    }
+
+
+def run_empty_poll(path: str, polls: int = 5000, backend: str = "pooled") -> dict:
+    """Cost of polling a channel with nothing in it (the idle steady state)."""
+    q = _open(backend, path)
+    start = time.perf_counter()
+    for _ in range(polls):
+        q.try_pop("bench:empty")
+    elapsed = time.perf_counter() - start
+    q.close()
+    return {
+        "name": "empty-poll" if backend == "pooled" else f"empty-poll-{backend}",
+        "backend": backend,
+        "polls": polls,
+        "polls_per_s": round(polls / elapsed, 1),
+        "us_per_poll": round(elapsed / polls * 1e6, 2),
+    }
+
+
+def run_suite(quick: bool = False, workdir: str | None = None) -> dict:
+    scenarios = QUICK_SUITE if quick else SUITE
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        results = [run_scenario(s, str(Path(tmp) / f"{s.name}.db")) for s in scenarios]
+        for backend in ("pooled", "connect-per-call"):
+            results.append(
+                run_empty_poll(
+                    str(Path(tmp) / f"empty-{backend}.db"),
+                    500 if quick else 5000,
+                    backend,
+                )
+            )
+
+    return {
+        "suite": "queue",
+        "quick": quick,
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def write_results(report: dict, path: str) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,101 @@
+"""
+Wallet snapshot hashing micro-benchmark.
+
+Compares the per-snapshot cost of the original str()-based state hash with
+hyperliquid_parser.snapshot_fingerprint, over wallets of increasing size.
+
+Run via `punisher bench hash` or tests/test_snapshot_bench.py.
+"""
+
+import platform
+import random
+import time
+from datetime import datetime, UTC
+
+from punisher.crypto.hyperliquid_parser import snapshot_fingerprint
+
+# (positions, orders) per synthetic wallet
+SIZES = [(0, 0), (3, 5), (10, 25), (40, 100)]
+
+
+def legacy_state_hash(summary: dict, positions: list, orders: list) -> str:
+    """The str()-based hash save_wallet_snapshot used before fingerprints."""
+    p_sorted = sorted(positions, key=lambda x: x.get("coin"))
+    o_sorted = sorted(orders, key=lambda x: x.get("order_id", x.get("oid", "")))
+    state = {
+        "account_value": summary.get("account_value"),
+        "total_ntl_pos": summary.get("total_ntl_pos"),
+        "positions_hash": str(p_sorted),
+        "orders_hash": str(o_sorted),
+    }
+    return str(state)
+
+
+def make_snapshot(n_positions: int, n_orders: int, seed: int = 0) -> dict:
+    """A parsed snapshot shaped like parse_hyperliquid_data output."""
+    rng = random.Random(seed)
+    positions = [
+        {
+            "coin": f"COIN{i}",
+            "size": rng.uniform(-50, 50),
+            "entry_price": rng.uniform(0.1, 100_000),
+            "position_value": rng.uniform(0, 1e6),
+            "unrealized_pnl": rng.uniform(-1e4, 1e4),
+            "roc": rng.uniform(-1, 1),
+            "leverage": rng.randint(1, 50),
+        }
+        for i in range(n_positions)
+    ]
+    orders = [
+        {
+            "order_id": rng.randint(1, 10**11),
+            "coin": f"COIN{rng.randrange(max(n_positions, 1))}",
+            "side": rng.choice("AB"),
+            "px": rng.uniform(0.1, 100_000),
+            "sz": rng.uniform(0, 100),
+            "order_type": "Limit",
+        }
+        for _ in range(n_orders)
+    ]
+    summary = {
+        "account_value": rng.uniform(0, 1e7),
+        "total_ntl_pos": rng.uniform(0, 1e7),
+    }
+    return {"summary": summary, "positions": positions, "orders": orders}
+
+
+def _time_per_call(fn, args: tuple, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_suite(quick: bool = False) -> dict:
+    iterations = 200 if quick else 5000
+    results = []
+    for n_positions, n_orders in SIZES:
+        snap = make_snapshot(n_positions, n_orders)
+        args = (snap["summary"], snap["positions"], snap["orders"])
+        legacy_us = _time_per_call(legacy_state_hash, args, iterations)
+        fingerprint_us = _time_per_call(snapshot_fingerprint, args, iterations)
+        results.append(
+            {
+                "name": f"{n_positions}pos-{n_orders}ord",
+                "positions": n_positions,
+                "orders": n_orders,
+                "legacy_us": round(legacy_us, 2),
+                "fingerprint_us": round(fingerprint_us, 2),
+                "legacy_bytes": len(legacy_state_hash(*args)),
+                "fingerprint_bytes": len(snapshot_fingerprint(*args)),
+            }
+        )
+
+    return {
+        "suite": "snapshot-hash",
+        "quick": quick,
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
@@ -0,0 +1,224 @@
+"""
+asyncio client for the SQLite message bus.
+
+All SQLite I/O runs on one dedicated thread, so coroutines never block the
+event loop. Waiters are woken instead of sleeping between polls:
+- in-process producers (any MessageQueue on the same DB file) wake them
+  immediately through the queue's listener hook
+- other processes are noticed through `PRAGMA data_version`, which changes
+  whenever another connection commits to the file (polled on every shard)
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from punisher.bus.queue import (
+    PRIORITY_NORMAL,
+    MessageQueue,
+    add_listener,
+    remove_listener,
+)
+
+logger = logging.getLogger("punisher.bus.async_queue")
+
+
+class AsyncMessageQueue:
+    """
+    Awaitable push/pop/subscribe over MessageQueue.
+
+    Timeouts: 0 is non-blocking, None waits forever, anything else is seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = "data/queue.db",
+        queue: MessageQueue | None = None,
+        watch_interval: float = 0.005,
+    ):
+        self.queue = queue or MessageQueue(path)
+        self.path = self.queue.path
+        self.watch_interval = watch_interval
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="punisher-bus"
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._signals: dict[str, asyncio.Event] = {}
+        self._watcher: threading.Thread | None = None
+        self._closed = threading.Event()
+
+        add_listener(self.path, self._on_commit)
+
+    # --- Wakeups ---
+
+    def _bind_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        if self._watcher is None:
+            self._watcher = threading.Thread(
+                target=self._watch_data_version,
+                name="punisher-bus-watch",
+                daemon=True,
+            )
+            self._watcher.start()
+
+    def _signal(self, channel: str) -> asyncio.Event:
+        # One event per generation: it is set once and replaced, never cleared,
+        # so a waiter that grabbed it before checking the DB cannot miss a wakeup
+        event = self._signals.get(channel)
+        if event is None:
+            event = self._signals[channel] = asyncio.Event()
+        return event
+
+    def _wake(self, channel: str | None):
+        channels = [channel] if channel is not None else list(self._signals)
+        for name in channels:
+            event = self._signals.pop(name, None)
+            if event is not None:
+                event.set()
+
+    def _on_commit(self, channel: str):
+        # Called on whichever thread committed the write
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake, channel)
+
+    def _watch_data_version(self):
+        """Wake every waiter when another process commits to any shard file."""
+        conns = [
+            sqlite3.connect(path, check_same_thread=False) for path in self.queue.paths
+        ]
+        try:
+            last = [c.execute("PRAGMA data_version").fetchone()[0] for c in conns]
+            while not self._closed.wait(self.watch_interval):
+                changed = False
+                for i, conn in enumerate(conns):
+                    try:
+                        version = conn.execute("PRAGMA data_version").fetchone()[0]
+                    except sqlite3.OperationalError:
+                        continue
+                    if version != last[i]:
+                        last[i] = version
+                        changed = True
+                if changed:
+                    self._on_foreign_commit()
+        finally:
+            for conn in conns:
+                conn.close()
+
+    def _on_foreign_commit(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake, None)
+
+    async def wait(self, channels: list[str], timeout: float | None = None) -> bool:
+        """Wait until any of the channels may have new data. False on timeout."""
+        self._bind_loop()
+        waiters = [asyncio.ensure_future(self._signal(c).wait()) for c in channels]
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            return bool(done)
+        finally:
+            for w in waiters:
+                w.cancel()
+
+    # --- I/O ---
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def _blocking(self, channel: str, timeout: float | None, read, empty):
+        self._bind_loop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signal = self._signal(channel)
+            result = await self._run(read)
+            if result != empty or timeout == 0:
+                return result
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return empty
+            try:
+                await asyncio.wait_for(signal.wait(), remaining)
+            except asyncio.TimeoutError:
+                return empty
+
+    async def push(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._run(self.queue.push, channel, message, priority)
+
+    async def push_many(
+        self,
+        channel: str,
+        messages: list[dict | str],
+        priority: int = PRIORITY_NORMAL,
+    ) -> None:
+        await self._run(self.queue.push_many, channel, messages, priority)
+
+    async def publish(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._run(self.queue.publish, channel, message, priority)
+
+    async def publish_many(
+        self,
+        channel: str,
+        messages: list[dict | str],
+        priority: int = PRIORITY_NORMAL,
+    ) -> None:
+        await self._run(self.queue.publish_many, channel, messages, priority)
+
+    async def pop(
+        self, channel: str, timeout: float | None = None, decode: bool = False
+    ) -> str | dict | None:
+        return await self._blocking(
+            channel, timeout, partial(self.queue.try_pop, channel, decode), None
+        )
+
+    async def pop_many(
+        self,
+        channel: str,
+        max_n: int = 100,
+        timeout: float | None = None,
+        decode: bool = False,
+    ) -> list[str | dict]:
+        return await self._blocking(
+            channel,
+            timeout,
+            partial(self.queue.try_pop_many, channel, max_n, decode),
+            [],
+        )
+
+    async def subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        timeout: float | None = None,
+        start: str = "latest",
+        decode: bool = False,
+    ) -> list[str | dict]:
+        return await self._blocking(
+            channel,
+            timeout,
+            partial(self.queue.try_subscribe, channel, consumer, max_n, start, decode),
+            [],
+        )
+
+    async def unsubscribe(self, channel: str, consumer: str) -> None:
+        await self._run(self.queue.unsubscribe, channel, consumer)
+
+    def close(self):
+        remove_listener(self.path, self._on_commit)
+        self._closed.set()
+        self._executor.shutdown(wait=False)
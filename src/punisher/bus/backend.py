@@ -0,0 +1,27 @@
+"""
+Message bus backend selection.
+
+QUEUE_BACKEND=sqlite (default) gives every process its own MessageQueue on the
+shared SQLite file. QUEUE_BACKEND=broker talks to a `punisher broker` process
+over QUEUE_BROKER_SOCKET instead. Both expose the same API, so callers only
+ask for "a queue".
+"""
+
+from punisher.bus.async_queue import AsyncMessageQueue
+from punisher.bus.broker import AsyncBrokerClient, BrokerClient
+from punisher.bus.queue import MessageQueue
+from punisher.config import settings
+
+
+def get_queue(path: str = "data/queue.db") -> MessageQueue | BrokerClient:
+    if settings.QUEUE_BACKEND == "broker":
+        return BrokerClient(str(settings.QUEUE_BROKER_SOCKET))
+    return MessageQueue(path)
+
+
+def get_async_queue(
+    path: str = "data/queue.db",
+) -> AsyncMessageQueue | AsyncBrokerClient:
+    if settings.QUEUE_BACKEND == "broker":
+        return AsyncBrokerClient(str(settings.QUEUE_BROKER_SOCKET))
+    return AsyncMessageQueue(path)
@@ -0,0 +1,665 @@
+"""
+Unix socket broker for the message bus.
+
+`punisher broker` keeps queues and topics in memory and answers a parked
+pop/subscribe the moment a message arrives, instead of on the next poll.
+With write-through enabled, every push/publish is committed to the SQLite bus
+before it is acknowledged and deliveries delete their rows, so undelivered
+messages and retained topic history are reloaded when the broker restarts.
+Topic cursors live in memory only.
+
+Wire protocol: one JSON object per line in each direction.
+    request:  {"id": 1, "op": "pop", "args": {"channel": "...", "timeout": 1}}
+    response: {"id": 1, "result": [...]}  or  {"id": 1, "error": "..."}
+Requests on one connection run concurrently, so a parked pop does not hold
+up other calls multiplexed on the same socket.
+
+Clients: BrokerClient (blocking, same API as MessageQueue) and
+AsyncBrokerClient (same API as AsyncMessageQueue).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+
+from punisher.bus.codec import json_dumps, json_loads
+from punisher.bus.queue import (
+    DEFAULT_RETENTION,
+    LANES,
+    PRIORITY_NORMAL,
+    MessageQueue,
+    QueueCompactor,
+    RetentionPolicy,
+)
+
+logger = logging.getLogger("punisher.bus.broker")
+
+# Lines carry whole payloads (LLM answers, tool output): allow large ones
+_LINE_LIMIT = 64 * 1024 * 1024
+
+
+def _text(message, decode: bool):
+    if decode or isinstance(message, str):
+        return message
+    return json.dumps(message)
+
+
+class QueueBroker:
+    """
+    In-memory queues and topics served over a Unix socket.
+
+    store: optional MessageQueue to write through to for durability.
+    retention: per-channel policies, by default the store's (QUEUE_RETENTION).
+    max_count caps each lane of a channel/topic in memory, dropping the oldest
+    entries beyond it; channels without a policy are never trimmed.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = "data/bus.sock",
+        store: MessageQueue | None = None,
+        fair_share: int = 5,
+        retention: dict[str, RetentionPolicy] | None = None,
+        housekeeping_interval: float = 300.0,
+    ):
+        self.socket_path = socket_path
+        self.store = store
+        self.fair_share = fair_share
+        if retention is None:
+            retention = store.retention if store else RetentionPolicy.from_settings()
+        self.retention = retention
+        self.housekeeping_interval = housekeeping_interval
+
+        # channel -> lane -> deque[(seq, message)], seq ascending
+        self._queues: dict[str, dict[int, deque]] = {}
+        self._topics: dict[str, dict[int, deque]] = {}
+        self._cursors: dict[tuple[str, str], dict[int, int]] = {}
+        self._cursor_seen: dict[tuple[str, str], float] = {}
+        self._pop_counts: dict[str, int] = {}
+        self._signals: dict[str, asyncio.Event] = {}
+        self._seq = itertools.count(1)
+
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="punisher-broker")
+            if store
+            else None
+        )
+        self._compactor = QueueCompactor(store) if store else None
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: set[asyncio.StreamWriter] = set()
+
+    # --- State ---
+
+    def _load(self):
+        """Rebuild memory from the write-through store."""
+        count = 0
+        for channel, id_, priority, message in self.store.pending():
+            self._lane(self._queues, channel, priority).append((id_, message))
+            count += 1
+        for topic, id_, priority, message in self.store.topic_backlog():
+            self._lane(self._topics, topic, priority).append((id_, message))
+        logger.info(
+            f"Broker loaded {count} undelivered messages from {self.store.path}"
+        )
+
+    def _lane(self, table: dict, channel: str, priority: int) -> deque:
+        lanes = table.setdefault(channel, {})
+        lane = lanes.get(priority)
+        if lane is None:
+            lane = lanes[priority] = deque()
+        return lane
+
+    def _signal(self, channel: str) -> asyncio.Event:
+        # Same generation scheme as AsyncMessageQueue: set once, then replaced
+        event = self._signals.get(channel)
+        if event is None:
+            event = self._signals[channel] = asyncio.Event()
+        return event
+
+    def _wake(self, channel: str):
+        event = self._signals.pop(channel, None)
+        if event is not None:
+            event.set()
+
+    async def _write(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(fn, *args)
+        )
+
+    def _ack(self, channel: str, ids: list[int]):
+        # Fire-and-forget: a crash before this lands redelivers, never loses
+        future = self._executor.submit(self.store.ack, channel, ids)
+        future.add_done_callback(
+            lambda f: (
+                f.exception() and logger.error(f"Broker ack failed: {f.exception()}")
+            )
+        )
+
+    async def _append(self, table: dict, channel: str, messages: list, priority: int):
+        if not messages:
+            return
+        if self.store is not None:
+            write = (
+                self.store.push_many
+                if table is self._queues
+                else self.store.publish_many
+            )
+            ids = await self._write(write, channel, messages, priority)
+        else:
+            ids = [next(self._seq) for _ in messages]
+
+        lane = self._lane(table, channel, priority)
+        lane.extend(zip(ids, messages))
+        max_depth = self.retention.get(channel, DEFAULT_RETENTION).max_count
+        excess = 0 if max_depth is None else len(lane) - max_depth
+        dropped = [lane.popleft()[0] for _ in range(excess)]
+        if dropped and table is self._queues:
+            logger.warning(f"Broker dropped {len(dropped)} undelivered on {channel}")
+            if self.store is not None:
+                self._ack(channel, dropped)
+        self._wake(channel)
+
+    def _fifo_slots(self, channel: str, max_n: int) -> int:
+        calls = self._pop_counts.get(channel, 0) + 1
+        self._pop_counts[channel] = calls % self.fair_share
+        slots = max_n // self.fair_share
+        if slots == 0 and calls >= self.fair_share:
+            slots = 1
+        return slots
+
+    def _take(self, channel: str, max_n: int) -> list:
+        """Same selection as MessageQueue.try_pop_many, served from memory."""
+        lanes = self._queues.get(channel)
+        if not lanes or not any(lanes.values()):
+            return []
+        fifo = self._fifo_slots(channel, max_n)
+
+        taken = []
+        budget = max_n - fifo
+        for priority in sorted(lanes):
+            lane = lanes[priority]
+            while lane and budget:
+                taken.append((priority, *lane.popleft()))
+                budget -= 1
+        for _ in range(fifo):
+            heads = [(lane[0][0], p) for p, lane in lanes.items() if lane]
+            if not heads:
+                break
+            _, priority = min(heads)
+            taken.append((priority, *lanes[priority].popleft()))
+
+        taken.sort(key=itemgetter(0, 1))
+        if self.store is not None:
+            self._ack(channel, [seq for _, seq, _ in taken])
+        return [message for _, _, message in taken]
+
+    def _read(self, channel: str, consumer: str, max_n: int, start: str) -> list:
+        """Same lane scheduling as MessageQueue.try_subscribe, served from memory."""
+        lanes = self._topics.get(channel, {})
+        key = (channel, consumer)
+        cursors = self._cursors.get(key)
+        if cursors is None:
+            tail = 0
+            if start != "earliest":
+                tail = max((lane[-1][0] for lane in lanes.values() if lane), default=0)
+            cursors = self._cursors[key] = {lane: tail for lane in LANES}
+        self._cursor_seen[key] = time.time()
+
+        def read(priority, limit):
+            entries = lanes.get(priority)
+            if not entries or limit <= 0:
+                return []
+            i = bisect_right(entries, cursors.get(priority, 0), key=itemgetter(0))
+            rows = list(islice(entries, i, i + limit))
+            if rows:
+                cursors[priority] = rows[-1][0]
+            return rows
+
+        reserve = max_n // self.fair_share if max_n > 1 else 0
+        batches = {LANES[0]: read(LANES[0], max_n - reserve)}
+        budget = max_n - len(batches[LANES[0]])
+        for priority in LANES[1:]:
+            batches[priority] = read(priority, budget)
+            budget -= len(batches[priority])
+        batches[LANES[0]] += read(LANES[0], budget)
+        return [message for lane in LANES for _, message in batches[lane]]
+
+    async def _blocking(self, channel: str, timeout: float | None, read):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            event = self._signal(channel)
+            result = read()
+            if result or timeout == 0:
+                return result
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return result
+
+    # --- Operations ---
+
+    async def _op_ping(self):
+        return "pong"
+
+    async def _op_push(self, channel, messages, priority=PRIORITY_NORMAL):
+        await self._append(self._queues, channel, messages, priority)
+
+    async def _op_publish(self, channel, messages, priority=PRIORITY_NORMAL):
+        await self._append(self._topics, channel, messages, priority)
+
+    async def _op_pop(self, channel, max_n=1, timeout=0):
+        return await self._blocking(
+            channel, timeout, partial(self._take, channel, max_n)
+        )
+
+    async def _op_subscribe(
+        self, channel, consumer, max_n=100, timeout=0, start="latest"
+    ):
+        return await self._blocking(
+            channel, timeout, partial(self._read, channel, consumer, max_n, start)
+        )
+
+    async def _op_unsubscribe(self, channel, consumer):
+        self._cursors.pop((channel, consumer), None)
+        self._cursor_seen.pop((channel, consumer), None)
+
+    async def _op_wait(self, channels, timeout=None):
+        waiters = [asyncio.ensure_future(self._signal(c).wait()) for c in channels]
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            return bool(done)
+        finally:
+            for w in waiters:
+                w.cancel()
+
+    # --- Server ---
+
+    async def _handle(self, reader, writer):
+        tasks: dict = {}
+        self._clients.add(writer)
+
+        async def dispatch(request):
+            rid = request.get("id")
+            try:
+                handler = getattr(self, f"_op_{request['op']}")
+                response = {
+                    "id": rid,
+                    "result": await handler(**request.get("args", {})),
+                }
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.error(f"Broker op {request.get('op')} failed: {e}")
+                response = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                tasks.pop(rid, None)
+            writer.write(json_dumps(response) + b"\n")
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                request = json_loads(line)
+                if request.get("op") == "cancel":
+                    task = tasks.get(request.get("args", {}).get("request"))
+                    if task is not None:
+                        task.cancel()
+                    continue
+                tasks[request.get("id")] = asyncio.create_task(dispatch(request))
+        except (ConnectionError, ValueError) as e:
+            logger.debug(f"Broker client dropped: {e}")
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _housekeeping(self):
+        while True:
+            await asyncio.sleep(self.housekeeping_interval)
+            now = time.time()
+            # Cursors idle for longer than their topic's max_age belong to dead consumers
+            for key, seen in list(self._cursor_seen.items()):
+                max_age = self.retention.get(key[0], DEFAULT_RETENTION).max_age
+                if max_age is not None and seen < now - max_age:
+                    self._cursors.pop(key, None)
+                    self._cursor_seen.pop(key, None)
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(
+                    f"A broker is already listening on {self.socket_path}"
+                )
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)  # stale socket from a dead broker
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+
+        if self.store is not None:
+            self._load()
+            self._compactor.start()
+
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=self.socket_path, limit=_LINE_LIMIT
+        )
+        os.chmod(self.socket_path, 0o600)  # local user only
+        logger.info(f"Broker listening on {self.socket_path}")
+        housekeeping = asyncio.create_task(self._housekeeping())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            housekeeping.cancel()
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        if self._compactor is not None:
+            self._compactor.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def run_broker(socket_path: str, db_path: str | None = None):
+    """Run a broker until interrupted; db_path enables SQLite write-through."""
+    store = MessageQueue(db_path) if db_path else None
+    broker = QueueBroker(socket_path, store=store)
+    try:
+        asyncio.run(broker.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class BrokerClient:
+    """
+    Blocking client with the same API as MessageQueue. One socket per thread
+    (re-opened after a fork); reconnects once if the broker restarted before
+    a request was sent. A connection lost after that raises ConnectionError:
+    the broker may already have applied the request, and resending it would
+    duplicate a push or lose the batch a pop already took.
+    """
+
+    def __init__(self, socket_path: str = "data/bus.sock"):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _file(self):
+        f = getattr(self._local, "file", None)
+        if f is None or self._local.pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            f = self._local.file = sock.makefile("rwb")
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return f
+
+    def _call(self, op: str, **args):
+        request = json_dumps({"id": next(self._ids), "op": op, "args": args}) + b"\n"
+        for attempt in (0, 1):
+            try:
+                f = self._file()
+                f.write(request)
+                f.flush()
+                break
+            except ConnectionError:
+                # Stale socket: the request never reached the broker
+                self.close()
+                if attempt:
+                    raise
+        try:
+            line = f.readline()
+        except ConnectionError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("broker closed the connection")
+        response = json_loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Broker error: {response['error']}")
+        return response["result"]
+
+    def push(self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL):
+        self._call("push", channel=channel, messages=[message], priority=priority)
+
+    def push_many(
+        self, channel: str, messages: list[dict | str], priority: int = PRIORITY_NORMAL
+    ):
+        self._call("push", channel=channel, messages=messages, priority=priority)
+
+    def publish(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ):
+        self._call("publish", channel=channel, messages=[message], priority=priority)
+
+    def publish_many(
+        self, channel: str, messages: list[dict | str], priority: int = PRIORITY_NORMAL
+    ):
+        self._call("publish", channel=channel, messages=messages, priority=priority)
+
+    def pop_many(
+        self, channel: str, max_n: int = 100, timeout: int = 0, decode: bool = False
+    ) -> list[str | dict]:
+        messages = self._call("pop", channel=channel, max_n=max_n, timeout=timeout)
+        return [_text(m, decode) for m in messages]
+
+    def pop(self, channel: str, timeout: int = 0, decode: bool = False):
+        messages = self.pop_many(channel, 1, timeout, decode)
+        return messages[0] if messages else None
+
+    def try_pop_many(self, channel: str, max_n: int, decode: bool = False):
+        return self.pop_many(channel, max_n, 0, decode)
+
+    def try_pop(self, channel: str, decode: bool = False):
+        return self.pop(channel, 0, decode)
+
+    def subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        timeout: int = 0,
+        start: str = "latest",
+        decode: bool = False,
+    ) -> list[str | dict]:
+        messages = self._call(
+            "subscribe",
+            channel=channel,
+            consumer=consumer,
+            max_n=max_n,
+            timeout=timeout,
+            start=start,
+        )
+        return [_text(m, decode) for m in messages]
+
+    def try_subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        start: str = "latest",
+        decode: bool = False,
+    ):
+        return self.subscribe(channel, consumer, max_n, 0, start, decode)
+
+    def unsubscribe(self, channel: str, consumer: str) -> None:
+        self._call("unsubscribe", channel=channel, consumer=consumer)
+
+    def close(self) -> None:
+        """Close the calling thread's socket."""
+        f = getattr(self._local, "file", None)
+        if f is not None:
+            try:
+                f.close()
+                self._local.sock.close()
+            except OSError:
+                pass
+            self._local.file = None
+
+
+class AsyncBrokerClient:
+    """
+    asyncio client with the same API as AsyncMessageQueue. Calls are
+    multiplexed over one connection; timeouts: 0 is non-blocking, None waits
+    forever. A cancelled call is withdrawn on the broker too.
+    """
+
+    def __init__(self, socket_path: str = "data/bus.sock"):
+        self.socket_path = socket_path
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connecting: asyncio.Lock | None = None
+
+    async def _connect(self):
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                self.socket_path, limit=_LINE_LIMIT
+            )
+            self._reader_task = asyncio.create_task(self._read_loop(self._reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        try:
+            while line := await reader.readline():
+                response = json_loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(
+                        RuntimeError(f"Broker error: {response['error']}")
+                    )
+                else:
+                    future.set_result(response["result"])
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Broker connection lost: {e}")
+        finally:
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("broker connection lost"))
+            self._pending.clear()
+
+    async def _call(self, op: str, **args):
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+        rid = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[rid] = future
+        writer = self._writer
+        writer.write(json_dumps({"id": rid, "op": op, "args": args}) + b"\n")
+        try:
+            await writer.drain()
+            return await future
+        except asyncio.CancelledError:
+            self._pending.pop(rid, None)
+            if not writer.is_closing():
+                writer.write(
+                    json_dumps({"op": "cancel", "args": {"request": rid}}) + b"\n"
+                )
+            raise
+
+    async def wait(self, channels: list[str], timeout: float | None = None) -> bool:
+        """Wait until any of the channels may have new data. False on timeout."""
+        return await self._call("wait", channels=channels, timeout=timeout)
+
+    async def push(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._call("push", channel=channel, messages=[message], priority=priority)
+
+    async def push_many(
+        self, channel: str, messages: list[dict | str], priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._call("push", channel=channel, messages=messages, priority=priority)
+
+    async def publish(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._call(
+            "publish", channel=channel, messages=[message], priority=priority
+        )
+
+    async def publish_many(
+        self, channel: str, messages: list[dict | str], priority: int = PRIORITY_NORMAL
+    ) -> None:
+        await self._call(
+            "publish", channel=channel, messages=messages, priority=priority
+        )
+
+    async def pop(
+        self, channel: str, timeout: float | None = None, decode: bool = False
+    ) -> str | dict | None:
+        messages = await self.pop_many(channel, 1, timeout, decode)
+        return messages[0] if messages else None
+
+    async def pop_many(
+        self,
+        channel: str,
+        max_n: int = 100,
+        timeout: float | None = None,
+        decode: bool = False,
+    ) -> list[str | dict]:
+        messages = await self._call(
+            "pop", channel=channel, max_n=max_n, timeout=timeout
+        )
+        return [_text(m, decode) for m in messages]
+
+    async def subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        timeout: float | None = None,
+        start: str = "latest",
+        decode: bool = False,
+    ) -> list[str | dict]:
+        messages = await self._call(
+            "subscribe",
+            channel=channel,
+            consumer=consumer,
+            max_n=max_n,
+            timeout=timeout,
+            start=start,
+        )
+        return [_text(m, decode) for m in messages]
+
+    async def unsubscribe(self, channel: str, consumer: str) -> None:
+        await self._call("unsubscribe", channel=channel, consumer=consumer)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
@@ -0,0 +1,168 @@
+"""
+Payload codecs for the SQLite message bus.
+
+Every row carries a format tag next to its payload so readers can decode rows
+written by any codec configuration, including rows written before codecs
+existed (tag NULL: the payload is the text that was pushed).
+
+Tag layout: the low nibble is the serialization, the high nibble the
+compression applied on top of it.
+
+Optional dependencies, used when installed:
+- orjson: faster JSON encode/decode (falls back to the json module)
+- msgpack: binary serialization for dict payloads
+- zstandard: compression (falls back to zlib)
+"""
+
+import json
+import logging
+import zlib
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+logger = logging.getLogger("punisher.bus.codec")
+
+# Serialization (low nibble)
+FMT_TEXT = 0x00  # str message, stored as-is (or compressed UTF-8)
+FMT_JSON = 0x01  # dict message, JSON bytes
+FMT_MSGPACK = 0x02  # dict message, msgpack bytes
+
+# Compression (high nibble)
+COMP_ZLIB = 0x10
+COMP_ZSTD = 0x20
+
+_SERIAL_MASK = 0x0F
+_COMP_MASK = 0xF0
+
+
+def json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec:
+    """
+    Encodes bus messages into (payload, format tag) pairs and back.
+
+    serializer: "json" or "msgpack" for dict messages. str messages are always
+    stored as text so producers and consumers that exchange plain strings see
+    no difference.
+    compress_threshold: payloads at least this many bytes are compressed with
+    zstd (zlib if zstandard is not installed). None disables compression.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "json",
+        compress_threshold: int | None = 4096,
+        level: int = 3,
+    ):
+        if serializer == "msgpack" and msgpack is None:
+            logger.warning("msgpack not installed, falling back to JSON payloads")
+            serializer = "json"
+        if serializer not in ("json", "msgpack"):
+            raise ValueError(f"Unknown serializer: {serializer}")
+        self.serializer = serializer
+        self.compress_threshold = compress_threshold
+        self.level = level
+        self._zstd_c = zstandard.ZstdCompressor(level=level) if zstandard else None
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard else None
+
+    # --- Encode ---
+
+    def encode(self, message: dict | str) -> tuple[str | bytes, int | None]:
+        if not isinstance(message, (dict, str)):
+            return message, None  # stored untouched, as before codecs
+        if isinstance(message, str):
+            if (
+                self.compress_threshold is None
+                or len(message) < self.compress_threshold
+            ):
+                return message, FMT_TEXT
+            return self._compress(message.encode(), FMT_TEXT)
+
+        if self.serializer == "msgpack":
+            data, fmt = msgpack.packb(message, use_bin_type=True), FMT_MSGPACK
+        else:
+            data, fmt = json_dumps(message), FMT_JSON
+        if self.compress_threshold is None or len(data) < self.compress_threshold:
+            return data, fmt
+        return self._compress(data, fmt)
+
+    def _compress(self, data: bytes, fmt: int) -> tuple[bytes, int]:
+        if self._zstd_c is not None:
+            packed, comp = self._zstd_c.compress(data), COMP_ZSTD
+        else:
+            packed, comp = zlib.compress(data, self.level), COMP_ZLIB
+        if len(packed) >= len(data):
+            # Incompressible: not worth paying for decompression on every read
+            return (data.decode() if fmt == FMT_TEXT else data), fmt
+        return packed, fmt | comp
+
+    # --- Decode ---
+
+    def _decompress(self, payload: str | bytes, fmt: int) -> str | bytes:
+        comp = fmt & _COMP_MASK
+        if comp == COMP_ZSTD:
+            if self._zstd_d is None:
+                raise RuntimeError("zstandard is required to read this message")
+            return self._zstd_d.decompress(payload)
+        if comp == COMP_ZLIB:
+            return zlib.decompress(payload)
+        return payload
+
+    def decode(self, payload: str | bytes, fmt: int | None) -> dict | str:
+        """Return the message as it was pushed: a dict or a str."""
+        if fmt is None:
+            # Legacy row: dicts were stored as json.dumps text, str as is
+            try:
+                message = json_loads(payload)
+            except ValueError:
+                return payload
+            return message if isinstance(message, dict) else payload
+        data = self._decompress(payload, fmt)
+        serial = fmt & _SERIAL_MASK
+        if serial == FMT_JSON:
+            return json_loads(data)
+        if serial == FMT_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("msgpack is required to read this message")
+            return msgpack.unpackb(data, raw=False)
+        return data.decode() if isinstance(data, bytes) else data
+
+    def decode_text(self, payload: str | bytes, fmt: int | None) -> str:
+        """
+        Return the message as text. dict messages come back in json.dumps
+        formatting, exactly what the bus returned before codecs; consumers that
+        want the dict should read with decode=True and skip both conversions.
+        """
+        if fmt is None:
+            return payload
+        if fmt & _SERIAL_MASK == FMT_TEXT:
+            data = self._decompress(payload, fmt)
+            return data.decode() if isinstance(data, bytes) else data
+        return json.dumps(self.decode(payload, fmt))
+
+
+DEFAULT_CODEC = Codec()
@@ -1,94 +1,757 @@
 import sqlite3
-import json
+import logging
 import os
+import threading
 import time
-from typing import Any, Optional
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from punisher.bus.codec import DEFAULT_CODEC, Codec
+from punisher.bus.sharding import ShardRouter
+from punisher.config import settings
+
+logger = logging.getLogger("punisher.bus.queue")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    How much of a channel to keep. Applies to both work queues (undelivered
+    messages) and topic logs. None disables that limit.
+    """
+
+    max_count: int | None = None
+    max_age: float | None = None  # seconds
+
+    @classmethod
+    def from_settings(cls) -> dict[str, "RetentionPolicy"]:
+        """Per-channel policies from the QUEUE_RETENTION setting."""
+        return {
+            channel: cls(**limits)
+            for channel, limits in settings.QUEUE_RETENTION.items()
+        }
+
+
+# Channels without a policy keep everything: a work queue message waits for
+# its consumer however long that takes
+DEFAULT_RETENTION = RetentionPolicy(None, None)
+
+# Priority lanes, lowest value is served first
+PRIORITY_INTERACTIVE = 0  # user commands and the replies to them
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2  # high-volume telemetry ([POS], [WALLET], [MARKET], ...)
+LANES = (PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK)
+
+# In-process wakeup hooks keyed by absolute DB path. Called with the channel
+# name after every committed push/publish from this process.
+_listeners: dict[str, list[Callable[[str], None]]] = {}
+_listeners_lock = threading.Lock()
+
+
+def add_listener(path: str, callback: Callable[[str], None]) -> None:
+    with _listeners_lock:
+        _listeners.setdefault(os.path.abspath(path), []).append(callback)
+
+
+def remove_listener(path: str, callback: Callable[[str], None]) -> None:
+    with _listeners_lock:
+        callbacks = _listeners.get(os.path.abspath(path), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+def _notify(key: str, channel: str) -> None:
+    for callback in _listeners.get(key, ()):
+        callback(channel)
 
 
 class MessageQueue:
     """
     SQLite-based Message Queue replacing hirlite (rlite) due to Python 3.14 build failures.
-    Implements a similar interface: push, pop, publish (simulated).
+    Implements a similar interface: push, pop, publish, subscribe.
+
+    push/pop are a destructive work queue: each message goes to one consumer.
+    publish/subscribe are fan-out topics: an append-only log per channel where
+    every named consumer keeps its own cursor, reads with an `id > cursor`
+    range scan and never deletes. The log is trimmed by retention limits.
+
+    Connections are opened once per thread (and re-opened after a fork) and kept
+    for the lifetime of the queue, so the hot push/pop path only pays for the
+    statement itself. sqlite3 caches the prepared statements per connection.
+
+    Payloads go through a Codec and are stored with a format tag, so dict
+    messages can be stored as orjson/msgpack and large ones compressed. Reads
+    return text by default (dicts as JSON, as before); pass decode=True to get
+    the dict back without a json.loads round-trip.
+
+    Channels can be spread over several SQLite files (see ShardRouter) so that
+    independent channels get independent writer locks. The router defaults to
+    the QUEUE_SHARDS / QUEUE_SHARD_MAP settings; one shard is the plain file.
     """
 
-    def __init__(self, path: str = "data/queue.db"):
+    # Cheap read-only probe: runs against the WAL snapshot without taking the write lock
+    _PEEK_SQL = "SELECT 1 FROM queue WHERE channel = ? AND status = 'new' LIMIT 1"
+
+    # Atomic batched pop in one statement (requires SQLite >= 3.35): the first
+    # subquery serves by (priority, id), the second reserves slots for the oldest
+    # rows of any priority so bulk lanes keep a fair share
+    _POP_MANY_SQL = """
+        WITH by_priority AS (
+            SELECT id FROM queue
+            WHERE channel = ? AND status = 'new'
+            ORDER BY priority ASC, id ASC LIMIT ?
+        )
+        DELETE FROM queue WHERE id IN (
+            SELECT id FROM by_priority
+            UNION ALL
+            SELECT id FROM (
+                SELECT id FROM queue
+                WHERE channel = ? AND status = 'new'
+                  AND id NOT IN (SELECT id FROM by_priority)
+                ORDER BY id ASC LIMIT ?
+            )
+        )
+        RETURNING priority, id, payload, codec
+    """
+
+    # Trim a topic every N publishes to it from this process
+    _TRIM_EVERY = 500
+
+    def __init__(
+        self,
+        path: str = "data/queue.db",
+        poll_interval: float = 0.1,
+        retention: dict[str, RetentionPolicy] | None = None,
+        fair_share: int = 5,
+        codec: Codec | None = None,
+        router: ShardRouter | None = None,
+    ):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         self.path = path
-        self._init_db()
-
-    def _init_db(self):
-        with sqlite3.connect(self.path) as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS queue (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel TEXT NOT NULL,
-                    payload TEXT NOT NULL,
-                    status TEXT DEFAULT 'new',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_channel_status ON queue(channel, status);"
-            )
-            conn.commit()
+        self._key = os.path.abspath(path)
+        self.router = router or ShardRouter.from_settings(path)
+        self.poll_interval = poll_interval
+        self.retention = (
+            RetentionPolicy.from_settings() if retention is None else retention
+        )
+        # 1 in fair_share dequeues goes to the oldest message regardless of priority
+        self.fair_share = fair_share
+        self.codec = codec or DEFAULT_CODEC
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cursors: dict[tuple[str, str], dict[int, int]] = {}
+        self._publish_counts: dict[str, int] = {}
+        self._pop_counts: dict[str, int] = {}
+        for shard in self.router.paths:
+            self._init_db(self._shard_conn(shard))
 
-    def push(self, channel: str, message: dict | str) -> None:
-        if isinstance(message, dict):
-            message = json.dumps(message)
+    @property
+    def paths(self) -> list[str]:
+        """Every SQLite file backing this queue."""
+        return self.router.paths
 
-        with sqlite3.connect(self.path) as conn:
-            conn.execute(
-                "INSERT INTO queue (channel, payload, status) VALUES (?, ?, 'new')",
-                (channel, message),
+    def _connect(self, path: str) -> sqlite3.Connection:
+        # Autocommit mode: every statement is its own transaction unless we BEGIN explicitly
+        conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        # Only takes effect on a fresh file; must precede journal_mode
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        conn.execute("PRAGMA journal_mode=WAL;")
+        # WAL + NORMAL only fsyncs on checkpoint, not on every commit
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA busy_timeout=5000;")
+        return conn
+
+    def _shard_conn(self, path: str) -> sqlite3.Connection:
+        """Return this thread's connection to a shard, reconnecting after a fork."""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.conns = {}
+            self._local.pid = os.getpid()
+        conn = self._local.conns.get(path)
+        if conn is None:
+            conn = self._local.conns[path] = self._connect(path)
+        return conn
+
+    def _conn(self, channel: str) -> sqlite3.Connection:
+        """Return this thread's connection to the shard holding channel."""
+        return self._shard_conn(self.router.path_for(channel))
+
+    def _init_db(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT DEFAULT 'new',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                priority INTEGER NOT NULL DEFAULT 1,
+                codec INTEGER
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS topic_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 1,
+                codec INTEGER
+            );
+        """)
+        self._migrate(conn)
+
+        # Partial indexes over pending rows only: pops, peeks and trims walk
+        # (channel, id), prioritized pops walk (channel, priority, id)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_pending ON queue(channel, id) "
+            "WHERE status = 'new';"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_queue_priority "
+            "ON queue(channel, priority, id) WHERE status = 'new';"
+        )
+        conn.execute("DROP INDEX IF EXISTS idx_channel_status;")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_topic_log ON topic_log(topic, id);"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_topic_lane "
+            "ON topic_log(topic, priority, id);"
+        )
+        # One cursor per (topic, consumer, lane)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS topic_cursors (
+                topic TEXT NOT NULL,
+                consumer TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (topic, consumer, priority)
+            );
+        """)
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Bring files created by older versions up to the current schema."""
+
+        def columns(table):
+            return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+        for table in ("queue", "topic_log"):
+            if "priority" not in columns(table):
+                conn.execute(
+                    f"ALTER TABLE {table} "
+                    "ADD COLUMN priority INTEGER NOT NULL DEFAULT 1"
+                )
+            if "codec" not in columns(table):
+                # NULL tag: payload is the legacy text as pushed
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN codec INTEGER")
+
+        cursor_cols = columns("topic_cursors")
+        if cursor_cols and "priority" not in cursor_cols:
+            # Single-cursor consumers resume every lane from where they were
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("ALTER TABLE topic_cursors RENAME TO topic_cursors_v1")
+                conn.execute("""
+                    CREATE TABLE topic_cursors (
+                        topic TEXT NOT NULL,
+                        consumer TEXT NOT NULL,
+                        priority INTEGER NOT NULL,
+                        last_id INTEGER NOT NULL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (topic, consumer, priority)
+                    );
+                """)
+                for lane in LANES:
+                    conn.execute(
+                        "INSERT INTO topic_cursors "
+                        "SELECT topic, consumer, ?, last_id, updated_at "
+                        "FROM topic_cursors_v1",
+                        (lane,),
+                    )
+                conn.execute("DROP TABLE topic_cursors_v1")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def push(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        payload, fmt = self.codec.encode(message)
+        self._conn(channel).execute(
+            "INSERT INTO queue (channel, payload, status, priority, codec) "
+            "VALUES (?, ?, 'new', ?, ?)",
+            (channel, payload, priority, fmt),
+        )
+        _notify(self._key, channel)
+
+    def push_many(
+        self,
+        channel: str,
+        messages: list[dict | str],
+        priority: int = PRIORITY_NORMAL,
+    ) -> list[int]:
+        """Push several messages in a single transaction (one commit). Returns their ids."""
+        if not messages:
+            return []
+        rows = [(channel, *self.codec.encode(m), priority) for m in messages]
+        conn = self._conn(channel)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO queue (channel, payload, codec, status, priority) "
+                "VALUES (?, ?, ?, 'new', ?)",
+                rows,
             )
-            conn.commit()
+            last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _notify(self._key, channel)
+        # We held the write lock for the whole batch, so the ids are contiguous
+        return list(range(last - len(rows) + 1, last + 1))
+
+    def _fifo_slots(self, channel: str, max_n: int) -> int:
+        """How many of the next max_n dequeues go oldest-first instead of by priority."""
+        with self._lock:
+            calls = self._pop_counts.get(channel, 0) + 1
+            self._pop_counts[channel] = calls % self.fair_share
+        slots = max_n // self.fair_share
+        if slots == 0 and calls >= self.fair_share:
+            slots = 1
+        return slots
+
+    def _decode(self, payload: str | bytes, fmt: int | None, decode: bool):
+        if decode:
+            return self.codec.decode(payload, fmt)
+        return self.codec.decode_text(payload, fmt)
+
+    def try_pop(self, channel: str, decode: bool = False) -> str | dict | None:
+        """Non-blocking pop of the next message on a channel."""
+        payloads = self.try_pop_many(channel, 1, decode)
+        return payloads[0] if payloads else None
 
-    def pop(self, channel: str, timeout: int = 0) -> str | None:
+    def pop(
+        self, channel: str, timeout: int = 0, decode: bool = False
+    ) -> str | dict | None:
         """
         Simulates BRPOP. Simple polling with timeout.
         """
         start_time = time.time()
         while True:
-            with sqlite3.connect(self.path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-
-                # Transaction to pop the oldest 'new' message
-                try:
-                    cursor.execute("BEGIN IMMEDIATE")
-                    cursor.execute(
-                        """
-                        SELECT id, payload FROM queue 
-                        WHERE channel = ? AND status = 'new' 
-                        ORDER BY id ASC LIMIT 1
-                    """,
-                        (channel,),
-                    )
-                    row = cursor.fetchone()
-
-                    if row:
-                        msg_id, payload = row["id"], row["payload"]
-                        cursor.execute("DELETE FROM queue WHERE id = ?", (msg_id,))
-                        conn.commit()
-                        return payload
-                    else:
-                        conn.rollback()
-                except sqlite3.OperationalError:
-                    conn.rollback()
-
-            if timeout > 0 and (time.time() - start_time) >= timeout:
-                return None
+            payload = self.try_pop(channel, decode)
+            if payload is not None:
+                return payload
 
-            # Non-blocking check for instant return if timeout=0?
             # Redis BRPOP blocks, but RPOP doesn't.
             # If timeout=0 in Redis BRPOP it blocks indefinitely.
             # Here if timeout=0 we act like RPOP (non-blocking).
             if timeout == 0:
                 return None
 
-            time.sleep(0.1)
+            if (time.time() - start_time) >= timeout:
+                return None
+
+            time.sleep(self.poll_interval)
+
+    def try_pop_many(
+        self, channel: str, max_n: int, decode: bool = False
+    ) -> list[str | dict]:
+        """
+        Non-blocking pop of up to max_n messages: highest priority first, FIFO
+        within a lane, with a fair share of slots for the oldest message overall.
+        """
+        conn = self._conn(channel)
+        try:
+            if conn.execute(self._PEEK_SQL, (channel,)).fetchone() is None:
+                return []
+            fifo = self._fifo_slots(channel, max_n)
+            rows = conn.execute(
+                self._POP_MANY_SQL, (channel, max_n - fifo, channel, fifo)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # Lock contention beyond busy_timeout: treat as empty and retry on next poll
+            return []
+        # RETURNING order is unspecified, restore (priority, id) order
+        rows.sort(key=lambda r: (r[0], r[1]))
+        return [self._decode(payload, fmt, decode) for _, _, payload, fmt in rows]
+
+    def pop_many(
+        self, channel: str, max_n: int = 100, timeout: int = 0, decode: bool = False
+    ) -> list[str | dict]:
+        """
+        Batched pop: waits up to timeout for at least one message, then drains
+        up to max_n in one statement. Same timeout semantics as pop.
+        """
+        start_time = time.time()
+        while True:
+            payloads = self.try_pop_many(channel, max_n, decode)
+            if payloads:
+                return payloads
+
+            if timeout == 0 or (time.time() - start_time) >= timeout:
+                return []
+
+            time.sleep(self.poll_interval)
+
+    # --- Fan-out topics ---
+
+    def publish(
+        self, channel: str, message: dict | str, priority: int = PRIORITY_NORMAL
+    ) -> None:
+        """Append a message to a topic; every subscriber will see it."""
+        self.publish_many(channel, [message], priority)
+
+    def publish_many(
+        self,
+        channel: str,
+        messages: list[dict | str],
+        priority: int = PRIORITY_NORMAL,
+    ) -> list[int]:
+        """Append several messages to a topic in a single transaction. Returns their ids."""
+        if not messages:
+            return []
+        now = time.time()
+        rows = [(channel, *self.codec.encode(m), now, priority) for m in messages]
+        conn = self._conn(channel)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO topic_log (topic, payload, codec, created_at, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _notify(self._key, channel)
+
+        with self._lock:
+            count = self._publish_counts.get(channel, 0) + len(rows)
+            self._publish_counts[channel] = count % self._TRIM_EVERY
+        if count >= self._TRIM_EVERY:
+            self.trim_topic(channel)
+        return list(range(last - len(rows) + 1, last + 1))
+
+    def _get_cursors(self, channel: str, consumer: str, start: str) -> dict[int, int]:
+        key = (channel, consumer)
+        cursors = self._cursors.get(key)
+        if cursors is not None:
+            return cursors
+
+        conn = self._conn(channel)
+        cursors = dict(
+            conn.execute(
+                "SELECT priority, last_id FROM topic_cursors "
+                "WHERE topic = ? AND consumer = ?",
+                key,
+            ).fetchall()
+        )
+        if not cursors:
+            if start == "earliest":
+                tail = 0
+            else:
+                # New consumers start at the tail, like Redis' "$"
+                row = conn.execute(
+                    "SELECT MAX(id) FROM topic_log WHERE topic = ?", (channel,)
+                ).fetchone()
+                tail = row[0] or 0
+            cursors = {lane: tail for lane in LANES}
+            if tail:
+                self._save_cursors(channel, consumer, cursors)
+        self._cursors[key] = cursors
+        return cursors
+
+    def _save_cursors(
+        self, channel: str, consumer: str, cursors: dict[int, int]
+    ) -> None:
+        now = time.time()
+        self._conn(channel).executemany(
+            """
+            INSERT INTO topic_cursors (topic, consumer, priority, last_id, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (topic, consumer, priority)
+            DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+            """,
+            [(channel, consumer, lane, last, now) for lane, last in cursors.items()],
+        )
+        self._cursors.setdefault((channel, consumer), {}).update(cursors)
+
+    def try_subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        start: str = "latest",
+        decode: bool = False,
+    ) -> list[str | dict]:
+        """
+        Non-blocking read of up to max_n messages past this consumer's cursors.
+        Lanes are read in priority order; lower lanes are guaranteed a fair share
+        of the batch, and unused share goes back to the interactive lane.
+        """
+        conn = self._conn(channel)
+        try:
+            cursors = dict(self._get_cursors(channel, consumer, start))
+
+            def read(lane, limit):
+                if limit <= 0:
+                    return []
+                rows = conn.execute(
+                    "SELECT id, payload, codec FROM topic_log "
+                    "WHERE topic = ? AND priority = ? AND id > ? "
+                    "ORDER BY id ASC LIMIT ?",
+                    (channel, lane, cursors.get(lane, 0), limit),
+                ).fetchall()
+                if rows:
+                    cursors[lane] = rows[-1][0]
+                return rows
+
+            reserve = max_n // self.fair_share if max_n > 1 else 0
+            batches = {LANES[0]: read(LANES[0], max_n - reserve)}
+            budget = max_n - len(batches[LANES[0]])
+            for lane in LANES[1:]:
+                batches[lane] = read(lane, budget)
+                budget -= len(batches[lane])
+            batches[LANES[0]] += read(LANES[0], budget)
+
+            rows = [row for lane in LANES for row in batches[lane]]
+            if rows:
+                self._save_cursors(channel, consumer, cursors)
+        except sqlite3.OperationalError:
+            return []
+        return [self._decode(payload, fmt, decode) for _, payload, fmt in rows]
+
+    def subscribe(
+        self,
+        channel: str,
+        consumer: str,
+        max_n: int = 100,
+        timeout: int = 0,
+        start: str = "latest",
+        decode: bool = False,
+    ) -> list[str | dict]:
+        """
+        Read the next batch of a topic for a named consumer, advancing its cursor.
+        Consumers that have never read start at the tail ("latest") or at the
+        oldest retained message ("earliest"). Same timeout semantics as pop.
+        """
+        start_time = time.time()
+        while True:
+            payloads = self.try_subscribe(channel, consumer, max_n, start, decode)
+            if payloads:
+                return payloads
+
+            if timeout == 0 or (time.time() - start_time) >= timeout:
+                return []
+
+            time.sleep(self.poll_interval)
+
+    def unsubscribe(self, channel: str, consumer: str) -> None:
+        """Forget a consumer's cursor (use for ephemeral consumers)."""
+        self._cursors.pop((channel, consumer), None)
+        self._conn(channel).execute(
+            "DELETE FROM topic_cursors WHERE topic = ? AND consumer = ?",
+            (channel, consumer),
+        )
+
+    # --- Raw access (used by the socket broker's write-through) ---
+
+    def ack(self, channel: str, ids: list[int]) -> None:
+        """Delete specific queue messages by id (delivered elsewhere)."""
+        if ids:
+            self._conn(channel).executemany(
+                "DELETE FROM queue WHERE id = ?", [(i,) for i in ids]
+            )
+
+    def pending(self):
+        """Yield (channel, id, priority, message) for every undelivered message."""
+        for path in self.paths:
+            rows = self._shard_conn(path).execute(
+                "SELECT channel, id, priority, payload, codec FROM queue "
+                "WHERE status = 'new' ORDER BY id"
+            )
+            for channel, id_, priority, payload, fmt in rows:
+                yield channel, id_, priority, self.codec.decode(payload, fmt)
+
+    def topic_backlog(self):
+        """Yield (topic, id, priority, message) for every retained topic message."""
+        for path in self.paths:
+            rows = self._shard_conn(path).execute(
+                "SELECT topic, id, priority, payload, codec FROM topic_log ORDER BY id"
+            )
+            for topic, id_, priority, payload, fmt in rows:
+                yield topic, id_, priority, self.codec.decode(payload, fmt)
+
+    # --- Retention & compaction ---
+
+    def _trim(
+        self,
+        table: str,
+        channel: str,
+        batch_size: int,
+        conn: sqlite3.Connection | None = None,
+    ) -> int:
+        """
+        Enforce the channel's retention policy on one table, deleting oldest-first
+        in batches of batch_size so writers can grab the lock between batches.
+        conn defaults to the channel's shard.
+        """
+        if table == "queue":
+            where = "channel = ? AND status = 'new'"
+            young = "created_at >= datetime(?, 'unixepoch')"
+        else:
+            where = "topic = ?"
+            young = "created_at >= ?"
+
+        policy = self.retention.get(channel, DEFAULT_RETENTION)
+        conn = conn or self._conn(channel)
+        cut = None  # delete ids <= cut
+
+        if policy.max_count is not None:
+            row = conn.execute(
+                f"SELECT id FROM {table} WHERE {where} ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (channel, policy.max_count),
+            ).fetchone()
+            if row:
+                cut = row[0]
+
+        if policy.max_age is not None:
+            cutoff = time.time() - policy.max_age
+            # ids grow with created_at: walk from the oldest to the first young row
+            row = conn.execute(
+                f"SELECT id FROM {table} WHERE {where} AND {young} ORDER BY id ASC LIMIT 1",
+                (channel, cutoff),
+            ).fetchone()
+            if row:
+                age_cut = row[0] - 1
+            else:
+                age_cut = conn.execute(
+                    f"SELECT MAX(id) FROM {table} WHERE {where}", (channel,)
+                ).fetchone()[0]
+            if age_cut is not None and (cut is None or age_cut > cut):
+                cut = age_cut
+
+            if table == "topic_log":
+                # Cursors idle for longer than max_age belong to dead consumers
+                conn.execute(
+                    "DELETE FROM topic_cursors WHERE topic = ? AND updated_at < ?",
+                    (channel, cutoff),
+                )
+
+        if cut is None:
+            return 0
+
+        removed = 0
+        while True:
+            n = conn.execute(
+                f"DELETE FROM {table} WHERE id IN ("
+                f" SELECT id FROM {table} WHERE {where} AND id <= ? ORDER BY id LIMIT ?)",
+                (channel, cut, batch_size),
+            ).rowcount
+            removed += n
+            if n < batch_size:
+                return removed
+
+    def trim_topic(self, channel: str, batch_size: int = 500) -> int:
+        """Apply retention to a topic log. Returns the number of rows removed."""
+        try:
+            return self._trim("topic_log", channel, batch_size)
+        except sqlite3.OperationalError:
+            return 0
+
+    def trim_channel(self, channel: str, batch_size: int = 500) -> int:
+        """Expire undelivered queue messages (TTL / max depth). Returns rows removed."""
+        try:
+            return self._trim("queue", channel, batch_size)
+        except sqlite3.OperationalError:
+            return 0
+
+    def compact(self, batch_size: int = 500, vacuum_pages: int = 1000) -> dict:
+        """
+        One compaction pass over every shard: enforce retention on every queue
+        channel and topic, checkpoint the WAL back into the main file and return
+        freed pages to the filesystem incrementally. Safe to run while
+        producers/consumers are live.
+        """
+        stats = {"queue_removed": 0, "topic_removed": 0}
+        for path in self.paths:
+            conn = self._shard_conn(path)
+            try:
+                channels = [
+                    r[0]
+                    for r in conn.execute(
+                        "SELECT DISTINCT channel FROM queue WHERE status = 'new'"
+                    )
+                ]
+                topics = [
+                    r[0] for r in conn.execute("SELECT DISTINCT topic FROM topic_log")
+                ]
+                # Trim on this shard's connection, so rows left behind by an
+                # older shard layout still age out
+                for channel in channels:
+                    stats["queue_removed"] += self._trim(
+                        "queue", channel, batch_size, conn
+                    )
+                for topic in topics:
+                    stats["topic_removed"] += self._trim(
+                        "topic_log", topic, batch_size, conn
+                    )
+
+                # PASSIVE never waits on readers, so live pollers are not blocked
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchall()
+                # No-op on files created before auto_vacuum=INCREMENTAL (needs one VACUUM)
+                conn.execute(
+                    f"PRAGMA incremental_vacuum({int(vacuum_pages)});"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                continue
+        return stats
+
+    def close(self) -> None:
+        """Close the calling thread's connections (other threads close on exit)."""
+        conns = getattr(self._local, "conns", None) or {}
+        for conn in conns.values():
+            conn.close()
+        conns.clear()
+
+
+class QueueCompactor:
+    """Background thread that runs MessageQueue.compact() on an interval."""
+
+    def __init__(
+        self, queue: MessageQueue, interval: float = 300.0, batch_size: int = 500
+    ):
+        self.queue = queue
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="punisher-bus-compactor", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
 
-    def publish(self, channel: str, message: dict | str) -> None:
-        # For our purposes, publish is same as push (pub/sub vs queue is blurred here)
-        self.push(channel, message)
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                stats = self.queue.compact(batch_size=self.batch_size)
+                if stats["queue_removed"] or stats["topic_removed"]:
+                    logger.info(f"Queue compaction: {stats}")
+            except Exception as e:
+                logger.error(f"Queue compaction error: {e}")
+        self.queue.close()
@@ -0,0 +1,61 @@
+"""
+Channel-to-shard routing for the SQLite message bus.
+
+Each shard is its own SQLite file with its own writer lock, so a burst of
+writes to one channel no longer queues behind writes to another. Channels are
+placed by an explicit mapping first (channel -> shard name), then by a stable
+hash over the numbered shards. Shard 0 is the base file, so a single-shard
+layout is exactly the original one-file bus.
+
+Changing the layout moves channels between files: drain undelivered messages
+(or accept losing them) before changing QUEUE_SHARDS / QUEUE_SHARD_MAP.
+"""
+
+import os
+import zlib
+
+from punisher.config import settings
+
+
+class ShardRouter:
+    """Maps channel names to SQLite file paths."""
+
+    def __init__(
+        self,
+        path: str = "data/queue.db",
+        shards: int = 1,
+        mapping: dict[str, str] | None = None,
+    ):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        self.path = path
+        self.shards = shards
+        self.mapping = dict(mapping or {})
+
+        base, ext = os.path.splitext(path)
+        self._numbered = [path] + [f"{base}.{i}{ext}" for i in range(1, shards)]
+        self._named = {
+            name: f"{base}.{name}{ext}" for name in set(self.mapping.values())
+        }
+        self._cache: dict[str, str] = {}
+
+    @classmethod
+    def from_settings(cls, path: str = "data/queue.db") -> "ShardRouter":
+        return cls(path, settings.QUEUE_SHARDS, settings.QUEUE_SHARD_MAP)
+
+    @property
+    def paths(self) -> list[str]:
+        """Every shard file, base file first."""
+        return self._numbered + sorted(self._named.values())
+
+    def path_for(self, channel: str) -> str:
+        path = self._cache.get(channel)
+        if path is None:
+            name = self.mapping.get(channel)
+            if name is not None:
+                path = self._named[name]
+            else:
+                # crc32, not hash(): placement must agree across processes
+                path = self._numbered[zlib.crc32(channel.encode()) % self.shards]
+            self._cache[channel] = path
+        return path
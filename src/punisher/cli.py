@@ -2,7 +2,9 @@ import click
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_queue
+from punisher.bus.queue import PRIORITY_INTERACTIVE
+import os
 import sys
 
 console = Console()
@@ -18,12 +20,12 @@ def main():
 @click.argument("message", required=False)
 def send(message):
     """Send a message to the orchestrator queue."""
-    queue = MessageQueue()
+    queue = get_queue()
     if not message:
         message = click.prompt("Message")
 
     payload = {"source": "cli", "content": message}
-    queue.push("punisher:inbox", payload)
+    queue.push("punisher:inbox", payload, PRIORITY_INTERACTIVE)
     console.print(f"[green]Sent:[/green] {message}")
 
 
@@ -91,12 +93,14 @@ def chat():
 @main.command()
 def listen():
     """Listen for messages from the orchestrator."""
-    queue = MessageQueue()
+    queue = get_queue()
+    consumer = f"listen:{os.getpid()}"
     console.print("[bold yellow]Listening for responses...[/bold yellow]")
     while True:
         try:
-            msg = queue.pop("punisher:cli:out", timeout=1)
-            if msg:
+            for msg in queue.subscribe(
+                "punisher:cli:out", consumer, max_n=50, timeout=1
+            ):
                 console.print(Panel(msg, title="Punisher", border_style="blue"))
         except KeyboardInterrupt:
             console.print("Stopping...")
@@ -111,20 +115,156 @@ def dashboard():
     dashboard_main()
 
 
+@main.command()
+@click.option("--socket", "socket_path", default=None, help="Unix socket path.")
+@click.option(
+    "--durable/--memory",
+    default=None,
+    help="Write through to the SQLite bus (default: QUEUE_BROKER_DURABLE).",
+)
+@click.option("--db", default="data/queue.db", show_default=True)
+def broker(socket_path, durable, db):
+    """Run the in-memory message bus broker on a Unix socket."""
+    import logging
+
+    from punisher.bus.broker import run_broker
+    from punisher.config import settings
+
+    logging.basicConfig(level=logging.INFO)
+    socket_path = socket_path or str(settings.QUEUE_BROKER_SOCKET)
+    if durable is None:
+        durable = settings.QUEUE_BROKER_DURABLE
+    console.print(
+        f"[green]Broker on {socket_path}[/green] "
+        f"({'write-through to ' + db if durable else 'memory only'})"
+    )
+    if settings.QUEUE_BACKEND != "broker":
+        console.print("[dim]Set QUEUE_BACKEND=broker so clients use it.[/dim]")
+    run_broker(socket_path, db if durable else None)
+
+
+@main.group()
+def bench():
+    """Performance benchmarks."""
+
+
+@bench.command("queue")
+@click.option(
+    "--quick", is_flag=True, help="Small message counts (seconds, not minutes)."
+)
+@click.option(
+    "--output",
+    default="data/bench/queue.json",
+    show_default=True,
+    help="Where to write machine-readable results.",
+)
+def bench_queue(quick, output):
+    """Benchmark the SQLite message bus (throughput, latency, DB growth)."""
+    from rich.table import Table
+
+    from punisher.bench.queue import run_suite, write_results
+
+    with console.status("[bold green]Benchmarking queue...[/bold green]"):
+        report = run_suite(quick=quick)
+    write_results(report, output)
+
+    table = Table(title=f"Queue benchmark (SQLite {report['sqlite']})")
+    for col in ["Scenario", "msgs/s", "p50 ms", "p99 ms", "DB growth"]:
+        table.add_column(col, justify="right" if col != "Scenario" else "left")
+    for r in report["results"]:
+        if "polls_per_s" in r:
+            table.add_row(r["name"], f"{r['polls_per_s']:,.0f} polls", "-", "-", "-")
+        else:
+            table.add_row(
+                r["name"],
+                f"{r['msgs_per_s']:,.0f}",
+                str(r["p50_ms"]),
+                str(r["p99_ms"]),
+                f"{r['db_growth_bytes'] / 1024:,.0f} KB",
+            )
+    console.print(table)
+    console.print(f"[dim]Results written to {output}[/dim]")
+
+
+@bench.command("hash")
+@click.option("--quick", is_flag=True, help="Fewer iterations.")
+def bench_hash(quick):
+    """Benchmark wallet snapshot state hashing (legacy str() vs fingerprint)."""
+    from rich.table import Table
+
+    from punisher.bench.snapshot import run_suite
+
+    report = run_suite(quick=quick)
+    table = Table(title="Snapshot hash cost per snapshot")
+    for col in ["Wallet", "legacy µs", "fingerprint µs", "legacy B", "fingerprint B"]:
+        table.add_column(col, justify="right" if col != "Wallet" else "left")
+    for r in report["results"]:
+        table.add_row(
+            r["name"],
+            f"{r['legacy_us']:.1f}",
+            f"{r['fingerprint_us']:.1f}",
+            str(r["legacy_bytes"]),
+            str(r["fingerprint_bytes"]),
+        )
+    console.print(table)
+
+
+@main.command("migrate-hashes")
+def migrate_hashes():
+    """Rewrite legacy wallet snapshot state hashes as fingerprints."""
+    import asyncio
+
+    from punisher.db.mongo import mongo
+
+    async def _run():
+        try:
+            return await mongo.migrate_state_hashes()
+        finally:
+            await mongo.close()
+
+    with console.status("[bold green]Migrating state hashes...[/bold green]"):
+        updated = asyncio.run(_run())
+    console.print(f"[green]Updated {updated} snapshots.[/green]")
+
+
+@main.command("rollup-bars")
+@click.option("--days", default=7, show_default=True, help="How far back to rebuild.")
+def rollup_bars(days):
+    """Rebuild 1-minute and 1-hour market bars from raw ticks."""
+    import asyncio
+    from datetime import datetime, timedelta
+
+    from punisher.db.backend import get_storage
+
+    storage = get_storage()
+
+    async def _run():
+        try:
+            await storage.rollup_market_bars(datetime.utcnow() - timedelta(days=days))
+        finally:
+            await storage.close()
+
+    with console.status("[bold green]Rolling up market bars...[/bold green]"):
+        asyncio.run(_run())
+    console.print("[green]Market bars rebuilt.[/green]")
+
+
 @main.command()
 def run():
     """Run the main CLI interactive loop."""
     console.print(
         Panel("[bold]Punisher AI[/bold]\nType 'exit' to quit.", border_style="green")
     )
-    queue = MessageQueue()
+    queue = get_queue()
 
     import threading
 
     def listener():
+        consumer = f"cli:{os.getpid()}"
         while True:
-            msg = queue.pop("punisher:cli:out", timeout=1)
-            if msg:
+            for msg in queue.subscribe(
+                "punisher:cli:out", consumer, max_n=50, timeout=1
+            ):
                 console.print(f"\n[bold blue]Punisher:[/bold blue] {msg}")
                 console.print("[bold green]You:[/bold green] ", end="")
 
@@ -138,7 +278,7 @@ def run():
                 break
 
             payload = {"source": "cli", "content": msg}
-            queue.push("punisher:inbox", payload)
+            queue.push("punisher:inbox", payload, PRIORITY_INTERACTIVE)
         except KeyboardInterrupt:
             break
 
@@ -21,7 +21,54 @@ class Settings(BaseSettings):
 
     # Crypto
     HYPERLIQUID_WALLET_ADDRESS: str = ""
+    # Wallet monitor: "rotate" watches one wallet per connection at a time;
+    # "multiplex" shards all wallets over HYPERLIQUID_WS_CONNECTIONS sockets
+    # carrying up to HYPERLIQUID_WS_SUBSCRIPTIONS webData2 subscriptions each
+    HYPERLIQUID_MONITOR_MODE: str = "rotate"
+    HYPERLIQUID_WS_CONNECTIONS: int = 4
+    HYPERLIQUID_WS_SUBSCRIPTIONS: int = 250
+    # Rotate mode refresh SLAs: max seconds between refreshes of a wallet, per
+    # WalletScheduler tier; overrides WalletScheduler.DEFAULT_SLAS, e.g.
+    # {"hot": 30}
+    HYPERLIQUID_TIER_SLAS: dict[str, float] = {}
+    # Scheduler tiers refreshed by the HTTP poller (clearinghouseState and
+    # openOrders over /info) instead of the WebSocket, e.g. ["cold"]; its
+    # request weight budget per minute and concurrent requests
+    HYPERLIQUID_POLL_TIERS: list[str] = []
+    HYPERLIQUID_POLL_WEIGHT_PER_MINUTE: int = 1000
+    HYPERLIQUID_POLL_CONCURRENCY: int = 8
     MONGODB_URI: str = "mongodb://localhost:27017"
+    # "mongo" or "sqlite" (embedded, single box: everything in STORAGE_SQLITE_PATH)
+    STORAGE_BACKEND: str = "mongo"
+    STORAGE_SQLITE_PATH: Path = Path("data/punisher.db")
+    # Wallet state history: every SNAPSHOT_KEYFRAME_EVERY-th change is a full
+    # keyframe, the SNAPSHOT_KEYFRAME_EVERY - 1 in between per-position/
+    # per-order diffs
+    SNAPSHOT_HISTORY: bool = True
+    SNAPSHOT_KEYFRAME_EVERY: int = 50
+    SNAPSHOT_HISTORY_DAYS: int = 180
+    # Per-collection overrides of punisher.db.retention.RETENTION days
+    RETENTION_DAYS: dict[str, int] = {}
+    # Where expired chat sessions are archived (gzipped JSON lines)
+    RETENTION_ARCHIVE_DIR: Path = Path("data/archive")
+
+    # Message bus: channels are spread over QUEUE_SHARDS SQLite files by hash;
+    # QUEUE_SHARD_MAP pins channels to named files, e.g.
+    # {"punisher:inbox": "inbox", "punisher:cli:out": "telemetry"}
+    QUEUE_SHARDS: int = 1
+    QUEUE_SHARD_MAP: dict[str, str] = {}
+    # "sqlite" (every process opens the SQLite bus) or "broker" (talk to a
+    # `punisher broker` process over a Unix socket)
+    QUEUE_BACKEND: str = "sqlite"
+    QUEUE_BROKER_SOCKET: Path = Path("data/bus.sock")
+    # Broker writes through to the SQLite bus so undelivered messages survive restarts
+    QUEUE_BROKER_DURABLE: bool = True
+    # Per-channel bus retention: max_count messages and/or max_age seconds
+    # (null: no limit). Channels not listed keep everything, so work queues
+    # like punisher:inbox never lose unconsumed messages.
+    QUEUE_RETENTION: dict[str, dict[str, int | None]] = {
+        "punisher:cli:out": {"max_count": 10_000, "max_age": 24 * 3600},
+    }
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", extra="ignore"
@@ -5,7 +5,9 @@ Handles wallet discovery, monitoring, and alpha extraction.
 
 import asyncio
 import logging
-from punisher.bus.queue import MessageQueue
+from datetime import datetime, timedelta
+from punisher.bus.backend import get_queue
+from punisher.db.backend import get_storage
 from punisher.crypto.hyperliquid import HyperliquidMonitor
 from punisher.scrapers.coinglass import CoinGlassScraper
 from punisher.llm.gateway import LLMGateway
@@ -16,7 +18,7 @@ logger = logging.getLogger("punisher.agents.crypto")
 
 class Satoshi:
     def __init__(self):
-        self.queue = MessageQueue()
+        self.queue = get_queue()
         self.hl_monitor = HyperliquidMonitor()
         self.cg_scraper = CoinGlassScraper()
         self.llm = LLMGateway()
@@ -31,23 +33,16 @@ class Satoshi:
         await self.broadcast("Satoshi Online. Tracking institutional flows.")
 
     async def broadcast(self, msg: str):
-        self.queue.push("punisher:cli:out", f"[💎] {msg}")
+        self.queue.publish("punisher:cli:out", f"[💎] {msg}")
 
     async def get_alpha_context(self) -> str:
         """Fetch and synthesize crypto alpha for the Punisher"""
         raw_data = ""
         try:
-            from punisher.db.mongo import mongo
-
-            db = await mongo.get_db()
+            storage = get_storage()
 
             # 1. Newest Discoveries
-            wallets = (
-                await db.tracked_wallets.find()
-                .sort("discovered_at", -1)
-                .limit(3)
-                .to_list(length=3)
-            )
+            wallets = await storage.get_recent_wallets(3)
             if wallets:
                 raw_data += "New High-Conviction Wallets:\n"
                 for w in wallets:
@@ -56,12 +51,7 @@ class Satoshi:
                     )
 
             # 2. Significant Active Positions (Whales)
-            snapshots = (
-                await db.hyperliquid_snapshots.find()
-                .sort("created_at", -1)
-                .limit(2)
-                .to_list(length=2)
-            )
+            snapshots = await storage.get_recent_snapshots(2)
             if snapshots:
                 raw_data += "\nActive Whale Clips:\n"
                 for s in snapshots:
@@ -70,10 +60,24 @@ class Satoshi:
                         if abs(float(p.get("size", 0))) > 0:
                             raw_data += f"  > {p.get('coin')} {p.get('side')} (${float(p.get('unrealized_pnl', 0)):,.0f} uPNL)\n"
 
+            # 3. Market tape from hourly bars (never raw ticks)
+            since = datetime.utcnow() - timedelta(days=1)
+            for coin in ["BTC", "ETH"]:
+                bars = await storage.get_market_bars(coin, since, resolution="1h")
+                if bars:
+                    open_px, close_px = bars[0]["open"], bars[-1]["close"]
+                    change = (close_px - open_px) / open_px * 100 if open_px else 0.0
+                    high = max(b["high"] for b in bars)
+                    low = min(b["low"] for b in bars)
+                    raw_data += (
+                        f"\n{coin} 24h: ${close_px:,.0f} ({change:+.1f}%), "
+                        f"range ${low:,.0f}-${high:,.0f}\n"
+                    )
+
             if not raw_data:
                 return "--- CRYPTO ALPHA ---\nNo significant on-chain shifts detected in current cycle."
 
-            # 3. SYNTHESIS: Use LLM to condense and identify trends
+            # 4. SYNTHESIS: Use LLM to condense and identify trends
             alpha_intel = await self.synthesize_alpha(raw_data)
             return f"--- CRYPTO ALPHA (Synthesized) ---\n{alpha_intel}\n"
 
@@ -116,10 +120,7 @@ class Satoshi:
             return "Scheduled deep scrape of CoinGlass. Discovery in progress."
 
         if "wallets" in cmd:
-            from punisher.db.mongo import mongo
-
-            db = await mongo.get_db()
-            count = await db.tracked_wallets.count_documents({})
+            count = await get_storage().count_wallets()
             return f"Currently tracking {count} high-conviction wallets across Hyperliquid."
 
         return "Acknowledged. Monitoring the tape."
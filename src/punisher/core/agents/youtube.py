@@ -6,7 +6,7 @@ Digests trading content and provides a knowledge base for the Punisher.
 import asyncio
 import logging
 import sqlite3
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_queue
 from punisher.research.youtube import YouTubeMonitor
 from punisher.llm.gateway import LLMGateway
 from punisher.core.tools import AgentTools
@@ -16,7 +16,7 @@ logger = logging.getLogger("punisher.agents.youtube")
 
 class Joker:
     def __init__(self):
-        self.queue = MessageQueue()
+        self.queue = get_queue()
         self.monitor = YouTubeMonitor()
         self.llm = LLMGateway()
         self.tools = AgentTools()
@@ -32,7 +32,7 @@ class Joker:
         await self.broadcast("Joker Online. Scanning the media tape.")
 
     async def broadcast(self, msg: str):
-        self.queue.push("punisher:cli:out", f"[📺] {msg}")
+        self.queue.publish("punisher:cli:out", f"[📺] {msg}")
 
     async def background_digestion(self):
         """Periodically check channels for new insights"""
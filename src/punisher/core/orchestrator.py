@@ -6,21 +6,22 @@ Coordinates specialized subagents, enforces risk management, and makes strategic
 import asyncio
 import json
 import logging
-from datetime import datetime, UTC
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_async_queue
+from punisher.bus.queue import PRIORITY_INTERACTIVE
 from punisher.llm.gateway import LLMGateway
 from punisher.core.agents.crypto import Satoshi
 from punisher.core.agents.youtube import Joker
 from punisher.core.tools import AgentTools
 from punisher.core.tool_executor import create_default_registry, parse_tool_call
-from punisher.db.mongo import mongo
+from punisher.db.backend import get_storage
 
 logger = logging.getLogger("punisher.orchestrator")
 
 
 class AgentOrchestrator:
     def __init__(self):
-        self.queue = MessageQueue()
+        self.queue = get_async_queue()
+        self.storage = get_storage()
         self.llm = LLMGateway()
         self.tools = AgentTools()
         self.tool_registry = create_default_registry()
@@ -34,8 +35,7 @@ class AgentOrchestrator:
     async def get_agent_config(self, agent_id: str):
         """Fetch dynamic config from MongoDB or return defaults"""
         try:
-            db = await mongo.get_db()
-            config = await db.agent_configs.find_one({"agent_id": agent_id})
+            config = await self.storage.get_agent_config(agent_id)
 
             # IMPROVED: New better prompts (Defined here for sync)
             defaults = {
@@ -79,16 +79,13 @@ class AgentOrchestrator:
             if not config:
                 config = base_config
                 config["agent_id"] = agent_id
-                await db.agent_configs.update_one(
-                    {"agent_id": agent_id}, {"$set": config}, upsert=True
-                )
+                await self.storage.save_agent_config(agent_id, config)
             else:
                 # OPTIONAL: Update if the prompt is significantly different or short (Tuning)
                 if len(config.get("system_prompt", "")) < 150:
                     config["system_prompt"] = base_config["system_prompt"]
-                    await db.agent_configs.update_one(
-                        {"agent_id": agent_id},
-                        {"$set": {"system_prompt": base_config["system_prompt"]}},
+                    await self.storage.save_agent_config(
+                        agent_id, {"system_prompt": base_config["system_prompt"]}
                     )
 
             return config
@@ -99,15 +96,7 @@ class AgentOrchestrator:
     async def log_task(self, agent: str, task: str, status: str = "completed"):
         """Record task history for the management UI"""
         try:
-            db = await mongo.get_db()
-            await db.agent_tasks.insert_one(
-                {
-                    "agent": agent,
-                    "task": task,
-                    "status": status,
-                    "timestamp": datetime.now(UTC),
-                }
-            )
+            await self.storage.log_task(agent, task, status)
         except Exception as e:
             logger.error(f"Task log error: {e}")
 
@@ -122,18 +111,17 @@ class AgentOrchestrator:
         # Main Command Loop
         while self.running:
             try:
-                msg_raw = self.queue.pop("punisher:inbox", timeout=0)
+                # Woken as soon as a command lands; the timeout only re-checks self.running
+                msg_raw = await self.queue.pop("punisher:inbox", timeout=1, decode=True)
                 if msg_raw:
                     await self.process_message(msg_raw)
-                else:
-                    await asyncio.sleep(0.1)
             except Exception as e:
                 logger.error(f"Supreme decision error: {e}", exc_info=True)
                 await asyncio.sleep(1)
 
-    async def process_message(self, msg_raw: str):
+    async def process_message(self, msg_raw: dict | str):
         try:
-            payload = json.loads(msg_raw)
+            payload = json.loads(msg_raw) if isinstance(msg_raw, str) else msg_raw
             source = payload.get("source")
             content = payload.get("content", "").strip()
             session_id = payload.get("session_id", "default")
@@ -143,14 +131,13 @@ class AgentOrchestrator:
             )
 
             # 1. Save user input to persistence
-            await mongo.save_chat_message(session_id, "user", content)
+            await self.storage.save_chat_message(session_id, "user", content)
 
             # 2. Notify TUI/CLI/Web that processing has started
             if source in ["tui", "cli", "web"]:
                 out_id = "cli" if source == "tui" else source
-                self.queue.push(
-                    f"punisher:{out_id}:out",
-                    "PUNISHER IS THINKING... [GATHERING INTEL]",
+                await self.send_output(
+                    out_id, "PUNISHER IS THINKING... [GATHERING INTEL]"
                 )
 
             # 3. GATHER INTELLIGENCE (Parallelized)
@@ -187,7 +174,7 @@ class AgentOrchestrator:
             )
 
             # 4. FETCH CONVERSATION HISTORY
-            history = await mongo.get_chat_history(session_id, limit=10)
+            history = await self.storage.get_chat_history(session_id, limit=10)
 
             p_config = await self.get_agent_config("punisher")
 
@@ -259,39 +246,46 @@ class AgentOrchestrator:
                 response_text = await self.llm.chat(messages)
 
             # 8. Save agent response
-            await mongo.save_chat_message(session_id, "assistant", response_text)
+            await self.storage.save_chat_message(session_id, "assistant", response_text)
 
             # 9. BROADCAST
             if source.startswith("telegram:"):
                 chat_id = source.split(":")[1]
-                self.queue.push(
+                await self.queue.push(
                     "punisher:telegram:out",
-                    json.dumps({"chat_id": int(chat_id), "content": response_text}),
+                    {"chat_id": int(chat_id), "content": response_text},
+                    PRIORITY_INTERACTIVE,
                 )
             else:
                 out_id = "cli" if source == "tui" else source
-                target_out = f"punisher:{out_id}:out"
-                self.queue.push(target_out, response_text)
+                await self.send_output(out_id, response_text)
 
         except Exception as e:
             logger.error(f"Process error: {e}", exc_info=True)
             if source:
                 if source.startswith("telegram:"):
                     chat_id = source.split(":")[1]
-                    self.queue.push(
+                    await self.queue.push(
                         "punisher:telegram:out",
-                        json.dumps(
-                            {
-                                "chat_id": int(chat_id),
-                                "content": f"Operational Failure: {str(e)}",
-                            }
-                        ),
+                        {
+                            "chat_id": int(chat_id),
+                            "content": f"Operational Failure: {str(e)}",
+                        },
+                        PRIORITY_INTERACTIVE,
                     )
                 else:
                     out_id = "cli" if source == "tui" else source
-                    self.queue.push(
-                        f"punisher:{out_id}:out", f"Operational Failure: {str(e)}"
-                    )
+                    await self.send_output(out_id, f"Operational Failure: {str(e)}")
+
+    async def send_output(self, out_id: str, content: str):
+        """Deliver a reply: the shared CLI channel is a fan-out topic, the rest are queues.
+        Replies ride the interactive lane so they overtake queued telemetry."""
+        if out_id == "cli":
+            await self.queue.publish("punisher:cli:out", content, PRIORITY_INTERACTIVE)
+        else:
+            await self.queue.push(
+                f"punisher:{out_id}:out", content, PRIORITY_INTERACTIVE
+            )
 
     async def get_macro_context(self) -> str:
         """Fetch real-time macro data, prioritizing live HL stream"""
@@ -1,100 +1,504 @@
 """
 Hyperliquid Stealth Wallet Monitor
 Based on the proven implementation from hyperliquid_ws_stealthy.py
-Monitors specific wallets using webData2 subscription
+Monitors specific wallets using webData2 subscription, either rotating one
+wallet per connection or multiplexing many wallets over a few connections
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
 import json
+import math
 import ssl
 import base64
+import httpx
 import os
 import random
 import time
-from datetime import datetime, UTC
-from typing import List, Dict, Optional
+import zlib
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import ClassVar, Optional
 from websockets import connect
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_queue
+from punisher.bus.queue import PRIORITY_BULK
 from punisher.config import settings
-from punisher.crypto.hyperliquid_parser import parse_hyperliquid_data
+from punisher.crypto.hyperliquid_parser import (
+    parse_hyperliquid_data,
+    parse_market_mids,
+)
+from punisher.db.backend import get_storage
 
 logger = logging.getLogger("punisher.crypto.hyperliquid")
 
+# tracked_wallets statuses the monitor watches
+TARGET_STATUSES = ("discovered", "monitoring", "initial_scan_complete")
+
 # Default wallets to monitor (can be overridden via config)
 DEFAULT_WALLETS = [
     "0x1234567890abcdef1234567890abcdef12345678",  # Placeholder - replace with real wallets
 ]
 
 
+def shard_wallets(
+    wallets: list[str], connections: int, per_connection: int
+) -> tuple[list[set[str]], list[str]]:
+    """
+    Assign wallets to connections, at most per_connection each.
+
+    A wallet goes to the connection its address hashes to, or the least loaded
+    one if that is full, so most wallets keep their connection as the list
+    changes. Returns the shards and the wallets that did not fit.
+    """
+    shards: list[set[str]] = [set() for _ in range(connections)]
+    overflow = []
+    for wallet in sorted(wallets):
+        shard = shards[zlib.crc32(wallet.lower().encode()) % connections]
+        if len(shard) >= per_connection:
+            shard = min(shards, key=len)
+        if len(shard) < per_connection:
+            shard.add(wallet)
+        else:
+            overflow.append(wallet)
+    return shards, overflow
+
+
+def subscription(method: str, kind: str, **fields) -> str:
+    return json.dumps({"method": method, "subscription": {"type": kind, **fields}})
+
+
+class WalletRegistry:
+    """
+    In-memory set of the wallets to monitor: the static ones plus tracked
+    wallets in one of `statuses`, in stable (first seen) order.
+
+    Loaded from tracked_wallets once; every refresh() after that only reads
+    the wallets written since the previous one (by updated_at, with
+    CURSOR_OVERLAP of slack for clock skew and in-flight writes). Deleted
+    documents do not show up that way, so a full reload still runs every
+    FULL_RELOAD_INTERVAL.
+    """
+
+    CURSOR_OVERLAP = timedelta(seconds=5)
+    FULL_RELOAD_INTERVAL = 3600.0  # seconds
+
+    def __init__(self, statuses=TARGET_STATUSES, static: list[str] = ()):
+        self.statuses = frozenset(statuses)
+        self.static = frozenset(static)
+        # Insertion-ordered set of addresses
+        self._wallets: dict[str, None] = dict.fromkeys(static)
+        self._cursor: datetime | None = None
+        self._loaded_at = 0.0
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._wallets
+
+    def __len__(self) -> int:
+        return len(self._wallets)
+
+    def wallets(self) -> list[str]:
+        return list(self._wallets)
+
+    def _wanted(self, row: dict) -> bool:
+        return row["address"] in self.static or row.get("status") in self.statuses
+
+    async def refresh(self, storage) -> bool:
+        """Apply tracked_wallets changes; returns whether the wallet set changed."""
+        started = datetime.now(UTC)
+        if self._cursor is None or (
+            time.time() - self._loaded_at >= self.FULL_RELOAD_INTERVAL
+        ):
+            rows = await storage.get_wallets_updated_since(None)
+            wanted = {r["address"] for r in rows if self._wanted(r)} | self.static
+            wallets = {a: None for a in self._wallets if a in wanted}
+            wallets.update((r["address"], None) for r in rows if r["address"] in wanted)
+            changed = wallets.keys() != self._wallets.keys()
+            self._wallets = wallets
+            self._loaded_at = time.time()
+        else:
+            rows = await storage.get_wallets_updated_since(
+                self._cursor - self.CURSOR_OVERLAP
+            )
+            changed = False
+            for row in rows:
+                address = row["address"]
+                if self._wanted(row):
+                    if address not in self._wallets:
+                        self._wallets[address] = None
+                        changed = True
+                elif address in self._wallets:
+                    del self._wallets[address]
+                    changed = True
+        self._cursor = started
+        return changed
+
+
+@dataclass
+class WalletStats:
+    account_value: float = 0.0
+    notional: float = 0.0
+    # Moving average of how often a refresh found a new state (0..1)
+    change_rate: float = 0.5
+    refreshes: int = 0
+    last_refresh: float | None = None
+    tier: str = "cold"
+
+
+class WalletScheduler:
+    """
+    Priority queue deciding which wallet to refresh next.
+
+    Each wallet is scored by account value, position notional and how often
+    its refreshes find a new state (a moving average, so wallets that never
+    change decay towards zero). The score picks a tier, and each tier has a
+    refresh SLA (HYPERLIQUID_TIER_SLAS). Every tier is a heap ordered by due
+    time; next() serves the due wallet that is furthest behind its SLA
+    (staleness / SLA), so a hot whale five seconds late beats a cold wallet an
+    hour late, and new wallets are due immediately.
+    """
+
+    # Minimum score per tier, best first
+    TIER_SCORES: ClassVar[tuple[tuple[str, float], ...]] = (
+        ("hot", 12.0),
+        ("warm", 7.0),
+        ("cold", 0.0),
+    )
+    # Max seconds between refreshes per tier (HYPERLIQUID_TIER_SLAS overrides)
+    DEFAULT_SLAS: ClassVar[dict[str, float]] = {
+        "hot": 60.0,
+        "warm": 900.0,
+        "cold": 21600.0,
+    }
+    # Weight of the newest refresh in change_rate
+    CHANGE_ALPHA = 0.3
+
+    def __init__(self, slas: dict[str, float] | None = None):
+        overrides = settings.HYPERLIQUID_TIER_SLAS if slas is None else slas
+        unknown = overrides.keys() - self.DEFAULT_SLAS.keys()
+        if unknown:
+            raise ValueError(f"Unknown wallet tiers in SLAs: {sorted(unknown)}")
+        self.slas = {**self.DEFAULT_SLAS, **overrides}
+        self.stats: dict[str, WalletStats] = {}
+        # tier -> heap of (due, seq, wallet); stale entries are skipped
+        self._heaps: dict[str, list] = {tier: [] for tier, _ in self.TIER_SCORES}
+        self._due: dict[str, float] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def score(cls, stats: WalletStats) -> float:
+        return (
+            math.log10(1 + max(stats.account_value, 0.0))
+            + math.log10(1 + max(stats.notional, 0.0))
+            + 4 * stats.change_rate
+        )
+
+    @classmethod
+    def tier_for(cls, stats: WalletStats) -> str:
+        score = cls.score(stats)
+        return next(tier for tier, floor in cls.TIER_SCORES if score >= floor)
+
+    def _schedule(self, wallet: str, due: float):
+        self._due[wallet] = due
+        tier = self.stats[wallet].tier
+        heapq.heappush(self._heaps[tier], (due, next(self._seq), wallet))
+
+    def _head(self, tier: str):
+        """The tier's earliest valid (due, seq, wallet), dropping stale entries."""
+        heap = self._heaps[tier]
+        while heap:
+            due, _, wallet = heap[0]
+            stats = self.stats.get(wallet)
+            if stats is not None and stats.tier == tier and self._due[wallet] == due:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def sync(self, wallets: list[str], now: float | None = None):
+        """Track exactly `wallets`: new ones are due now, removed ones dropped."""
+        now = time.time() if now is None else now
+        wanted = set(wallets)
+        for wallet in self.stats.keys() - wanted:
+            del self.stats[wallet]
+            del self._due[wallet]
+        for wallet in wallets:
+            if wallet not in self.stats:
+                self.stats[wallet] = WalletStats()
+                self._schedule(wallet, now)
+
+    def wait(self, now: float | None = None, tiers=None) -> float | None:
+        """
+        Seconds until a wallet (of `tiers`, default all) is due (0 if one is),
+        None if there are none.
+        """
+        now = time.time() if now is None else now
+        tiers = self._heaps if tiers is None else tiers
+        heads = [h for h in map(self._head, tiers) if h is not None]
+        if not heads:
+            return None
+        return max(0.0, min(due for due, _, _ in heads) - now)
+
+    def next(self, now: float | None = None, tiers=None) -> str | None:
+        """
+        Take the due wallet (of `tiers`, default all) furthest behind its SLA,
+        None if nothing is due. It is rescheduled one SLA ahead until record()
+        reports the refresh.
+        """
+        now = time.time() if now is None else now
+        best, behind = None, -1.0
+        for tier in self._heaps if tiers is None else tiers:
+            head = self._head(tier)
+            if head is not None and head[0] <= now:
+                lateness = (now - head[0]) / self.slas[tier]
+                if lateness > behind:
+                    best, behind = tier, lateness
+        if best is None:
+            return None
+        _, _, wallet = heapq.heappop(self._heaps[best])
+        self._schedule(wallet, now + self.slas[best])
+        return wallet
+
+    def record(
+        self, wallet: str, parsed: dict, changed: bool, now: float | None = None
+    ):
+        """Account a refresh (`changed`: it found a new state) and reschedule."""
+        stats = self.stats.get(wallet)
+        if stats is None:
+            return
+        now = time.time() if now is None else now
+        summary = parsed.get("summary", {})
+        stats.account_value = float(summary.get("account_value") or 0.0)
+        stats.notional = float(summary.get("total_ntl_pos") or 0.0)
+        # A wallet's first refresh is always a new state; it says nothing
+        if stats.refreshes:
+            stats.change_rate += self.CHANGE_ALPHA * (changed - stats.change_rate)
+        stats.refreshes += 1
+        stats.last_refresh = now
+        stats.tier = self.tier_for(stats)
+        self._schedule(wallet, now + self.slas[stats.tier])
+
+    def metrics(self, now: float | None = None) -> dict[str, dict]:
+        """Per tier: wallets, SLA, how many are overdue and how far behind."""
+        now = time.time() if now is None else now
+        metrics = {
+            tier: {
+                "wallets": 0,
+                "sla": sla,
+                "never_refreshed": 0,
+                "overdue": 0,
+                "max_behind": 0.0,
+            }
+            for tier, sla in self.slas.items()
+        }
+        for stats in self.stats.values():
+            tier = metrics[stats.tier]
+            tier["wallets"] += 1
+            if stats.last_refresh is None:
+                tier["never_refreshed"] += 1
+                continue
+            behind = now - stats.last_refresh - tier["sla"]
+            if behind > 0:
+                tier["overdue"] += 1
+                tier["max_behind"] = max(tier["max_behind"], behind)
+        return metrics
+
+
+class TokenBucket:
+    """
+    Weight-aware rate limiter: `rate` weight per second, bursting up to
+    `capacity`. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, weight: float):
+        weight = min(weight, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < weight:
+                await asyncio.sleep((weight - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= weight
+
+    def drain(self, seconds: float):
+        """Owe `seconds` worth of weight (the server said we are too fast)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class HyperliquidPoller:
+    """
+    HTTP path for wallets where a WebSocket subscription is overkill.
+
+    Fetches clearinghouseState and openOrders from /info for batches of
+    wallets over one pooled HTTP/2 client, within a weight budget
+    (HYPERLIQUID_POLL_WEIGHT_PER_MINUTE, Hyperliquid's per-IP request weight)
+    and HYPERLIQUID_POLL_CONCURRENCY requests in flight. The result goes
+    through the monitor's process_wallet_data, exactly like a webData2 update.
+    """
+
+    # Request weight per /info type
+    WEIGHTS: ClassVar[dict[str, int]] = {"clearinghouseState": 2, "openOrders": 20}
+    # Back off this long when rate limited (429)
+    RATE_LIMIT_PAUSE = 10.0  # seconds
+
+    def __init__(
+        self,
+        monitor: "HyperliquidMonitor",
+        weight_per_minute: int | None = None,
+        concurrency: int | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.monitor = monitor
+        weight_per_minute = (
+            weight_per_minute or settings.HYPERLIQUID_POLL_WEIGHT_PER_MINUTE
+        )
+        # Up to ten seconds of budget in one burst
+        self.bucket = TokenBucket(weight_per_minute / 60, weight_per_minute / 6)
+        self.concurrency = concurrency or settings.HYPERLIQUID_POLL_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=transport,
+        )
+
+    async def info(self, payload: dict):
+        """One /info request, paced by its weight"""
+        await self.bucket.acquire(self.WEIGHTS[payload["type"]])
+        async with self.semaphore:
+            resp = await self.client.post(self.monitor.api_url, json=payload)
+        if resp.status_code == 429:
+            self.bucket.drain(self.RATE_LIMIT_PAUSE)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def poll_wallet(self, wallet_address: str):
+        """Fetch one wallet's state and process it like a webData2 update"""
+        # Wait for both requests even if one fails, so none outlives the poll
+        state, orders = await asyncio.gather(
+            self.info({"type": "clearinghouseState", "user": wallet_address}),
+            self.info({"type": "openOrders", "user": wallet_address}),
+            return_exceptions=True,
+        )
+        for result in (state, orders):
+            if isinstance(result, BaseException):
+                raise result
+        await self.monitor.process_wallet_data(
+            wallet_address,
+            {"data": {"clearinghouseState": state, "openOrders": orders}},
+        )
+
+    async def poll(self, wallets: list[str]) -> int:
+        """Poll a batch of wallets; returns how many were refreshed"""
+        results = await asyncio.gather(
+            *(self.poll_wallet(w) for w in wallets), return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning(f"Polling failed for {len(failed)} wallets: {failed[0]}")
+        return len(wallets) - len(failed)
+
+    async def close(self):
+        await self.client.aclose()
+
+
 class HyperliquidMonitor:
     """
     Stealth Hyperliquid WebSocket Monitor
     - Monitors specific wallet addresses using webData2 subscription
     - Mimics browser behavior to avoid detection
-    - Rotates through multiple wallets
+    - Rotates through multiple wallets, or multiplexes them (see start_multiplexed)
     """
 
-    def __init__(self, wallets: Optional[List[str]] = None):
+    # How often wallet changes are read (and, multiplexed, re-sharded)
+    WALLET_REFRESH_INTERVAL = 60.0  # seconds
+    # Rotate mode: how long to wait for a wallet's update before moving on,
+    # and how often scheduler metrics are logged
+    REFRESH_TIMEOUT = 30.0  # seconds
+    METRICS_INTERVAL = 60.0  # seconds
+    # Reconnect backoff: RECONNECT_BASE doubling up to RECONNECT_MAX, reset
+    # once a connection has stayed up for RECONNECT_RESET
+    RECONNECT_BASE = 2.0  # seconds
+    RECONNECT_MAX = 120.0  # seconds
+    RECONNECT_RESET = 60.0  # seconds
+
+    def __init__(self, wallets: Optional[list[str]] = None, mode: str | None = None):
         self.ws_url = "wss://api.hyperliquid.xyz/ws"
         self.api_url = "https://api.hyperliquid.xyz/info"
-        self.queue = MessageQueue()
+        self.queue = get_queue()
         self.running = False
 
         # Static wallet list (if provided)
         self.static_wallets = wallets or []
 
-        # Dynamic wallet tracking (from DB)
-        self.current_wallet_index = 0
+        # Dynamic wallet tracking (from DB), refreshed in priority order
+        self.registry = WalletRegistry(TARGET_STATUSES, self.static_wallets)
+        self.scheduler = WalletScheduler()
+        # Rotate mode: tiers refreshed over HTTP, and the rest over the socket
+        self.poll_tiers = [
+            t for t in self.scheduler.slas if t in settings.HYPERLIQUID_POLL_TIERS
+        ]
+        self.socket_tiers = [t for t in self.scheduler.slas if t not in self.poll_tiers]
+        self.wallets_synced_at = 0.0
+        self.metrics_logged_at = 0.0
 
         # Connection state
         self.connection_count = 0
         self.last_activity = time.time()
-        self.last_mids: Dict[str, float] = {}  # Store live mid prices
+        self.last_mids: dict[str, float] = {}  # Store live mid prices
 
-    async def get_all_target_wallets(self):
-        """Fetch both static and active dynamic wallets from DB"""
-        wallets = set(self.static_wallets)
+        self.mode = mode or settings.HYPERLIQUID_MONITOR_MODE
+        # Multiplexed mode: wallets per connection, bumped on every re-shard
+        self.shards: list[set[str]] = []
+        self.shard_version = 0
+        # Wallets already marked initial_scan_complete by this process
+        self.scanned: set[str] = set()
 
-        # Fetch from DB: discovered or currently monitoring
+    async def refresh_wallets(self) -> bool:
+        """Pick up tracked_wallets changes; returns whether the wallet set changed"""
         try:
-            from punisher.db.mongo import mongo
-
-            db = await mongo.get_db()
-            cursor = db.tracked_wallets.find(
-                {
-                    "status": {
-                        "$in": ["discovered", "monitoring", "initial_scan_complete"]
-                    }
-                }
-            )
-            async for w in cursor:
-                wallets.add(w["address"])
+            return await self.registry.refresh(get_storage())
         except Exception as e:
             logger.error(f"Failed to fetch wallets from DB: {e}")
+            return False
+
+    def target_wallets(self) -> list[str]:
+        """Static and dynamic wallets, in stable order"""
+        wallets = self.registry.wallets()
 
         # Fallback to config if nothing else exists
         if not wallets and settings.HYPERLIQUID_WALLET_ADDRESS:
-            wallets.add(settings.HYPERLIQUID_WALLET_ADDRESS)
+            wallets.append(settings.HYPERLIQUID_WALLET_ADDRESS)
 
-        return list(wallets)
+        return wallets
+
+    async def get_all_target_wallets(self):
+        """Fetch both static and active dynamic wallets (incrementally) from DB"""
+        await self.refresh_wallets()
+        return self.target_wallets()
 
     async def update_wallet_status(self, address: str, status: str):
         """Update the scan/monitor status of a wallet in DB"""
         try:
-            from punisher.db.mongo import mongo
-
-            db = await mongo.get_db()
-            await db.tracked_wallets.update_one(
-                {"address": address},
-                {
-                    "$set": {
-                        "status": status,
-                        "last_scan_at": datetime.now(UTC),
-                    }
-                },
-                upsert=True,  # In case it was a static wallet not in DB yet
-            )
+            await get_storage().set_wallet_status(address, status)
         except Exception as e:
             logger.error(f"Failed to update wallet status: {e}")
 
@@ -170,40 +574,10 @@ class HyperliquidMonitor:
         total_delay = max(0.05, delay + jitter)
         await asyncio.sleep(total_delay)
 
-    def get_current_wallet(self):
-        """Get current target wallet"""
-        if not self.wallets:
-            return None
-        return self.wallets[self.current_wallet_index % len(self.wallets)]
-
-    def advance_to_next_wallet(self, current_list_size: int):
-        """Move to next wallet with human-like selection"""
-        if current_list_size <= 1:
-            return
-
-        # Sometimes skip wallets or go back (human behavior)
-        if random.random() < 0.1:  # 10% chance to skip
-            self.current_wallet_index = (
-                self.current_wallet_index + 2
-            ) % current_list_size
-        elif random.random() < 0.05:  # 5% chance to go back
-            self.current_wallet_index = (
-                self.current_wallet_index - 1
-            ) % current_list_size
-        else:
-            self.current_wallet_index = (
-                self.current_wallet_index + 1
-            ) % current_list_size
-
     async def connect_with_stealth(self):
         """Establish connection with maximum stealth"""
         self.connection_count += 1
 
-        if self.connection_count > 1:
-            reconnect_delay = random.uniform(3, 12)
-            logger.info(f"[⏳] Human-like pause: {reconnect_delay:.1f}s...")
-            await asyncio.sleep(reconnect_delay)
-
         ssl_context = self.create_ssl_context()
         headers = self.get_headers()
 
@@ -221,94 +595,272 @@ class HyperliquidMonitor:
         logger.info("[✅] Stealth connection established")
         return ws
 
-    async def subscribe_to_wallet(self, ws, wallet_address):
-        """Subscribe to both specific wallet and global mid prices"""
-        # 1. Subscribe to Wallet Data (webData2)
-        subscribe_wallet = {
-            "method": "subscribe",
-            "subscription": {"type": "webData2", "user": wallet_address},
-        }
-        await ws.send(json.dumps(subscribe_wallet))
-        logger.info(f"[📡] Monitoring wallet: {wallet_address[:10]}...")
+    def reconnect_delay(self, attempt: int) -> float:
+        """Exponential backoff (with jitter) before reconnect attempt `attempt`"""
+        delay = min(self.RECONNECT_MAX, self.RECONNECT_BASE * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
 
-        # 2. Subscribe to Global Prices (allMids)
-        subscribe_mids = {
-            "method": "subscribe",
-            "subscription": {"type": "allMids"},
-        }
-        await ws.send(json.dumps(subscribe_mids))
-        logger.info("[📈] Subscribed to Global Price Feed (allMids)")
+    async def rotate_wallet(self, ws, old: str | None, new: str):
+        """Move the socket's webData2 subscription from `old` to `new`"""
+        if old == new:
+            return
+        if old is not None:
+            await ws.send(subscription("unsubscribe", "webData2", user=old))
+            await self.human_delay()
+        await ws.send(subscription("subscribe", "webData2", user=new))
+        logger.info(f"[📡] Monitoring wallet: {new[:10]}...")
 
     async def start(self):
-        """Main monitoring loop"""
+        """
+        Main monitoring loop: one socket, rotating its webData2 subscription
+        from wallet to wallet (in WalletScheduler order, as each wallet falls
+        due) while allMids stays subscribed. Reconnects only on failure, with
+        exponential backoff, replaying both subscriptions.
+        """
+        if self.mode == "multiplex":
+            return await self.start_multiplexed()
         self.running = True
         logger.info("Starting Hyperliquid Stealth Monitor (Dynamic Mode)")
+        poller = asyncio.create_task(self.run_poller()) if self.poll_tiers else None
+        try:
+            await self.run_socket()
+        finally:
+            if poller is not None:
+                poller.cancel()
+
+    async def run_socket(self):
+        """Refresh the socket tiers' wallets over the rotating WebSocket"""
+        # Wallet being watched; survives reconnects so it can be replayed
+        current_wallet = None
+        attempt = 0
+        while self.running:
+            connected_at = time.time()
+            try:
+                ws = await self.connect_with_stealth()
+                try:
+                    await ws.send(subscription("subscribe", "allMids"))
+                    logger.info("[📈] Subscribed to Global Price Feed (allMids)")
+                    subscribed = None
+                    while self.running:
+                        if current_wallet is None:
+                            current_wallet = await self.next_wallet(ws)
+                            if current_wallet is None:
+                                break
+                        await self.rotate_wallet(ws, subscribed, current_wallet)
+                        subscribed = current_wallet
+
+                        # Until its update arrives, then move to the next wallet
+                        await self.listen(ws, current_wallet, self.REFRESH_TIMEOUT)
+                        current_wallet = None
+                finally:
+                    await ws.close()
 
+            except Exception as e:
+                # A connection that stayed up a while starts the backoff over
+                if time.time() - connected_at > self.RECONNECT_RESET:
+                    attempt = 0
+                attempt += 1
+                delay = self.reconnect_delay(attempt)
+                logger.error(
+                    f"Hyperliquid WS Error: {e} (reconnect #{attempt} in {delay:.1f}s)"
+                )
+                await asyncio.sleep(delay)
+
+    async def sync_scheduler(self):
+        """Every WALLET_REFRESH_INTERVAL, hand wallet changes to the scheduler"""
+        now = time.time()
+        if now - self.wallets_synced_at >= self.WALLET_REFRESH_INTERVAL:
+            self.wallets_synced_at = now
+            if await self.refresh_wallets() or not self.scheduler.stats:
+                self.scheduler.sync(self.target_wallets())
+        if now - self.metrics_logged_at >= self.METRICS_INTERVAL:
+            self.log_scheduler_metrics()
+            self.metrics_logged_at = now
+
+    async def next_wallet(self, ws) -> str | None:
+        """The scheduler's next due wallet, handling the feed while none is"""
         while self.running:
-            # Refresh wallet list on each loop iteration
-            wallets = await self.get_all_target_wallets()
-            if not wallets:
+            await self.sync_scheduler()
+            wallet = self.scheduler.next(tiers=self.socket_tiers)
+            if wallet is not None:
+                return wallet
+            wait = self.scheduler.wait(tiers=self.socket_tiers)
+            if wait is None:
                 logger.warning("No wallets to process yet...")
-                await asyncio.sleep(10)
-                continue
+                self.wallets_synced_at = 0.0
+                wait = 10.0
+            await self.listen(ws, None, min(wait, 10.0))
+        return None
+
+    async def run_poller(self):
+        """Refresh the HYPERLIQUID_POLL_TIERS wallets over HTTP, as they fall due"""
+        poller = HyperliquidPoller(self)
+        batch_size = poller.concurrency * 4
+        logger.info(f"Polling tiers {sorted(self.poll_tiers)} over HTTP")
+        try:
+            while self.running:
+                await self.sync_scheduler()
+                batch = []
+                while len(batch) < batch_size:
+                    wallet = self.scheduler.next(tiers=self.poll_tiers)
+                    if wallet is None:
+                        break
+                    batch.append(wallet)
+                if batch:
+                    await poller.poll(batch)
+                    continue
+                wait = self.scheduler.wait(tiers=self.poll_tiers)
+                await asyncio.sleep(10.0 if wait is None else min(wait, 10.0))
+        finally:
+            await poller.close()
+
+    def log_scheduler_metrics(self):
+        for tier, m in self.scheduler.metrics().items():
+            logger.info(
+                f"[⏱] {tier}: {m['wallets']} wallets, SLA {m['sla']:.0f}s,"
+                f" {m['overdue']} overdue (max {m['max_behind']:.0f}s behind),"
+                f" {m['never_refreshed']} never refreshed"
+            )
 
-            # Get wallet to process
-            current_wallet = wallets[self.current_wallet_index % len(wallets)]
+    async def listen(self, ws, wallet_address: str | None, seconds: float):
+        """
+        Handle the socket's messages for up to `seconds`, returning early once
+        an update for `wallet_address` (if any) has been processed
+        """
+        deadline = time.time() + seconds
+        while self.running and time.time() < deadline:
+            try:
+                msg = await asyncio.wait_for(
+                    ws.recv(), timeout=min(30, max(0.0, deadline - time.time()))
+                )
+            except TimeoutError:
+                # Keepalive pings (ping_interval) detect a dead socket
+                logger.debug("[⏰] Waiting for data...")
+                continue
+            self.last_activity = time.time()
+            data = json.loads(msg)
+            channel = data.get("channel")
+
+            if channel == "webData2" and wallet_address is not None:
+                # Updates for the previous wallet may still be in flight
+                user = str(data.get("data", {}).get("user", wallet_address))
+                if user.lower() == wallet_address.lower():
+                    await self.process_wallet_data(wallet_address, data)
+                    return
+            elif channel == "allMids":
+                await self.process_mids(data)
+
+    async def start_multiplexed(self):
+        """
+        Multiplexed monitoring: every target wallet stays subscribed.
+
+        Wallets are sharded over HYPERLIQUID_WS_CONNECTIONS sockets with up to
+        HYPERLIQUID_WS_SUBSCRIPTIONS webData2 subscriptions each, and updates
+        are routed to their wallet by the `user` field. The wallet list is
+        refreshed every WALLET_REFRESH_INTERVAL; when it changed, connections
+        subscribe and unsubscribe the difference instead of reconnecting.
+        """
+        self.running = True
+        connections = settings.HYPERLIQUID_WS_CONNECTIONS
+        logger.info(
+            f"Starting Hyperliquid Stealth Monitor (Multiplexed: {connections} connections)"
+        )
+        self.shards = [set() for _ in range(connections)]
+        tasks = [
+            asyncio.create_task(self.run_connection(i)) for i in range(connections)
+        ]
+        try:
+            while self.running:
+                if await self.refresh_wallets() or not self.shard_version:
+                    self.reshard(self.target_wallets())
+                await asyncio.sleep(self.WALLET_REFRESH_INTERVAL)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def reshard(self, wallets: list[str]):
+        """Spread wallets over the connections (applied by each run_connection)."""
+        self.shards, overflow = shard_wallets(
+            wallets, len(self.shards), settings.HYPERLIQUID_WS_SUBSCRIPTIONS
+        )
+        self.shard_version += 1
+        if overflow:
+            logger.warning(
+                f"{len(overflow)} wallets over the multiplex capacity are not watched"
+            )
+        logger.info(f"Multiplexing {len(wallets) - len(overflow)} wallets")
 
+    async def run_connection(self, index: int):
+        """Keep connection `index` open and subscribed to its shard."""
+        attempt = 0
+        while self.running:
+            connected_at = time.time()
             try:
                 ws = await self.connect_with_stealth()
-                await self.subscribe_to_wallet(ws, current_wallet)
-
-                # Listen for data
-                timeout_seconds = random.randint(3, 8) * 60  # 3-8 minutes per wallet
-                start_time = time.time()
-
-                while self.running and (time.time() - start_time < timeout_seconds):
-                    try:
-                        msg = await asyncio.wait_for(ws.recv(), timeout=30)
-                        self.last_activity = time.time()
-                        data = json.loads(msg)
-                        channel = data.get("channel")
-
-                        if channel == "webData2":
-                            await self.process_wallet_data(current_wallet, data)
-                        elif channel == "allMids":
-                            from punisher.crypto.hyperliquid_parser import (
-                                parse_market_mids,
-                            )
-                            from punisher.db.mongo import mongo
-
-                            mids = parse_market_mids(data.get("data", {}))
-                            if mids:
-                                self.last_mids.update(mids)
-                                # Periodic save to DB (every ~10 messages or so for performance)
-                                if random.random() < 0.1:
-                                    await mongo.save_market_mids(mids)
-
-                                if "BTC" in mids:
-                                    logger.info(
-                                        f"[🔥] LIVE HL FEED: BTC @ ${mids['BTC']:,.2f}"
-                                    )
-
-                    except asyncio.TimeoutError:
-                        logger.debug("[⏰] Waiting for data...")
-                        try:
-                            await ws.ping()
-                        except Exception:
-                            break
-                        continue
-
-                # Graceful disconnect
-                disconnect_delay = random.uniform(1, 3)
-                await asyncio.sleep(disconnect_delay)
-                await ws.close()
-
-                # Move to next wallet
-                self.advance_to_next_wallet(len(wallets))
-
+                try:
+                    if index == 0:
+                        await ws.send(subscription("subscribe", "allMids"))
+                    await self.listen_multiplexed(ws, index)
+                finally:
+                    await ws.close()
             except Exception as e:
-                logger.error(f"Hyperliquid WS Error: {e}")
-                await asyncio.sleep(random.uniform(5, 15))
+                if time.time() - connected_at > self.RECONNECT_RESET:
+                    attempt = 0
+                attempt += 1
+                delay = self.reconnect_delay(attempt)
+                logger.error(
+                    f"Hyperliquid WS Error (connection {index}): {e}"
+                    f" (reconnect #{attempt} in {delay:.1f}s)"
+                )
+                await asyncio.sleep(delay)
+
+    async def listen_multiplexed(self, ws, index: int):
+        """Route updates on one connection, following its shard as it changes."""
+        # user (lowercase, as the feed sends it) -> wallet address
+        subscribed: dict[str, str] = {}
+        version = None
+        while self.running:
+            if version != self.shard_version:
+                version = self.shard_version
+                await self.sync_subscriptions(ws, self.shards[index], subscribed)
+            try:
+                msg = await asyncio.wait_for(ws.recv(), timeout=30)
+            except TimeoutError:
+                continue
+            self.last_activity = time.time()
+            data = json.loads(msg)
+            channel = data.get("channel")
+            if channel == "webData2":
+                user = str(data.get("data", {}).get("user", "")).lower()
+                wallet = subscribed.get(user)
+                if wallet is not None:
+                    await self.process_wallet_data(wallet, data)
+            elif channel == "allMids":
+                await self.process_mids(data)
+
+    async def sync_subscriptions(self, ws, wallets: set[str], subscribed: dict):
+        """Subscribe/unsubscribe webData2 so exactly `wallets` are subscribed."""
+        wanted = {wallet.lower(): wallet for wallet in wallets}
+        for user in subscribed.keys() - wanted.keys():
+            await ws.send(
+                subscription("unsubscribe", "webData2", user=subscribed[user])
+            )
+            del subscribed[user]
+        for user in wanted.keys() - subscribed.keys():
+            await ws.send(subscription("subscribe", "webData2", user=wanted[user]))
+            subscribed[user] = wanted[user]
+
+    async def process_mids(self, raw_data: dict):
+        """Track (and periodically store) the allMids price feed"""
+        mids = parse_market_mids(raw_data.get("data", {}))
+        if mids:
+            self.last_mids.update(mids)
+            # Periodic save to DB (every ~10 messages or so for performance)
+            if random.random() < 0.1:
+                await get_storage().save_market_mids(mids)
+
+            if "BTC" in mids:
+                logger.info(f"[🔥] LIVE HL FEED: BTC @ ${mids['BTC']:,.2f}")
 
     async def process_wallet_data(self, wallet_address: str, raw_data: dict):
         """Process, store, and broadcast wallet data"""
@@ -327,13 +879,20 @@ class HyperliquidMonitor:
 
             # Save to MongoDB
             try:
-                from punisher.db.mongo import mongo
-
-                await mongo.save_wallet_snapshot(wallet_address, parsed)
+                result = await get_storage().save_wallet_snapshot(
+                    wallet_address, parsed
+                )
+                self.scheduler.record(
+                    wallet_address, parsed, changed=result != "updated_timestamp"
+                )
                 logger.debug(f"Saved snapshot to MongoDB for {wallet_address[:8]}...")
 
-                # Update status to mark initial scan success
-                await self.update_wallet_status(wallet_address, "initial_scan_complete")
+                # Update status to mark initial scan success (once per wallet)
+                if wallet_address not in self.scanned:
+                    await self.update_wallet_status(
+                        wallet_address, "initial_scan_complete"
+                    )
+                    self.scanned.add(wallet_address)
 
             except Exception as db_err:
                 logger.warning(f"MongoDB save failed: {db_err}")
@@ -344,11 +903,13 @@ class HyperliquidMonitor:
 
             account_value = summary.get("account_value", 0.0)
 
+            # Collect the whole snapshot so it goes out as a single queue commit
+            broadcasts = []
+
             # Only broadcast if meaningful data
             if account_value > 0:
-                self.queue.push(
-                    "punisher:cli:out",
-                    f"[WALLET] {wallet_address[:8]}... Value: ${account_value:,.2f}",
+                broadcasts.append(
+                    f"[WALLET] {wallet_address[:8]}... Value: ${account_value:,.2f}"
                 )
 
             # Broadcast significant positions
@@ -359,11 +920,12 @@ class HyperliquidMonitor:
 
                 if abs(size) > 0:
                     emoji = "🟢" if pnl >= 0 else "🔴"
-                    self.queue.push(
-                        "punisher:cli:out",
-                        f"[POS] {emoji} {coin}: {size} | PnL: ${pnl:,.2f}",
+                    broadcasts.append(
+                        f"[POS] {emoji} {coin}: {size} | PnL: ${pnl:,.2f}"
                     )
 
+            self.queue.publish_many("punisher:cli:out", broadcasts, PRIORITY_BULK)
+
         except Exception as e:
             logger.error(f"Error processing wallet data: {e}")
 
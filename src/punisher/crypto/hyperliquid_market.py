@@ -8,7 +8,8 @@ import asyncio
 import logging
 import httpx
 import time
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_queue
+from punisher.bus.queue import PRIORITY_BULK
 
 logger = logging.getLogger("punisher.crypto.hyperliquid_market")
 
@@ -24,7 +25,7 @@ class HyperliquidMarketMonitor:
     def __init__(self, coin: str = "BTC"):
         self.api_url = "https://api.hyperliquid.xyz/info"
         self.coin = coin
-        self.queue = MessageQueue()
+        self.queue = get_queue()
         self.running = False
 
         # State tracking
@@ -121,9 +122,10 @@ class HyperliquidMarketMonitor:
                     else:
                         sentiment = "NEUTRAL ⚪"
 
-                    self.queue.push(
+                    self.queue.publish(
                         "punisher:cli:out",
                         f"[MARKET] {self.coin} {sentiment} | Imbalance: {imbalance * 100:+.1f}%",
+                        PRIORITY_BULK,
                     )
                     self.last_sentiment_time = now
 
@@ -146,6 +148,7 @@ class HyperliquidMarketMonitor:
 
             self.last_trades_hash = current_hash
 
+            alerts = []
             for trade in trades[:10]:  # Check last 10 trades
                 # Handle different trade formats
                 if isinstance(trade, dict):
@@ -161,7 +164,9 @@ class HyperliquidMarketMonitor:
                 if usd_value > 50000:
                     emoji = "🐋" if side in ["B", "buy"] else "🐻"
                     alert = f"[WHALE] {emoji} {side.upper()} {size:.4f} {self.coin} @ ${price:,.0f} (${usd_value / 1000:.1f}k)"
-                    self.queue.push("punisher:cli:out", alert)
+                    alerts.append(alert)
+
+            self.queue.publish_many("punisher:cli:out", alerts, PRIORITY_BULK)
 
         except Exception as e:
             logger.debug(f"Trades processing error: {e}")
@@ -1,6 +1,37 @@
 import datetime
+import hashlib
+import sys
+from array import array
 from typing import Dict, Any
 
+# Mantissa bits kept when fingerprinting numbers (~10 significant digits):
+# absorbs float noise without hiding real position or price changes
+FINGERPRINT_BITS = 34
+# blake2b digest size in bytes; stored as hex (32 chars)
+FINGERPRINT_SIZE = 16
+
+_DROPPED_BITS = 52 - FINGERPRINT_BITS
+_ROUND_HALF = 1 << (_DROPPED_BITS - 1)
+_ROUND_MASK = ~((1 << _DROPPED_BITS) - 1) & 0xFFFF_FFFF_FFFF_FFFF
+# Numeric fields of parsed positions/orders that make up the state
+_POSITION_NUMBERS = (
+    "size",
+    "entry_price",
+    "position_value",
+    "unrealized_pnl",
+    "roc",
+    "leverage",
+)
+_ORDER_NUMBERS = ("px", "sz")
+# Account fields of a wallet state (summary minus the snapshot time)
+STATE_SUMMARY_FIELDS = (
+    "account_value",
+    "total_ntl_pos",
+    "total_raw_usd",
+    "total_margin_used",
+    "withdrawable",
+)
+
 
 def safe_float(val: Any, default: float = 0.0) -> float:
     try:
@@ -97,3 +128,125 @@ def parse_trade_data(trade: dict) -> dict:
         "ts": trade.get("time"),
         "hash": trade.get("hash"),
     }
+
+
+def _by_coin(position: dict) -> str:
+    return str(position.get("coin"))
+
+
+def _by_order_id(order: dict) -> str:
+    return str(order.get("order_id", order.get("oid", "")))
+
+
+def snapshot_fingerprint(summary: dict, positions: list, orders: list) -> str:
+    """
+    Fixed-width digest of a wallet state: account value, total notional,
+    positions (by coin) and open orders (by order id). The encoding is canonical:
+    independent of list order, with numeric fields packed as little-endian
+    doubles whose low mantissa bits are rounded off, so float noise (repr,
+    0.1 + 0.2 vs 0.3, -0.0) never changes the digest.
+    """
+    numbers = [summary.get("account_value"), summary.get("total_ntl_pos")]
+    labels = []
+    for p in sorted(positions, key=_by_coin):
+        labels.append(f"P{p.get('coin')}")
+        numbers.extend([p.get(f) for f in _POSITION_NUMBERS])
+    for o in sorted(orders, key=_by_order_id):
+        labels.append(
+            f"O{_by_order_id(o)}:{o.get('coin')}:{o.get('side')}:{o.get('order_type')}"
+        )
+        numbers.extend([o.get(f) for f in _ORDER_NUMBERS])
+
+    # + 0.0 folds -0.0 into 0.0; reinterpret the doubles as uint64 and round
+    # the mantissa to FINGERPRINT_BITS
+    bits = array("Q", array("d", [float(n or 0.0) + 0.0 for n in numbers]).tobytes())
+    bits = array("Q", [(b + _ROUND_HALF) & _ROUND_MASK for b in bits])
+    if sys.byteorder == "big":
+        bits.byteswap()
+
+    h = hashlib.blake2b(bits.tobytes(), digest_size=FINGERPRINT_SIZE)
+    h.update("\x1f".join(labels).encode())
+    return h.hexdigest()
+
+
+def is_fingerprint(state_hash: Any) -> bool:
+    """True for digests from snapshot_fingerprint (not legacy str() hashes)."""
+    if not isinstance(state_hash, str) or len(state_hash) != FINGERPRINT_SIZE * 2:
+        return False
+    try:
+        int(state_hash, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def wallet_state(parsed: dict) -> dict:
+    """The comparable state of a parse_hyperliquid_data snapshot."""
+    summary = parsed.get("summary", {})
+    return {
+        "summary": {f: summary.get(f) for f in STATE_SUMMARY_FIELDS},
+        "positions": list(parsed.get("positions", [])),
+        "orders": list(parsed.get("orders", [])),
+    }
+
+
+def _diff_rows(prev: list, curr: list, key) -> dict:
+    before = {key(r): r for r in prev}
+    after = {key(r): r for r in curr}
+    diff = {}
+    changed = [r for k, r in after.items() if before.get(k) != r]
+    removed = [k for k in before if k not in after]
+    if changed:
+        diff["set"] = changed
+    if removed:
+        diff["del"] = removed
+    return diff
+
+
+def diff_wallet_state(prev: dict, curr: dict) -> dict:
+    """
+    Compact diff between two wallet_state() dicts: changed summary fields,
+    positions (by coin) and orders (by order id) that were added or changed
+    ("set", whole rows) and the keys of removed ones ("del"). Empty parts are
+    omitted, so an unchanged state diffs to {}.
+    """
+    diff = {}
+    prev_summary, curr_summary = prev.get("summary", {}), curr.get("summary", {})
+    summary = {
+        f: curr_summary.get(f)
+        for f in curr_summary
+        if curr_summary.get(f) != prev_summary.get(f)
+    }
+    if summary:
+        diff["summary"] = summary
+    positions = _diff_rows(prev.get("positions", []), curr["positions"], _by_coin)
+    if positions:
+        diff["positions"] = positions
+    orders = _diff_rows(prev.get("orders", []), curr["orders"], _by_order_id)
+    if orders:
+        diff["orders"] = orders
+    return diff
+
+
+def _apply_rows(rows: list, diff: dict, key) -> list:
+    if not diff:
+        return rows
+    merged = {key(r): r for r in rows}
+    for k in diff.get("del", []):
+        merged.pop(k, None)
+    for r in diff.get("set", []):
+        merged[key(r)] = r
+    return list(merged.values())
+
+
+def apply_wallet_diff(state: dict, diff: dict) -> dict:
+    """Apply a diff_wallet_state() diff to a state, returning a new state."""
+    return {
+        "summary": {**state.get("summary", {}), **diff.get("summary", {})},
+        "positions": _apply_rows(
+            state.get("positions", []), diff.get("positions"), _by_coin
+        ),
+        "orders": _apply_rows(
+            state.get("orders", []), diff.get("orders"), _by_order_id
+        ),
+    }
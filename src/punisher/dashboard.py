@@ -1,4 +1,5 @@
 import asyncio
+import os
 from datetime import datetime
 from rich.live import Live
 from rich.panel import Panel
@@ -6,10 +7,10 @@ from rich.layout import Layout
 from rich.table import Table
 from rich.console import Console
 from rich import box
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_async_queue
 
 console = Console()
-queue = MessageQueue()
+queue = get_async_queue()
 
 
 class SatoshiDashboard:
@@ -20,6 +21,7 @@ class SatoshiDashboard:
         self.last_whale = "None"
         self.account_value = "0.00"
         self.start_time = datetime.now()
+        self.consumer = f"dashboard:{os.getpid()}"
 
     def make_layout(self):
         self.layout.split(
@@ -86,59 +88,61 @@ class SatoshiDashboard:
         footer_content = f"[dim]Uptime: {uptime} | Monitoring {len(self.positions)} pairs | Press CTRL+C to detach[/]"
         self.layout["footer"].update(Panel(footer_content, border_style="dim"))
 
+    def handle_message(self, msg: str):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+
+        if "[WALLET]" in msg:
+            parts = msg.replace("[WALLET]", "").strip().split(" Value: ")
+            if len(parts) >= 2:
+                self.last_whale = parts[0]
+                self.account_value = parts[1].replace("$", "")
+                self.messages.append(
+                    {
+                        "time": timestamp,
+                        "type": "[bold blue]WHALE[/]",
+                        "content": f"Target: {self.last_whale}",
+                    }
+                )
+
+        elif "[POS]" in msg:
+            content = msg.replace("[POS]", "").strip()
+            if ":" in content and "PnL: " in content:
+                parts = content.split(":")
+                coin = parts[1].split("|")[0].strip()
+                pnl_part = content.split("PnL: ")[1].replace("$", "").replace(",", "")
+                side = "LONG" if "🟢" in content else "SHORT"
+
+                self.positions[coin] = {"side": side, "pnl": pnl_part}
+                self.messages.append(
+                    {
+                        "time": timestamp,
+                        "type": "[bold green]POS[/]",
+                        "content": f"{side} {coin} update",
+                    }
+                )
+
+        elif "[💎]" in msg:
+            self.messages.append(
+                {
+                    "time": timestamp,
+                    "type": "[bold magenta]INTEL[/]",
+                    "content": msg.replace("[💎]", "").strip(),
+                }
+            )
+
     async def run(self):
         self.make_layout()
         with Live(self.layout, refresh_per_second=4, screen=True):
             while True:
-                msg = queue.pop("punisher:cli:out", timeout=0)
-                if msg:
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-
-                    if "[WALLET]" in msg:
-                        parts = msg.replace("[WALLET]", "").strip().split(" Value: ")
-                        if len(parts) >= 2:
-                            self.last_whale = parts[0]
-                            self.account_value = parts[1].replace("$", "")
-                            self.messages.append(
-                                {
-                                    "time": timestamp,
-                                    "type": "[bold blue]WHALE[/]",
-                                    "content": f"Target: {self.last_whale}",
-                                }
-                            )
-
-                    elif "[POS]" in msg:
-                        content = msg.replace("[POS]", "").strip()
-                        if ":" in content and "PnL: " in content:
-                            parts = content.split(":")
-                            coin = parts[1].split("|")[0].strip()
-                            pnl_part = (
-                                content.split("PnL: ")[1]
-                                .replace("$", "")
-                                .replace(",", "")
-                            )
-                            side = "LONG" if "🟢" in content else "SHORT"
-
-                            self.positions[coin] = {"side": side, "pnl": pnl_part}
-                            self.messages.append(
-                                {
-                                    "time": timestamp,
-                                    "type": "[bold green]POS[/]",
-                                    "content": f"{side} {coin} update",
-                                }
-                            )
-
-                    elif "[💎]" in msg:
-                        self.messages.append(
-                            {
-                                "time": timestamp,
-                                "type": "[bold magenta]INTEL[/]",
-                                "content": msg.replace("[💎]", "").strip(),
-                            }
-                        )
+                # A whale snapshot arrives as a burst; drain it in one go, render once.
+                # Idle waits are bounded by the refresh rate so the clock keeps ticking.
+                batch = await queue.subscribe(
+                    "punisher:cli:out", self.consumer, max_n=100, timeout=0.25
+                )
+                for msg in batch:
+                    self.handle_message(msg)
 
                 self.update()
-                await asyncio.sleep(0.05)
 
 
 def main():
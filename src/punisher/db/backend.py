@@ -0,0 +1,111 @@
+"""
+Storage backend selection.
+
+STORAGE_BACKEND=mongo (default) keeps everything in MongoDB.
+STORAGE_BACKEND=sqlite keeps it in one embedded SQLite file
+(STORAGE_SQLITE_PATH): no server and no network round trips, for single-box
+deployments and offline load tests. Both implement Storage, so callers only
+ask for "the storage".
+"""
+
+from datetime import datetime
+from typing import AsyncIterator, Protocol
+
+from punisher.config import settings
+
+
+class Storage(Protocol):
+    """The storage operations the application uses."""
+
+    # Wallet states
+    async def save_wallet_snapshot(self, wallet_address: str, parsed_data: dict): ...
+
+    async def get_latest_snapshots(
+        self, wallet_address: str, limit: int = 10
+    ) -> list[dict]: ...
+
+    async def get_recent_snapshots(self, limit: int = 10) -> list[dict]: ...
+
+    async def get_wallet_state_at(
+        self, wallet_address: str, ts: datetime
+    ) -> dict | None: ...
+
+    def get_wallet_changes(
+        self, wallet_address: str, since: datetime
+    ) -> AsyncIterator[dict]: ...
+
+    # Market data
+    async def save_trade(self, coin: str, trade_data: dict): ...
+
+    async def save_market_mids(self, mids: dict): ...
+
+    async def save_market_sentiment(
+        self, coin: str, imbalance: float, sentiment: str
+    ): ...
+
+    async def rollup_market_bars(self, since: datetime | None = None) -> datetime: ...
+
+    async def get_market_bars(
+        self,
+        coin: str,
+        start: datetime,
+        end: datetime | None = None,
+        max_points: int = 500,
+        resolution: str | None = None,
+    ) -> list[dict]: ...
+
+    # Chat
+    async def save_chat_message(self, session_id: str, role: str, content: str): ...
+
+    async def get_chat_history(
+        self, session_id: str, limit: int = 20
+    ) -> list[dict]: ...
+
+    async def get_chat_page(
+        self, session_id: str, limit: int = 50, before: str | None = None
+    ) -> dict: ...
+
+    # Tracked wallets
+    async def upsert_discovered_wallets(
+        self, wallets: list[dict], source: str, range_id=None
+    ) -> int: ...
+
+    async def get_target_wallets(self, statuses: list[str]) -> list[str]: ...
+
+    async def get_wallets_updated_since(
+        self, since: datetime | None = None
+    ) -> list[dict]: ...
+
+    async def set_wallet_status(self, address: str, status: str): ...
+
+    async def get_recent_wallets(self, limit: int = 3) -> list[dict]: ...
+
+    async def count_wallets(self) -> int: ...
+
+    # Agents
+    async def get_agent_config(self, agent_id: str) -> dict | None: ...
+
+    async def get_agent_configs(self) -> list[dict]: ...
+
+    async def save_agent_config(self, agent_id: str, fields: dict): ...
+
+    async def log_task(self, agent: str, task: str, status: str = "completed"): ...
+
+    async def get_agent_tasks(
+        self, agent: str | None = None, limit: int = 50
+    ) -> list[dict]: ...
+
+    # Maintenance (see punisher.db.retention)
+    async def apply_retention(self) -> dict[str, int]: ...
+
+    async def close(self): ...
+
+
+def get_storage() -> Storage:
+    if settings.STORAGE_BACKEND == "sqlite":
+        from punisher.db.sqlite import SQLiteStorage
+
+        return SQLiteStorage.get_instance()
+    from punisher.db.mongo import mongo
+
+    return mongo
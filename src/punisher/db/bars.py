@@ -0,0 +1,27 @@
+"""
+OHLC bar resolutions and alignment, shared by the storage backends.
+"""
+
+from datetime import datetime, timedelta
+
+# Bar resolution -> seconds, finest first
+BAR_RESOLUTIONS = {"1m": 60, "1h": 3600}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def bar_start(ts: datetime, resolution: str) -> datetime:
+    """Start of the bar containing ts (naive UTC)."""
+    step = timedelta(seconds=BAR_RESOLUTIONS[resolution])
+    return _EPOCH + (ts - _EPOCH) // step * step
+
+
+def pick_resolution(start: datetime, end: datetime, max_points: int = 500) -> str:
+    """
+    Finest bar resolution that covers [start, end) in at most max_points bars,
+    falling back to the coarsest one for very long ranges.
+    """
+    span = (end - start).total_seconds()
+    for resolution, seconds in BAR_RESOLUTIONS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return resolution
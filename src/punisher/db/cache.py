@@ -0,0 +1,70 @@
+"""
+In-process cache of recent chat messages, shared by the storage backends.
+"""
+
+from collections import OrderedDict, deque
+
+
+class ChatCache:
+    """
+    Bounded LRU of the newest messages per chat session.
+
+    Keeps up to `messages` newest messages for up to `sessions` sessions. An
+    entry is loaded from storage on a miss and kept current by
+    save_chat_message, so hot sessions are read from memory. Messages are
+    dicts with "role", "content", "timestamp" and the backend's paging
+    "cursor".
+    """
+
+    def __init__(self, sessions: int = 256, messages: int = 100):
+        self.sessions = sessions
+        self.messages = messages
+        # session -> (newest messages, oldest first; whole history cached?)
+        self._entries: OrderedDict[str, tuple[deque, bool]] = OrderedDict()
+        # Messages saved while a session is being loaded from storage
+        self._loading: dict[str, list[dict]] = {}
+
+    def get(self, session_id: str, limit: int) -> list[dict] | None:
+        """The newest `limit` messages, or None if the cache cannot answer."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        messages, complete = entry
+        if len(messages) < limit and not complete:
+            return None
+        self._entries.move_to_end(session_id)
+        return list(messages)[-limit:]
+
+    def begin_load(self, session_id: str):
+        """Collect messages saved until put(), which the load may have missed."""
+        self._loading.setdefault(session_id, [])
+
+    def end_load(self, session_id: str):
+        """Abandon a load that failed."""
+        self._loading.pop(session_id, None)
+
+    def put(self, session_id: str, messages: list[dict], complete: bool):
+        """Cache a session's newest messages (oldest first)."""
+        loaded = {m["cursor"] for m in messages}
+        missed = self._loading.pop(session_id, [])
+        messages = messages + [m for m in missed if m["cursor"] not in loaded]
+        self._entries[session_id] = (
+            deque(messages[-self.messages :], maxlen=self.messages),
+            complete and len(messages) <= self.messages,
+        )
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.sessions:
+            self._entries.popitem(last=False)
+
+    def append(self, session_id: str, message: dict):
+        """Record a new message for a cached session (others load on next read)."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            if session_id in self._loading:
+                self._loading[session_id].append(message)
+            return
+        messages, complete = entry
+        if len(messages) == self.messages:
+            complete = False
+        messages.append(message)
+        self._entries[session_id] = (messages, complete)
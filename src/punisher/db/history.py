@@ -0,0 +1,34 @@
+"""
+Wallet state history entries (keyframes and diffs), shared by the storage
+backends.
+"""
+
+from punisher.config import settings
+from punisher.crypto.hyperliquid_parser import diff_wallet_state, wallet_state
+
+
+def next_history_entry(
+    history: dict[str, tuple[int, dict]], wallet_address: str, parsed_data: dict
+) -> dict | None:
+    """
+    The wallet_history entry for a new wallet state: a full keyframe
+    ({"kind": "key", "state"}) for the first change seen per wallet and then
+    for every SNAPSHOT_KEYFRAME_EVERY-th change (so at most
+    SNAPSHOT_KEYFRAME_EVERY - 1 deltas follow a keyframe), a diff against the
+    previous state ({"kind": "delta", "diff"}) otherwise; None if nothing
+    changed. history maps wallet -> (deltas since its keyframe, last state)
+    and is updated.
+    """
+    state = wallet_state(parsed_data)
+    changes, prev = history.get(wallet_address, (None, None))
+    if prev is None or changes >= settings.SNAPSHOT_KEYFRAME_EVERY - 1:
+        entry = {"kind": "key", "state": state}
+        changes = 0
+    else:
+        diff = diff_wallet_state(prev, state)
+        if not diff:
+            return None
+        entry = {"kind": "delta", "diff": diff}
+        changes += 1
+    history[wallet_address] = (changes, state)
+    return entry
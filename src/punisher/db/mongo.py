@@ -2,10 +2,32 @@
 MongoDB Client for Hyperliquid WebSocket data storage
 """
 
+import asyncio
 import logging
-from datetime import datetime
+import time
+from datetime import UTC, datetime, timedelta
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from punisher.config import settings
+from punisher.crypto.hyperliquid_parser import (
+    apply_wallet_diff,
+    diff_wallet_state,
+    is_fingerprint,
+    snapshot_fingerprint,
+    wallet_state,
+)
+from punisher.db.bars import bar_start, pick_resolution
+from punisher.db.cache import ChatCache
+from punisher.db.history import next_history_entry
+from punisher.db.retention import (
+    DOWNSAMPLE,
+    RETENTION,
+    UNIT_SECONDS,
+    archive_documents,
+    retention_seconds,
+)
 
 logger = logging.getLogger("punisher.db.mongo")
 
@@ -13,6 +35,278 @@ logger = logging.getLogger("punisher.db.mongo")
 MONGO_URI = settings.MONGODB_URI
 DATABASE_NAME = "punisher"
 
+# 1-minute bars expire after this many seconds; hourly bars are kept
+MINUTE_BAR_TTL = retention_seconds("market_bars")
+
+# (collection, keys, options) created at connect time
+INDEXES = [
+    # Latest state per wallet (save_wallet_snapshot), history per wallet
+    (
+        "hyperliquid_snapshots",
+        [("wallet_address", ASCENDING), ("updated_at", DESCENDING)],
+        {},
+    ),
+    (
+        "hyperliquid_snapshots",
+        [("wallet_address", ASCENDING), ("created_at", DESCENDING)],
+        {},
+    ),
+    # Newest snapshots across wallets (get_alpha_context)
+    ("hyperliquid_snapshots", [("created_at", DESCENDING)], {}),
+    (
+        "chat_sessions",
+        [("session_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        {},
+    ),
+    ("tracked_wallets", [("address", ASCENDING)], {"unique": True}),
+    ("tracked_wallets", [("status", ASCENDING)], {}),
+    ("tracked_wallets", [("discovered_at", DESCENDING)], {}),
+    # Incremental wallet registry refresh
+    ("tracked_wallets", [("updated_at", ASCENDING)], {}),
+    ("agent_tasks", [("agent", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("agent_tasks", [("timestamp", DESCENDING)], {}),
+    ("agent_configs", [("agent_id", ASCENDING)], {}),
+    # Keyframe lookup and change streams per wallet (get_wallet_state_at)
+    (
+        "wallet_history",
+        [("wallet_address", ASCENDING), ("kind", ASCENDING), ("ts", DESCENDING)],
+        {},
+    ),
+    ("wallet_history", [("wallet_address", ASCENDING), ("ts", ASCENDING)], {}),
+    (
+        "wallet_history",
+        [("ts", ASCENDING)],
+        {"expireAfterSeconds": retention_seconds("wallet_history")},
+    ),
+    # Batched retention deletes (punisher.db.retention)
+    ("chat_sessions", [("timestamp", ASCENDING)], {}),
+    ("tracked_wallets", [("status", ASCENDING), ("discovered_at", ASCENDING)], {}),
+    (
+        "market_sentiment_hourly",
+        [("coin", ASCENDING), ("start", ASCENDING)],
+        {"unique": True},
+    ),
+    ("market_sentiment_hourly", [("start", ASCENDING)], {}),
+    # OHLC bars: rollup $merge key and range reads per coin
+    (
+        "market_bars",
+        [("coin", ASCENDING), ("resolution", ASCENDING), ("start", ASCENDING)],
+        {"unique": True},
+    ),
+    (
+        "market_bars",
+        [("start", ASCENDING)],
+        {
+            "expireAfterSeconds": MINUTE_BAR_TTL,
+            "partialFilterExpression": {"resolution": "1m"},
+        },
+    ),
+]
+
+# Raw market data: collection -> (time-series options, TTL seconds)
+TIMESERIES = {
+    "market_prices": (
+        {"timeField": "ts", "granularity": "seconds"},
+        retention_seconds("market_prices"),
+    ),
+    "whale_trades": (
+        {"timeField": "created_at", "metaField": "coin", "granularity": "seconds"},
+        retention_seconds("whale_trades"),
+    ),
+    "market_sentiment": (
+        {"timeField": "created_at", "metaField": "coin", "granularity": "minutes"},
+        retention_seconds("market_sentiment"),
+    ),
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Representative query per hot path: (collection, filter, sort), explained at startup
+QUERY_PATHS = [
+    ("hyperliquid_snapshots", {"wallet_address": ""}, {"updated_at": -1}),
+    ("hyperliquid_snapshots", {"wallet_address": ""}, {"created_at": -1}),
+    ("hyperliquid_snapshots", {}, {"created_at": -1}),
+    ("chat_sessions", {"session_id": ""}, {"timestamp": -1, "_id": -1}),
+    ("tracked_wallets", {"address": ""}, None),
+    ("tracked_wallets", {"status": {"$in": ["discovered", "monitoring"]}}, None),
+    ("tracked_wallets", {}, {"discovered_at": -1}),
+    ("tracked_wallets", {"updated_at": {"$gte": _EPOCH}}, None),
+    ("agent_tasks", {"agent": ""}, {"timestamp": -1}),
+    ("agent_tasks", {}, {"timestamp": -1}),
+    ("agent_configs", {"agent_id": ""}, None),
+    ("wallet_history", {"wallet_address": "", "kind": "key"}, {"ts": -1}),
+    ("wallet_history", {"wallet_address": ""}, {"ts": 1}),
+    ("market_bars", {"coin": "", "resolution": "1m"}, {"start": 1}),
+]
+
+
+def has_collscan(plan: dict) -> bool:
+    """True if an explain() winning plan scans a whole collection anywhere."""
+    stack = [plan]
+    while stack:
+        stage = stack.pop()
+        if not isinstance(stage, dict):
+            continue
+        if stage.get("stage") == "COLLSCAN":
+            return True
+        stack.extend(stage.get("inputStages", []))
+        for key in ("inputStage", "queryPlan"):
+            if key in stage:
+                stack.append(stage[key])
+    return False
+
+
+class WriteBehind:
+    """
+    Write-behind buffer for inserts nobody reads back immediately.
+
+    Documents are queued per collection and written with one ordered
+    insert_many per collection, when FLUSH_SIZE documents are pending or every
+    FLUSH_INTERVAL seconds, whichever comes first. Each insert returns a future
+    resolving to the document _id; callers may ignore it. Once MAX_PENDING
+    documents are waiting (Mongo slow or down), insert() blocks until a flush
+    makes room. Failed writes are logged and fail their futures; they are not
+    retried.
+    """
+
+    FLUSH_SIZE = 200
+    FLUSH_INTERVAL = 1.0  # seconds
+    MAX_PENDING = 10_000
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        # collection -> [(doc, future)]
+        self._pending: dict[str, list[tuple[dict, asyncio.Future]]] = {}
+        self._count = 0
+        self._kick = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        # Flushes run one at a time so each collection keeps insert order
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._count
+
+    async def insert(self, collection: str, doc: dict) -> asyncio.Future:
+        """Queue doc for insertion into collection."""
+        while self._count >= self.MAX_PENDING:
+            self._room.clear()
+            self._kick.set()
+            await self._room.wait()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody has to await the handle: mark failures as retrieved
+        future.add_done_callback(_observe)
+        self._pending.setdefault(collection, []).append((doc, future))
+        self._count += 1
+        if self._count >= self.FLUSH_SIZE:
+            self._kick.set()
+        return future
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._kick.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._kick.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    async def flush(self, collection: str | None = None) -> int:
+        """Write pending documents (of one collection, or all); returns the count."""
+        async with self._lock:
+            if collection is None:
+                batches, self._pending = self._pending, {}
+            elif collection in self._pending:
+                batches = {collection: self._pending.pop(collection)}
+            else:
+                return 0
+            written = sum(len(batch) for batch in batches.values())
+            if not written:
+                return 0
+            try:
+                db = await self._get_db()
+                for name, batch in batches.items():
+                    await self._insert_batch(db[name], batch)
+            except asyncio.CancelledError:
+                # e.g. shutdown mid-write: keep what is unwritten for the next flush
+                self._requeue(batches)
+                raise
+            except Exception as e:
+                for batch in batches.values():
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                raise
+            finally:
+                self._count -= written
+                self._room.set()
+            return written
+
+    def _requeue(self, batches: dict[str, list[tuple[dict, asyncio.Future]]]):
+        """Put the unresolved documents of batches back in front of the queue."""
+        for name, batch in batches.items():
+            unwritten = [(doc, future) for doc, future in batch if not future.done()]
+            if unwritten:
+                self._pending[name] = unwritten + self._pending.get(name, [])
+                self._count += len(unwritten)
+
+    async def _insert_batch(self, coll, batch):
+        docs = [doc for doc, _ in batch]
+        try:
+            await coll.insert_many(docs, ordered=True)
+            inserted, error = len(batch), None
+        except BulkWriteError as e:
+            # Ordered: everything before the first error was written
+            inserted, error = e.details.get("nInserted", 0), e
+        except Exception as e:
+            inserted, error = 0, e
+        if error is not None:
+            logger.error(
+                f"Write-behind insert into {coll.name} failed "
+                f"({len(batch) - inserted} docs dropped): {error}"
+            )
+        for i, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i < inserted:
+                future.set_result(doc.get("_id"))
+            else:
+                future.set_exception(error)
+
+    async def close(self):
+        """Stop the flusher and write everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+def _observe(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
+
+def _chat_message(doc: dict) -> dict:
+    """A chat_sessions document as served, with its (timestamp, _id) cursor."""
+    return {
+        "role": doc["role"],
+        "content": doc["content"],
+        "timestamp": doc["timestamp"],
+        "cursor": f"{doc['timestamp'].isoformat()}_{doc['_id']}",
+    }
+
 
 class MongoStorage:
     """Async MongoDB storage for Hyperliquid data"""
@@ -30,6 +324,24 @@ class MongoStorage:
     def __init__(self):
         self._client = None
         self._db = None
+        # wallet -> (state_hash, _id) of its latest snapshot
+        self._snapshot_cache: dict[str, tuple[str, object]] = {}
+        # snapshot _id -> (updated_at, snapshot_time_ms) waiting to be written
+        self._pending_touches: dict[object, tuple[datetime, int | None]] = {}
+        self._prune_wallets: set[str] = set()
+        self._maintenance_task: asyncio.Task | None = None
+        self._rollup_task: asyncio.Task | None = None
+        self._retention_task: asyncio.Task | None = None
+        # Source documents from here on still need downsampling
+        self._downsample_since: datetime | None = None
+        # Raw ticks from here on still need rolling up into bars
+        self._rollup_since: datetime | None = None
+        self.writes = WriteBehind(self.get_db)
+        # wallet -> (changes since its last keyframe, last recorded state)
+        self._history: dict[str, tuple[int, dict]] = {}
+        # Addresses known to be in tracked_wallets; None until warmed
+        self._known_wallets: set[str] | None = None
+        self._chat_cache = ChatCache()
 
     async def connect(self):
         """Initialize async MongoDB connection"""
@@ -37,78 +349,189 @@ class MongoStorage:
             self._client = AsyncIOMotorClient(MONGO_URI)
             self._db = self._client[DATABASE_NAME]
             logger.info(f"Connected to MongoDB: {DATABASE_NAME}")
+            try:
+                await self.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"Index bootstrap skipped: {e}")
+            if self._retention_task is None or self._retention_task.done():
+                self._retention_task = asyncio.create_task(self._retention())
         return self._db
 
+    async def ensure_indexes(self):
+        """
+        Create the indexes every query path relies on (idempotent), then
+        explain each path and log any that would still scan the collection.
+        """
+        db = self._db
+        await self._ensure_timeseries()
+        for collection, keys, options in INDEXES:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate addresses blocking the unique index
+                logger.error(f"Could not create index {collection}{keys}: {e}")
+
+        for collection, query, sort in QUERY_PATHS:
+            command = {"find": collection, "filter": query, "limit": 1}
+            if sort:
+                command["sort"] = sort
+            try:
+                explain = await db.command(
+                    {"explain": command, "verbosity": "queryPlanner"}
+                )
+            except OperationFailure as e:
+                logger.debug(f"Explain failed for {collection}: {e}")
+                continue
+            plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            if has_collscan(plan):
+                logger.warning(
+                    f"Collection scan on {collection} filter={query} sort={sort}"
+                )
+
+    async def _ensure_timeseries(self):
+        """
+        Create the raw market data collections as time-series collections with
+        TTL expiry. Collections that already exist as regular collections are
+        left in place and expire through a TTL index on their time field.
+        """
+        db = self._db
+        existing = {
+            info["name"]: info.get("type") async for info in db.list_collections()
+        }
+        for name, (options, ttl) in TIMESERIES.items():
+            time_field = options["timeField"]
+            if name not in existing:
+                try:
+                    await db.create_collection(
+                        name, timeseries=options, expireAfterSeconds=ttl
+                    )
+                    continue
+                except OperationFailure as e:
+                    logger.error(f"Could not create time-series {name}: {e}")
+                    continue
+            if existing[name] == "timeseries":
+                # Keep the TTL in sync with TIMESERIES
+                command = {"collMod": name, "expireAfterSeconds": ttl}
+            else:
+                logger.warning(
+                    f"{name} is a regular collection; expiring it by TTL index. "
+                    "Drop or rename it to recreate it as a time-series collection."
+                )
+                try:
+                    await db[name].create_index(time_field, expireAfterSeconds=ttl)
+                    continue
+                except OperationFailure:
+                    # An index on the time field already exists without a TTL
+                    command = {
+                        "collMod": name,
+                        "index": {
+                            "keyPattern": {time_field: 1},
+                            "expireAfterSeconds": ttl,
+                        },
+                    }
+            try:
+                await db.command(command)
+            except OperationFailure as e:
+                logger.error(f"Could not set TTL on {name}: {e}")
+
     async def get_db(self):
         if self._db is None:
             await self.connect()
         return self._db
 
-    async def save_wallet_snapshot(self, wallet_address: str, parsed_data: dict):
-        """Save wallet snapshot - Only new unique states (Limit 20 unique per wallet)"""
-        db = await self.get_db()
+    # Unique states kept per wallet
+    SNAPSHOT_KEEP = 20
+    # Unchanged-state timestamp touches are buffered and written in bulk
+    TOUCH_FLUSH_INTERVAL = 5.0  # seconds
+    TOUCH_FLUSH_SIZE = 500
+    # Wallets that got new states are pruned back to SNAPSHOT_KEEP in the background
+    PRUNE_INTERVAL = 60.0  # seconds
 
-        summary = parsed_data.get("summary", {})
-        positions = parsed_data.get("positions", [])
-        orders = parsed_data.get("orders", [])
-        snapshot_time_ms = parsed_data.get("ts")
+    @staticmethod
+    def _doc_fingerprint(doc: dict) -> str:
+        """Fingerprint of a stored snapshot document, recomputed from its fields."""
+        return snapshot_fingerprint(
+            {
+                "account_value": doc.get("account_value"),
+                "total_ntl_pos": doc.get("total_ntl_pos"),
+            },
+            doc.get("positions", []),
+            doc.get("open_orders", []),
+        )
 
-        # Helper to generate state hash
-        def get_state_hash(s, p, o):
-            # Sort lists to ensure consistent order
-            p_sorted = sorted(p, key=lambda x: x.get("coin"))
-            o_sorted = sorted(o, key=lambda x: x.get("order_id", x.get("oid", "")))
-
-            # Key state components
-            state = {
-                "account_value": s.get("account_value"),
-                "total_ntl_pos": s.get("total_ntl_pos"),
-                "positions_hash": str(p_sorted),
-                "orders_hash": str(o_sorted),
-            }
-            return str(state)
+    def _start_snapshot_maintenance(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._snapshot_maintenance())
 
-        current_hash = get_state_hash(summary, positions, orders)
+    async def _snapshot_maintenance(self):
+        """Background job: flush buffered touches and prune wallets with new states."""
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.TOUCH_FLUSH_INTERVAL)
+            try:
+                await self.flush_snapshot_touches()
+                if time.monotonic() - last_prune >= self.PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    await self.prune_snapshots()
+            except Exception as e:
+                logger.error(f"Snapshot maintenance error: {e}")
 
-        # Check latest snapshot for this wallet
-        latest_cursor = (
-            db.hyperliquid_snapshots.find({"wallet_address": wallet_address})
+    async def _latest_snapshot_state(self, wallet_address: str):
+        """(state_hash, _id) of the wallet's latest snapshot, from cache or Mongo."""
+        cached = self._snapshot_cache.get(wallet_address)
+        if cached is not None:
+            return cached
+
+        db = await self.get_db()
+        latest_snapshot = (
+            await db.hyperliquid_snapshots.find({"wallet_address": wallet_address})
             .sort("updated_at", -1)
             .limit(1)
+            .to_list(length=1)
         )
+        if not latest_snapshot:
+            return None
+
+        latest = latest_snapshot[0]
+        latest_hash = latest.get("state_hash")
+        # Backward compatibility: documents without a hash or with a legacy
+        # str() hash are compared by a fingerprint recomputed from their fields
+        if not is_fingerprint(latest_hash):
+            latest_hash = self._doc_fingerprint(latest)
+        cached = self._snapshot_cache[wallet_address] = (latest_hash, latest["_id"])
+        return cached
 
-        latest_snapshot = await latest_cursor.to_list(length=1)
+    async def save_wallet_snapshot(self, wallet_address: str, parsed_data: dict):
+        """
+        Save wallet snapshot - Only new unique states (Limit 20 unique per wallet)
 
-        if latest_snapshot:
-            latest = latest_snapshot[0]
-            # Compare hashes (or reconstruct state if hash not stored)
-            latest_hash = latest.get("state_hash")
+        The last state hash and document id per wallet are cached in memory
+        (warmed from Mongo on first sight), so an unchanged state costs no round
+        trip: its updated_at touch is buffered and flushed in bulk. Pruning to
+        SNAPSHOT_KEEP runs in the background. Assumes this process is the only
+        snapshot writer, which holds for the WebSocket monitor.
+        """
+        self._start_snapshot_maintenance()
 
-            # Backward compatibility or direct check
-            if not latest_hash:
-                latest_hash = get_state_hash(
-                    {
-                        "account_value": latest.get("account_value"),
-                        "total_ntl_pos": latest.get("total_ntl_pos"),
-                    },
-                    latest.get("positions", []),
-                    latest.get("open_orders", []),
-                )
+        summary = parsed_data.get("summary", {})
+        positions = parsed_data.get("positions", [])
+        orders = parsed_data.get("orders", [])
+        snapshot_time_ms = parsed_data.get("ts")
 
-            if current_hash == latest_hash:
-                # Just update the timestamp of the existing record to verify aliveness
-                await db.hyperliquid_snapshots.update_one(
-                    {"_id": latest["_id"]},
-                    {
-                        "$set": {
-                            "updated_at": datetime.utcnow(),
-                            "snapshot_time_ms": snapshot_time_ms,
-                        }
-                    },
-                )
-                return "updated_timestamp"
+        current_hash = snapshot_fingerprint(summary, positions, orders)
+        latest = await self._latest_snapshot_state(wallet_address)
+
+        if latest is not None and latest[0] == current_hash:
+            # Just update the timestamp of the existing record to verify aliveness;
+            # later touches of the same record supersede earlier ones
+            self._pending_touches[latest[1]] = (datetime.utcnow(), snapshot_time_ms)
+            if len(self._pending_touches) >= self.TOUCH_FLUSH_SIZE:
+                await self.flush_snapshot_touches()
+            return "updated_timestamp"
 
         # If not duplicate (or no previous history), insert new unique record
+        db = await self.get_db()
+        now = datetime.utcnow()
         doc = {
             "wallet_address": wallet_address,
             "snapshot_time_ms": snapshot_time_ms,
@@ -120,37 +543,173 @@ class MongoStorage:
             "positions": positions,
             "open_orders": orders,
             "state_hash": current_hash,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": now,
+            "updated_at": now,
         }
 
         result = await db.hyperliquid_snapshots.insert_one(doc)
+        self._snapshot_cache[wallet_address] = (current_hash, result.inserted_id)
+        self._prune_wallets.add(wallet_address)
+        if settings.SNAPSHOT_HISTORY:
+            await self._record_history(wallet_address, parsed_data, now)
+        return result.inserted_id
 
-        # Prune old unique states (Keep last 20)
-        cursor = (
-            db.hyperliquid_snapshots.find(
-                {"wallet_address": wallet_address}, {"_id": 1}
+    async def _record_history(self, wallet_address: str, parsed_data: dict, now):
+        """Append a state change to wallet_history (write-behind)."""
+        entry = next_history_entry(self._history, wallet_address, parsed_data)
+        if entry is None:
+            return
+        doc = {
+            "wallet_address": wallet_address,
+            "ts": now,
+            "snapshot_time_ms": parsed_data.get("ts"),
+            **entry,
+        }
+        await self.writes.insert("wallet_history", doc)
+
+    async def get_wallet_state_at(self, wallet_address: str, ts: datetime):
+        """
+        Wallet state ({"summary", "positions", "orders"}) as of ts, rebuilt from
+        the nearest keyframe at or before ts and the diffs after it; None if no
+        history reaches back that far.
+        """
+        await self.writes.flush("wallet_history")
+        db = await self.get_db()
+        keyframes = (
+            await db.wallet_history.find(
+                {"wallet_address": wallet_address, "kind": "key", "ts": {"$lte": ts}}
             )
-            .sort("updated_at", -1)
-            .skip(20)
+            .sort("ts", -1)
+            .limit(1)
+            .to_list(length=1)
         )
+        if not keyframes:
+            return None
+        key = keyframes[0]
+        state = key["state"]
+        cursor = db.wallet_history.find(
+            {
+                "wallet_address": wallet_address,
+                "kind": "delta",
+                "_id": {"$gt": key["_id"]},
+                "ts": {"$lte": ts},
+            },
+            {"diff": 1},
+        ).sort([("ts", 1), ("_id", 1)])
+        async for doc in cursor:
+            state = apply_wallet_diff(state, doc["diff"])
+        return state
 
-        ids_to_delete = []
-        async for old_doc in cursor:
-            ids_to_delete.append(old_doc["_id"])
+    async def get_wallet_changes(self, wallet_address: str, since: datetime):
+        """
+        Stream the wallet's changes after `since`, oldest first, as
+        {"ts", "snapshot_time_ms", "diff"} (diff_wallet_state format). Keyframes
+        come out as diffs against the state before them.
+        """
+        state = await self.get_wallet_state_at(wallet_address, since)
+        state = state or wallet_state({})
+        db = await self.get_db()
+        cursor = db.wallet_history.find(
+            {"wallet_address": wallet_address, "ts": {"$gt": since}}
+        ).sort([("ts", 1), ("_id", 1)])
+        async for doc in cursor:
+            if doc["kind"] == "key":
+                diff = diff_wallet_state(state, doc["state"])
+                state = doc["state"]
+            else:
+                diff = doc["diff"]
+                state = apply_wallet_diff(state, diff)
+            if diff:
+                yield {
+                    "ts": doc["ts"],
+                    "snapshot_time_ms": doc.get("snapshot_time_ms"),
+                    "diff": diff,
+                }
 
-        if ids_to_delete:
-            await db.hyperliquid_snapshots.delete_many({"_id": {"$in": ids_to_delete}})
-            logger.debug(
-                f"Pruned {len(ids_to_delete)} old states for {wallet_address[:8]}..."
-            )
+    async def flush_snapshot_touches(self):
+        """Write buffered updated_at touches in one unordered bulk write."""
+        if not self._pending_touches:
+            return 0
+        touches, self._pending_touches = self._pending_touches, {}
+        db = await self.get_db()
+        await db.hyperliquid_snapshots.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": _id},
+                    {
+                        "$set": {
+                            "updated_at": updated_at,
+                            "snapshot_time_ms": snapshot_time_ms,
+                        }
+                    },
+                )
+                for _id, (updated_at, snapshot_time_ms) in touches.items()
+            ],
+            ordered=False,
+        )
+        return len(touches)
 
-        return result.inserted_id
+    async def migrate_state_hashes(self, batch_size: int = 1000) -> int:
+        """
+        Rewrite legacy str() state hashes (and missing ones) as fingerprints.
+        Safe to re-run; returns the number of documents updated.
+        """
+        db = await self.get_db()
+        cursor = db.hyperliquid_snapshots.find(
+            {
+                "$or": [
+                    {"state_hash": {"$exists": False}},
+                    {"state_hash": {"$not": {"$regex": r"^[0-9a-f]{32}$"}}},
+                ]
+            },
+            {"account_value": 1, "total_ntl_pos": 1, "positions": 1, "open_orders": 1},
+        )
+        updated = 0
+        batch = []
+        async for doc in cursor:
+            batch.append(
+                UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {"state_hash": self._doc_fingerprint(doc)}},
+                )
+            )
+            if len(batch) >= batch_size:
+                await db.hyperliquid_snapshots.bulk_write(batch, ordered=False)
+                updated += len(batch)
+                batch = []
+        if batch:
+            await db.hyperliquid_snapshots.bulk_write(batch, ordered=False)
+            updated += len(batch)
+        # Cached hashes may be legacy ones read before the rewrite
+        self._snapshot_cache.clear()
+        return updated
 
-    async def save_trade(self, coin: str, trade_data: dict):
-        """Save whale trade to MongoDB"""
+    async def prune_snapshots(self):
+        """Prune old unique states (keep last SNAPSHOT_KEEP) for wallets that grew."""
+        wallets, self._prune_wallets = self._prune_wallets, set()
         db = await self.get_db()
+        pruned = 0
+        for wallet_address in wallets:
+            cursor = (
+                db.hyperliquid_snapshots.find(
+                    {"wallet_address": wallet_address}, {"_id": 1}
+                )
+                .sort("updated_at", -1)
+                .skip(self.SNAPSHOT_KEEP)
+            )
+            ids_to_delete = [old_doc["_id"] async for old_doc in cursor]
+            if ids_to_delete:
+                await db.hyperliquid_snapshots.delete_many(
+                    {"_id": {"$in": ids_to_delete}}
+                )
+                pruned += len(ids_to_delete)
+                logger.debug(
+                    f"Pruned {len(ids_to_delete)} old states for {wallet_address[:8]}..."
+                )
+        return pruned
 
+    async def save_trade(self, coin: str, trade_data: dict):
+        """Save whale trade to MongoDB (write-behind; returns the insert handle)"""
         doc = {
             "coin": coin,
             "sz": trade_data.get("sz"),
@@ -162,12 +721,15 @@ class MongoStorage:
             "created_at": datetime.utcnow(),
         }
 
-        result = await db.whale_trades.insert_one(doc)
-        return result.inserted_id
+        return await self.writes.insert("whale_trades", doc)
 
     async def save_market_mids(self, mids: dict):
-        """Save mid-price snapshot for key assets"""
-        db = await self.get_db()
+        """
+        Save mid-price snapshot for key assets. market_prices is a time-series
+        collection with TTL expiry, so no pruning happens here; reads should go
+        through get_market_bars instead of scanning raw ticks.
+        """
+        self._start_market_rollups()
 
         # We only care about major ones for history, keep the collection lean
         subset = {k: v for k, v in mids.items() if k in ["BTC", "ETH", "SOL", "HYPE"]}
@@ -179,23 +741,10 @@ class MongoStorage:
             "ts": datetime.utcnow(),
         }
 
-        # Update latest record instead of spawning thousands of small docs
-        # Or insert one per hour? Let's insert new for historical analysis
-        result = await db.market_prices.insert_one(doc)
-
-        # Prune: keep last 1000 snapshots (~1 week of 10-min snapshots)
-        count = await db.market_prices.count_documents({})
-        if count > 1000:
-            oldest = await db.market_prices.find().sort("ts", 1).limit(1).to_list(1)
-            if oldest:
-                await db.market_prices.delete_many({"ts": {"$lte": oldest[0]["ts"]}})
-
-        return result.inserted_id
+        return await self.writes.insert("market_prices", doc)
 
     async def save_market_sentiment(self, coin: str, imbalance: float, sentiment: str):
-        """Save market sentiment snapshot"""
-        db = await self.get_db()
-
+        """Save market sentiment snapshot (write-behind; returns the insert handle)"""
         doc = {
             "coin": coin,
             "imbalance": imbalance,
@@ -203,30 +752,272 @@ class MongoStorage:
             "created_at": datetime.utcnow(),
         }
 
-        result = await db.market_sentiment.insert_one(doc)
-        return result.inserted_id
+        return await self.writes.insert("market_sentiment", doc)
 
-    async def save_chat_message(self, session_id: str, role: str, content: str):
-        """Save a chat message to persistent history"""
+    # Bars are rebuilt from raw ticks this often
+    ROLLUP_INTERVAL = 60.0  # seconds
+    # How far back the first rollup after startup reaches
+    ROLLUP_LOOKBACK = timedelta(hours=1)
+
+    def _start_market_rollups(self):
+        if self._rollup_task is None or self._rollup_task.done():
+            self._rollup_task = asyncio.create_task(self._market_rollups())
+
+    async def _market_rollups(self):
+        """Background job: roll raw market ticks up into OHLC bars."""
+        while True:
+            await asyncio.sleep(self.ROLLUP_INTERVAL)
+            try:
+                await self.rollup_market_bars()
+            except Exception as e:
+                logger.error(f"Market rollup error: {e}")
+
+    async def rollup_market_bars(self, since: datetime | None = None) -> datetime:
+        """
+        Rebuild the 1-minute and 1-hour OHLC bars in market_bars from the raw
+        ticks since `since` (default: where the last successful run stopped).
+        Bars are recomputed from their aligned start, so partially covered bars
+        are rebuilt whole and re-running is idempotent. Volume is the notional
+        of the trades recorded in whale_trades, not total exchange volume.
+        Returns the time the next run continues from.
+        """
+        await self.writes.flush("market_prices")
+        await self.writes.flush("whale_trades")
         db = await self.get_db()
+        now = datetime.utcnow()
+        if since is None:
+            since = self._rollup_since or now - self.ROLLUP_LOOKBACK
+        minute = bar_start(since, "1m")
+        hour = bar_start(since, "1h")
+
+        def merge_into(when_not_matched="insert"):
+            return {
+                "$merge": {
+                    "into": "market_bars",
+                    "on": ["coin", "resolution", "start"],
+                    "whenMatched": "merge",
+                    "whenNotMatched": when_not_matched,
+                }
+            }
+
+        # 1m price bars from the mids snapshots
+        await db.market_prices.aggregate(
+            [
+                {"$match": {"ts": {"$gte": minute}}},
+                {"$sort": {"ts": 1}},
+                {"$project": {"ts": 1, "mid": {"$objectToArray": "$mids"}}},
+                {"$unwind": "$mid"},
+                {
+                    "$group": {
+                        "_id": {
+                            "coin": "$mid.k",
+                            "start": {"$dateTrunc": {"date": "$ts", "unit": "minute"}},
+                        },
+                        "open": {"$first": "$mid.v"},
+                        "high": {"$max": "$mid.v"},
+                        "low": {"$min": "$mid.v"},
+                        "close": {"$last": "$mid.v"},
+                        "ticks": {"$sum": 1},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "coin": "$_id.coin",
+                        "resolution": {"$literal": "1m"},
+                        "start": "$_id.start",
+                        "open": 1,
+                        "high": 1,
+                        "low": 1,
+                        "close": 1,
+                        "ticks": 1,
+                    }
+                },
+                merge_into(),
+            ]
+        ).to_list(None)
+
+        # Volume onto the 1m bars that have prices
+        await db.whale_trades.aggregate(
+            [
+                {"$match": {"created_at": {"$gte": minute}}},
+                {
+                    "$group": {
+                        "_id": {
+                            "coin": "$coin",
+                            "start": {
+                                "$dateTrunc": {"date": "$created_at", "unit": "minute"}
+                            },
+                        },
+                        "volume": {"$sum": "$usd_val"},
+                        "trades": {"$sum": 1},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "coin": "$_id.coin",
+                        "resolution": {"$literal": "1m"},
+                        "start": "$_id.start",
+                        "volume": 1,
+                        "trades": 1,
+                    }
+                },
+                merge_into(when_not_matched="discard"),
+            ]
+        ).to_list(None)
+
+        # 1h bars from the 1m bars
+        await db.market_bars.aggregate(
+            [
+                {"$match": {"resolution": "1m", "start": {"$gte": hour}}},
+                {"$sort": {"start": 1}},
+                {
+                    "$group": {
+                        "_id": {
+                            "coin": "$coin",
+                            "start": {"$dateTrunc": {"date": "$start", "unit": "hour"}},
+                        },
+                        "open": {"$first": "$open"},
+                        "high": {"$max": "$high"},
+                        "low": {"$min": "$low"},
+                        "close": {"$last": "$close"},
+                        "ticks": {"$sum": "$ticks"},
+                        "volume": {"$sum": "$volume"},
+                        "trades": {"$sum": "$trades"},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "coin": "$_id.coin",
+                        "resolution": {"$literal": "1h"},
+                        "start": "$_id.start",
+                        "open": 1,
+                        "high": 1,
+                        "low": 1,
+                        "close": 1,
+                        "ticks": 1,
+                        "volume": 1,
+                        "trades": 1,
+                    }
+                },
+                merge_into(),
+            ]
+        ).to_list(None)
+
+        self._rollup_since = now
+        return now
+
+    async def get_market_bars(
+        self,
+        coin: str,
+        start: datetime,
+        end: datetime | None = None,
+        max_points: int = 500,
+        resolution: str | None = None,
+    ) -> list[dict]:
+        """
+        OHLC bars for a coin over [start, end), oldest first. The resolution
+        defaults to the finest one that fits max_points bars (pick_resolution).
+        """
+        end = end or datetime.utcnow()
+        resolution = resolution or pick_resolution(start, end, max_points)
+        db = await self.get_db()
+        cursor = db.market_bars.find(
+            {
+                "coin": coin,
+                "resolution": resolution,
+                "start": {"$gte": bar_start(start, resolution), "$lt": end},
+            },
+            {"_id": 0},
+        ).sort("start", 1)
+        return await cursor.to_list(length=None)
+
+    async def save_chat_message(self, session_id: str, role: str, content: str):
+        """Save a chat message to persistent history (write-behind)"""
+        now = datetime.utcnow()
+        # Mongo keeps milliseconds: truncate so cached cursors match stored times
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        # _id is assigned here so the cached message knows its paging cursor
         doc = {
+            "_id": ObjectId(),
             "session_id": session_id,
             "role": role,
             "content": content,
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
         }
-        await db.chat_sessions.insert_one(doc)
+        self._chat_cache.append(session_id, _chat_message(doc))
+        return await self.writes.insert("chat_sessions", doc)
 
-    async def get_chat_history(self, session_id: str, limit: int = 20):
-        """Retrieve recent chat history for context"""
+    async def _chat_messages(self, session_id: str, limit: int, before=None):
+        """Newest `limit` messages (older than cursor `before`), oldest first."""
+        # Read our own buffered writes
+        await self.writes.flush("chat_sessions")
         db = await self.get_db()
+        query = {"session_id": session_id}
+        if before:
+            # (timestamp, _id): messages sharing a millisecond page correctly
+            ts, _, oid = before.partition("_")
+            ts = datetime.fromisoformat(ts)
+            if oid:
+                query["$or"] = [
+                    {"timestamp": {"$lt": ts}},
+                    {"timestamp": ts, "_id": {"$lt": ObjectId(oid)}},
+                ]
+            else:
+                query["timestamp"] = {"$lt": ts}
         cursor = (
-            db.chat_sessions.find({"session_id": session_id})
-            .sort("timestamp", 1)  # Chronological order
+            db.chat_sessions.find(query, {"role": 1, "content": 1, "timestamp": 1})
+            .sort([("timestamp", -1), ("_id", -1)])
             .limit(limit)
         )
-        history = await cursor.to_list(length=limit)
-        return [{"role": h["role"], "content": h["content"]} for h in history]
+        docs = await cursor.to_list(length=limit)
+        return [_chat_message(d) for d in reversed(docs)]
+
+    async def _recent_chat(self, session_id: str, limit: int) -> list[dict]:
+        """Newest `limit` messages, from the session cache when it can answer."""
+        messages = self._chat_cache.get(session_id, limit)
+        if messages is None:
+            fetch = max(limit, self._chat_cache.messages)
+            self._chat_cache.begin_load(session_id)
+            try:
+                messages = await self._chat_messages(session_id, fetch)
+            except Exception:
+                self._chat_cache.end_load(session_id)
+                raise
+            self._chat_cache.put(session_id, messages, complete=len(messages) < fetch)
+            messages = self._chat_cache.get(session_id, limit) or messages[-limit:]
+        return messages
+
+    async def get_chat_history(self, session_id: str, limit: int = 20):
+        """The newest `limit` messages of a session, oldest first, for LLM context"""
+        messages = await self._recent_chat(session_id, limit)
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+    async def get_chat_page(
+        self, session_id: str, limit: int = 50, before: str | None = None
+    ) -> dict:
+        """
+        A page of a session's history, oldest first: the newest `limit`
+        messages, or those older than cursor `before`. next_cursor loads the
+        page before this one (None once the start is reached).
+        """
+        if before is None:
+            messages = await self._recent_chat(session_id, limit)
+        else:
+            messages = await self._chat_messages(session_id, limit, before)
+        return {
+            "messages": [
+                {
+                    "role": m["role"],
+                    "content": m["content"],
+                    "timestamp": m["timestamp"],
+                }
+                for m in messages
+            ],
+            "next_cursor": messages[0]["cursor"] if len(messages) == limit else None,
+        }
 
     async def get_latest_snapshots(self, wallet_address: str, limit: int = 10):
         """Get latest snapshots for a wallet"""
@@ -240,8 +1031,294 @@ class MongoStorage:
 
         return await cursor.to_list(length=limit)
 
+    async def upsert_discovered_wallets(
+        self, wallets: list[dict], source: str, range_id=None
+    ) -> int:
+        """
+        Upsert a page of discovered wallets ({"address", "pnl", "win_rate",
+        "meta"}) into tracked_wallets in one unordered bulk write; returns how
+        many were new. Addresses already known to this process are skipped
+        without a round trip (their pnl/meta are not refreshed), so a page of
+        only known wallets never touches the database. The known set is warmed
+        from tracked_wallets on first use.
+        """
+        db = await self.get_db()
+        if self._known_wallets is None:
+            cursor = db.tracked_wallets.find({}, {"address": 1, "_id": 0})
+            self._known_wallets = {doc["address"] async for doc in cursor}
+
+        # Last row wins for addresses repeated within the page
+        fresh = {
+            w["address"]: w for w in wallets if w["address"] not in self._known_wallets
+        }
+        if not fresh:
+            return 0
+
+        now = datetime.now(UTC)
+        operations = [
+            UpdateOne(
+                {"address": address},
+                {
+                    "$set": {
+                        "pnl_str": item.get("pnl"),
+                        "win_rate_str": item.get("win_rate"),
+                        "meta": item.get("meta"),
+                        "last_seen_at": now,
+                        "updated_at": now,
+                    },
+                    "$setOnInsert": {
+                        "address": address,
+                        "source": source,
+                        "range_id": range_id,
+                        "status": "discovered",
+                        "discovered_at": now,
+                    },
+                },
+                upsert=True,
+            )
+            for address, item in fresh.items()
+        ]
+        try:
+            result = await db.tracked_wallets.bulk_write(operations, ordered=False)
+            inserted = result.upserted_count
+        except BulkWriteError as e:
+            # e.g. a concurrent writer inserted one of the addresses first
+            logger.warning(f"Wallet upsert partially failed: {e.details}")
+            inserted = e.details.get("nUpserted", 0)
+            # Only a duplicate key means the wallet is stored; retry the rest
+            addresses = list(fresh)
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != 11000:
+                    fresh.pop(addresses[error["index"]], None)
+        self._known_wallets.update(fresh)
+        return inserted
+
+    # Retention pass interval, and batch size/pause of its deletes
+    RETENTION_INTERVAL = 600.0  # seconds
+    RETENTION_BATCH = 500
+    RETENTION_PAUSE = 0.05  # seconds between batches
+
+    async def _retention(self):
+        """Background job: downsample, then expire old documents in batches."""
+        while True:
+            await asyncio.sleep(self.RETENTION_INTERVAL)
+            try:
+                await self.apply_retention()
+            except Exception as e:
+                logger.error(f"Retention error: {e}")
+
+    async def apply_retention(self) -> dict[str, int]:
+        """Run DOWNSAMPLE and RETENTION once; returns documents expired per collection."""
+        db = await self.get_db()
+        now = datetime.utcnow()
+        since = self._downsample_since
+        for rule in DOWNSAMPLE:
+            start = since or now - timedelta(seconds=retention_seconds(rule.source))
+            await self._downsample(db, rule, start)
+        self._downsample_since = now
+
+        expired = {}
+        for rule in RETENTION:
+            if rule.native_ttl:
+                continue
+            cutoff = now - timedelta(seconds=retention_seconds(rule.collection))
+            expired[rule.collection] = await self._expire(db, rule, cutoff)
+            if expired[rule.collection]:
+                logger.info(
+                    f"Expired {expired[rule.collection]} {rule.collection} documents"
+                )
+        # Forget what the in-process caches remember of deleted documents
+        if expired.get("chat_sessions"):
+            self._chat_cache = ChatCache()
+        if expired.get("tracked_wallets"):
+            self._known_wallets = None
+        return expired
+
+    async def _downsample(self, db, rule, since: datetime):
+        """Recompute rule.target aggregates for the units from `since` on."""
+        step = timedelta(seconds=UNIT_SECONDS[rule.unit])
+        start = _EPOCH + (since - _EPOCH) // step * step
+        aggregates = {
+            f"{name}_{agg}": {f"${agg}": f"${name}"}
+            for name, aggs in rule.fields.items()
+            for agg in aggs
+        }
+        await (
+            db[rule.source]
+            .aggregate(
+                [
+                    {"$match": {rule.time_field: {"$gte": start}}},
+                    {
+                        "$group": {
+                            "_id": {
+                                "key": f"${rule.group}",
+                                "start": {
+                                    "$dateTrunc": {
+                                        "date": f"${rule.time_field}",
+                                        "unit": rule.unit,
+                                    }
+                                },
+                            },
+                            "samples": {"$sum": 1},
+                            **aggregates,
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": 0,
+                            rule.group: "$_id.key",
+                            "start": "$_id.start",
+                            "samples": 1,
+                            **{name: 1 for name in aggregates},
+                        }
+                    },
+                    {
+                        "$merge": {
+                            "into": rule.target,
+                            "on": [rule.group, "start"],
+                            "whenMatched": "replace",
+                            "whenNotMatched": "insert",
+                        }
+                    },
+                ]
+            )
+            .to_list(None)
+        )
+
+    async def _expire(self, db, rule, cutoff: datetime) -> int:
+        """
+        Delete documents older than cutoff, oldest first, RETENTION_BATCH at a
+        time over the rule's time index, archiving each batch first if asked.
+        """
+        coll = db[rule.collection]
+        query = {**rule.match, rule.time_field: {"$lt": cutoff}}
+        projection = None if rule.archive else {"_id": 1}
+        expired = 0
+        while True:
+            batch = (
+                await coll.find(query, projection)
+                .sort(rule.time_field, 1)
+                .limit(self.RETENTION_BATCH)
+                .to_list(length=self.RETENTION_BATCH)
+            )
+            if not batch:
+                break
+            if rule.archive:
+                await asyncio.to_thread(archive_documents, rule.collection, batch)
+            await coll.delete_many({"_id": {"$in": [d["_id"] for d in batch]}})
+            expired += len(batch)
+            if len(batch) < self.RETENTION_BATCH:
+                break
+            await asyncio.sleep(self.RETENTION_PAUSE)
+        return expired
+
+    async def get_target_wallets(self, statuses: list[str]) -> list[str]:
+        """Addresses of tracked wallets in any of the given statuses."""
+        db = await self.get_db()
+        cursor = db.tracked_wallets.find(
+            {"status": {"$in": statuses}}, {"address": 1, "_id": 0}
+        )
+        return [w["address"] async for w in cursor]
+
+    async def get_wallets_updated_since(
+        self, since: datetime | None = None
+    ) -> list[dict]:
+        """
+        Address, status and updated_at of the tracked wallets written at or
+        after `since` (all of them if None), oldest change first.
+        """
+        db = await self.get_db()
+        query = {} if since is None else {"updated_at": {"$gte": since}}
+        cursor = db.tracked_wallets.find(
+            query, {"address": 1, "status": 1, "updated_at": 1, "_id": 0}
+        )
+        if since is not None:
+            cursor = cursor.sort("updated_at", 1)
+        return await cursor.to_list(length=None)
+
+    async def set_wallet_status(self, address: str, status: str):
+        """Set a wallet's scan/monitor status, tracking it if it is not yet."""
+        db = await self.get_db()
+        now = datetime.now(UTC)
+        await db.tracked_wallets.update_one(
+            {"address": address},
+            {"$set": {"status": status, "last_scan_at": now, "updated_at": now}},
+            upsert=True,  # In case it was a static wallet not in DB yet
+        )
+        if self._known_wallets is not None:
+            self._known_wallets.add(address)
+
+    async def get_recent_wallets(self, limit: int = 3) -> list[dict]:
+        """Newest discovered wallets."""
+        db = await self.get_db()
+        cursor = db.tracked_wallets.find().sort("discovered_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def count_wallets(self) -> int:
+        db = await self.get_db()
+        return await db.tracked_wallets.count_documents({})
+
+    async def get_recent_snapshots(self, limit: int = 10) -> list[dict]:
+        """Newest wallet states across all wallets."""
+        db = await self.get_db()
+        cursor = db.hyperliquid_snapshots.find().sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def get_agent_config(self, agent_id: str) -> dict | None:
+        db = await self.get_db()
+        return await db.agent_configs.find_one({"agent_id": agent_id}, {"_id": 0})
+
+    async def get_agent_configs(self) -> list[dict]:
+        db = await self.get_db()
+        return await db.agent_configs.find({}, {"_id": 0}).to_list(length=100)
+
+    async def save_agent_config(self, agent_id: str, fields: dict):
+        """Set config fields for an agent, creating its config if needed."""
+        db = await self.get_db()
+        await db.agent_configs.update_one(
+            {"agent_id": agent_id}, {"$set": fields}, upsert=True
+        )
+
+    async def log_task(self, agent: str, task: str, status: str = "completed"):
+        """Record task history for the management UI (write-behind)"""
+        doc = {
+            "agent": agent,
+            "task": task,
+            "status": status,
+            "timestamp": datetime.now(UTC),
+        }
+        return await self.writes.insert("agent_tasks", doc)
+
+    async def get_agent_tasks(self, agent: str | None = None, limit: int = 50):
+        """Newest tasks, optionally for one agent."""
+        await self.writes.flush("agent_tasks")
+        db = await self.get_db()
+        query = {"agent": agent} if agent else {}
+        cursor = (
+            db.agent_tasks.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+
     async def close(self):
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        if self._rollup_task is not None:
+            self._rollup_task.cancel()
+            self._rollup_task = None
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            self._retention_task = None
         if self._client:
+            try:
+                await self.writes.close()
+            except Exception as e:
+                logger.error(f"Final write-behind flush failed: {e}")
+            try:
+                await self.flush_snapshot_touches()
+                await self.prune_snapshots()
+            except Exception as e:
+                logger.error(f"Final snapshot flush failed: {e}")
             self._client.close()
             self._client = None
             self._db = None
@@ -0,0 +1,105 @@
+"""
+Retention and downsampling policies for every growing collection.
+
+RETENTION says how long each collection keeps documents; DOWNSAMPLE says which
+aggregates outlive the raw data. Both storage backends apply them:
+- Mongo: time-series collections and TTL indexes expire the `native_ttl`
+  rules; the rest are deleted by a background pass in small batches over an
+  indexed time field, archiving first where the rule asks for it.
+- SQLite: the background pass applies every rule.
+
+Days can be overridden per collection with the RETENTION_DAYS setting, e.g.
+RETENTION_DAYS='{"chat_sessions": 365}'.
+"""
+
+import gzip
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from punisher.config import settings
+
+
+@dataclass(frozen=True)
+class Retention:
+    collection: str
+    # Field the age is measured on (indexed)
+    time_field: str
+    days: int
+    # Only documents that also match this filter expire
+    match: dict = field(default_factory=dict)
+    # Append expiring documents to RETENTION_ARCHIVE_DIR before deleting
+    archive: bool = False
+    # Mongo expires these itself (time-series collection or TTL index)
+    native_ttl: bool = False
+
+
+@dataclass(frozen=True)
+class Downsample:
+    """Aggregate `source` per `group` value and `unit` into `target`."""
+
+    source: str
+    target: str
+    time_field: str
+    group: str
+    unit: str  # "hour" or "day"
+    # field -> aggregates ("avg", "min", "max", "sum"), stored as field_agg
+    fields: dict[str, tuple[str, ...]]
+
+
+RETENTION = [
+    # Raw market data (1-minute and hourly bars are rolled up from it)
+    Retention("market_prices", "ts", 7, native_ttl=True),
+    Retention("whale_trades", "created_at", 30, native_ttl=True),
+    Retention("market_sentiment", "created_at", 7, native_ttl=True),
+    Retention("market_bars", "start", 30, match={"resolution": "1m"}, native_ttl=True),
+    Retention("market_sentiment_hourly", "start", 365),
+    Retention("wallet_history", "ts", settings.SNAPSHOT_HISTORY_DAYS, native_ttl=True),
+    Retention("agent_tasks", "timestamp", 90),
+    Retention("chat_sessions", "timestamp", 180, archive=True),
+    # Wallets discovered but never picked up by the monitor
+    Retention("tracked_wallets", "discovered_at", 90, match={"status": "discovered"}),
+]
+
+DOWNSAMPLE = [
+    # Hourly sentiment outlives the 7 days of raw samples
+    Downsample(
+        source="market_sentiment",
+        target="market_sentiment_hourly",
+        time_field="created_at",
+        group="coin",
+        unit="hour",
+        fields={"imbalance": ("avg", "min", "max")},
+    ),
+]
+
+UNIT_SECONDS = {"hour": 3600, "day": 86400}
+
+
+def retention_for(collection: str) -> Retention:
+    return next(r for r in RETENTION if r.collection == collection)
+
+
+def retention_seconds(collection: str) -> int:
+    rule = retention_for(collection)
+    return settings.RETENTION_DAYS.get(collection, rule.days) * 86400
+
+
+def archive_documents(collection: str, docs: list[dict]) -> Path:
+    """
+    Append docs as JSON lines to a gzip file per collection and month, synced
+    to disk before returning so the caller can safely delete them.
+    """
+    directory = Path(settings.RETENTION_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{collection}-{datetime.utcnow():%Y-%m}.jsonl.gz"
+    # Each append is its own gzip member; gzip readers concatenate them
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="ab") as out:
+            for doc in docs:
+                out.write(json.dumps(doc, default=str).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    return path
@@ -0,0 +1,985 @@
+"""
+Embedded SQLite storage (STORAGE_BACKEND=sqlite).
+
+Implements the Storage operations of MongoStorage in one SQLite file: each
+collection is a table whose filter and sort fields are indexed columns, with
+the rest of the document in a JSON column. Times are stored as UTC epoch
+seconds and returned as naive UTC datetimes, like pymongo returns them.
+
+All SQLite I/O runs on one dedicated thread, so coroutines never block the
+event loop. Every punisher.db.retention rule, including the ones Mongo
+applies with TTL indexes, runs in the background retention pass.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from punisher.config import settings
+from punisher.crypto.hyperliquid_parser import (
+    apply_wallet_diff,
+    diff_wallet_state,
+    snapshot_fingerprint,
+    wallet_state,
+)
+from punisher.db.bars import BAR_RESOLUTIONS, bar_start, pick_resolution
+from punisher.db.cache import ChatCache
+from punisher.db.history import next_history_entry
+from punisher.db.retention import (
+    DOWNSAMPLE,
+    RETENTION,
+    UNIT_SECONDS,
+    archive_documents,
+    retention_seconds,
+)
+
+logger = logging.getLogger("punisher.db.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    wallet_address TEXT NOT NULL,
+    state_hash TEXT NOT NULL,
+    snapshot_time_ms INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_wallet ON snapshots (wallet_address, updated_at);
+CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots (created_at);
+
+CREATE TABLE IF NOT EXISTS wallet_history (
+    id INTEGER PRIMARY KEY,
+    wallet_address TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ts REAL NOT NULL,
+    snapshot_time_ms INTEGER,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS wallet_history_kind ON wallet_history (wallet_address, kind, ts);
+CREATE INDEX IF NOT EXISTS wallet_history_ts ON wallet_history (ts);
+
+CREATE TABLE IF NOT EXISTS market_prices (ts REAL NOT NULL, mids TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS market_prices_ts ON market_prices (ts);
+
+CREATE TABLE IF NOT EXISTS whale_trades (
+    id INTEGER PRIMARY KEY,
+    coin TEXT,
+    usd_val REAL,
+    created_at REAL NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS whale_trades_created ON whale_trades (created_at);
+
+CREATE TABLE IF NOT EXISTS market_sentiment (
+    id INTEGER PRIMARY KEY,
+    coin TEXT,
+    imbalance REAL,
+    sentiment TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS market_sentiment_created ON market_sentiment (created_at);
+
+CREATE TABLE IF NOT EXISTS market_bars (
+    coin TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    start REAL NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    ticks INTEGER NOT NULL DEFAULT 0,
+    volume REAL NOT NULL DEFAULT 0,
+    trades INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (coin, resolution, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS market_bars_start ON market_bars (resolution, start);
+
+CREATE TABLE IF NOT EXISTS market_sentiment_hourly (
+    coin TEXT NOT NULL,
+    start REAL NOT NULL,
+    imbalance_avg REAL,
+    imbalance_min REAL,
+    imbalance_max REAL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (coin, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS market_sentiment_hourly_start
+    ON market_sentiment_hourly (start);
+
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_sessions_session ON chat_sessions (session_id, id);
+CREATE INDEX IF NOT EXISTS chat_sessions_timestamp ON chat_sessions (timestamp);
+
+CREATE TABLE IF NOT EXISTS tracked_wallets (
+    address TEXT PRIMARY KEY,
+    status TEXT,
+    discovered_at REAL,
+    updated_at REAL,
+    doc TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS tracked_wallets_status ON tracked_wallets (status);
+CREATE INDEX IF NOT EXISTS tracked_wallets_discovered
+    ON tracked_wallets (status, discovered_at);
+CREATE INDEX IF NOT EXISTS tracked_wallets_updated ON tracked_wallets (updated_at);
+
+CREATE TABLE IF NOT EXISTS agent_configs (agent_id TEXT PRIMARY KEY, doc TEXT NOT NULL);
+
+CREATE TABLE IF NOT EXISTS agent_tasks (
+    id INTEGER PRIMARY KEY,
+    agent TEXT,
+    task TEXT,
+    status TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agent_tasks_agent ON agent_tasks (agent, timestamp);
+CREATE INDEX IF NOT EXISTS agent_tasks_timestamp ON agent_tasks (timestamp);
+"""
+
+# Snapshot fields kept in the JSON document column
+_SNAPSHOT_FIELDS = (
+    "account_value",
+    "total_ntl_pos",
+    "total_raw_usd",
+    "total_margin_used",
+    "withdrawable",
+)
+# Times inside tracked_wallets documents
+_WALLET_TIMES = ("last_seen_at", "last_scan_at")
+_BAR_COLUMNS = (
+    "coin",
+    "resolution",
+    "start",
+    "open",
+    "high",
+    "low",
+    "close",
+    "ticks",
+    "volume",
+    "trades",
+)
+
+
+def _epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.timestamp()
+
+
+def _datetime(ts: float | None) -> datetime | None:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, UTC).replace(tzinfo=None)
+
+
+@contextmanager
+def _transaction(db: sqlite3.Connection):
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _retention_filter(rule, cutoff: float) -> tuple[str, tuple]:
+    where = "".join(f"{column} = ? AND " for column in rule.match)
+    return f"{where}{rule.time_field} < ?", (*rule.match.values(), cutoff)
+
+
+def _expiring(db: sqlite3.Connection, rule, cutoff: float, limit: int) -> list[dict]:
+    """
+    The oldest `limit` rows of a retention rule's table past cutoff: whole rows
+    (times as datetimes) to archive, otherwise only their times.
+    """
+    where, args = _retention_filter(rule, cutoff)
+    # Archived rows are deleted by rowid, the rest by time
+    columns = "rowid AS _rowid, *" if rule.archive else rule.time_field
+    rows = db.execute(
+        f"SELECT {columns} FROM {rule.collection} WHERE {where}"
+        f" ORDER BY {rule.time_field} LIMIT ?",
+        (*args, limit),
+    )
+    if not rule.archive:
+        return [dict(r) for r in rows]
+    return [dict(r, **{rule.time_field: _datetime(r[rule.time_field])}) for r in rows]
+
+
+def _expire(db: sqlite3.Connection, rule, cutoff: float, rows: list[dict]):
+    """Delete a batch returned by _expiring."""
+    if rule.archive:
+        ids = [r["_rowid"] for r in rows]
+        db.execute(
+            f"DELETE FROM {rule.collection}"
+            f" WHERE rowid IN ({', '.join('?' * len(ids))})",
+            ids,
+        )
+        return
+    where, args = _retention_filter(rule, cutoff)
+    db.execute(
+        f"DELETE FROM {rule.collection} WHERE {where} AND {rule.time_field} <= ?",
+        (*args, rows[-1][rule.time_field]),
+    )
+
+
+def _downsample(db: sqlite3.Connection, rule, since: float):
+    """Recompute rule.target aggregates for the units from `since` on."""
+    step = UNIT_SECONDS[rule.unit]
+    aggregates = [
+        (f"{name}_{agg}", f"{agg}({name})")
+        for name, aggs in rule.fields.items()
+        for agg in aggs
+    ]
+    columns = [rule.group, "start", "samples", *(c for c, _ in aggregates)]
+    db.execute(
+        f"INSERT INTO {rule.target} ({', '.join(columns)})"
+        f" SELECT {rule.group}, CAST({rule.time_field} / ? AS INTEGER) * ?,"
+        f" count(*), {', '.join(e for _, e in aggregates)}"
+        f" FROM {rule.source} WHERE {rule.time_field} >= ? GROUP BY 1, 2"
+        f" ON CONFLICT ({rule.group}, start) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in columns[2:]),
+        (step, step, since // step * step),
+    )
+
+
+def _snapshot_doc(row: sqlite3.Row) -> dict:
+    return {
+        "_id": row["id"],
+        "wallet_address": row["wallet_address"],
+        "snapshot_time_ms": row["snapshot_time_ms"],
+        **json.loads(row["doc"]),
+        "state_hash": row["state_hash"],
+        "created_at": _datetime(row["created_at"]),
+        "updated_at": _datetime(row["updated_at"]),
+    }
+
+
+def _wallet_doc(row: sqlite3.Row) -> dict:
+    doc = json.loads(row["doc"])
+    for field in _WALLET_TIMES:
+        if field in doc:
+            doc[field] = _datetime(doc[field])
+    return {
+        "address": row["address"],
+        "status": row["status"],
+        "discovered_at": _datetime(row["discovered_at"]),
+        **doc,
+    }
+
+
+def _state_at(db: sqlite3.Connection, wallet_address: str, ts: float):
+    key = db.execute(
+        "SELECT id, body FROM wallet_history"
+        " WHERE wallet_address = ? AND kind = 'key' AND ts <= ?"
+        " ORDER BY ts DESC, id DESC LIMIT 1",
+        (wallet_address, ts),
+    ).fetchone()
+    if key is None:
+        return None
+    state = json.loads(key["body"])
+    for (body,) in db.execute(
+        "SELECT body FROM wallet_history"
+        " WHERE wallet_address = ? AND kind = 'delta' AND id > ? AND ts <= ?"
+        " ORDER BY ts, id",
+        (wallet_address, key["id"], ts),
+    ):
+        state = apply_wallet_diff(state, json.loads(body))
+    return state
+
+
+class SQLiteStorage:
+    """Embedded single-file storage with the MongoStorage operations."""
+
+    _instance = None
+
+    # Unique states kept per wallet
+    SNAPSHOT_KEEP = 20
+    # Bars are rebuilt from raw ticks this often
+    ROLLUP_INTERVAL = 60.0  # seconds
+    # How far back the first rollup after startup reaches
+    ROLLUP_LOOKBACK = timedelta(hours=1)
+    # Retention pass interval, and batch size/pause of its deletes
+    RETENTION_INTERVAL = 600.0  # seconds
+    RETENTION_BATCH = 500
+    RETENTION_PAUSE = 0.05  # seconds between batches
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(settings.STORAGE_SQLITE_PATH)
+        return cls._instance
+
+    def __init__(self, path: str | Path = "data/punisher.db"):
+        self.path = str(path)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="punisher-db"
+        )
+        self._conn: sqlite3.Connection | None = None
+        # wallet -> (state_hash, id) of its latest snapshot
+        self._snapshot_cache: dict[str, tuple[str, int]] = {}
+        # wallet -> (changes since its last keyframe, last recorded state)
+        self._history: dict[str, tuple[int, dict]] = {}
+        # Addresses known to be in tracked_wallets; None until warmed
+        self._known_wallets: set[str] | None = None
+        self._chat_cache = ChatCache()
+        self._rollup_task: asyncio.Task | None = None
+        self._rollup_since: datetime | None = None
+        self._retention_task: asyncio.Task | None = None
+        # Source rows from here on still need downsampling
+        self._downsample_since: datetime | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        """The connection, opened on first use (always on the executor thread)."""
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL;")
+            # WAL + NORMAL only fsyncs on checkpoint, not on every commit
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("PRAGMA busy_timeout=5000;")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        """Run fn(connection, *args) on the storage thread."""
+        if self._retention_task is None:
+            self._retention_task = asyncio.create_task(self._retention())
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._db(), *args))
+
+    # --- Wallet states ---
+
+    async def save_wallet_snapshot(self, wallet_address: str, parsed_data: dict):
+        """
+        Save wallet snapshot - Only new unique states (SNAPSHOT_KEEP per wallet).
+        An unchanged state only touches the latest row's timestamps.
+        """
+        summary = parsed_data.get("summary", {})
+        positions = parsed_data.get("positions", [])
+        orders = parsed_data.get("orders", [])
+        snapshot_time_ms = parsed_data.get("ts")
+        current_hash = snapshot_fingerprint(summary, positions, orders)
+        cached = self._snapshot_cache.get(wallet_address)
+        now = time.time()
+
+        def save(db):
+            latest = cached
+            if latest is None:
+                row = db.execute(
+                    "SELECT state_hash, id FROM snapshots WHERE wallet_address = ?"
+                    " ORDER BY updated_at DESC LIMIT 1",
+                    (wallet_address,),
+                ).fetchone()
+                latest = tuple(row) if row else None
+            if latest is not None and latest[0] == current_hash:
+                db.execute(
+                    "UPDATE snapshots SET updated_at = ?, snapshot_time_ms = ?"
+                    " WHERE id = ?",
+                    (now, snapshot_time_ms, latest[1]),
+                )
+                return latest, "updated_timestamp"
+
+            doc = {f: summary.get(f) for f in _SNAPSHOT_FIELDS}
+            doc.update(positions=positions, open_orders=orders)
+            with _transaction(db):
+                cur = db.execute(
+                    "INSERT INTO snapshots (wallet_address, state_hash,"
+                    " snapshot_time_ms, created_at, updated_at, doc)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        wallet_address,
+                        current_hash,
+                        snapshot_time_ms,
+                        now,
+                        now,
+                        json.dumps(doc),
+                    ),
+                )
+                db.execute(
+                    "DELETE FROM snapshots WHERE wallet_address = ? AND id NOT IN"
+                    " (SELECT id FROM snapshots WHERE wallet_address = ?"
+                    "  ORDER BY updated_at DESC LIMIT ?)",
+                    (wallet_address, wallet_address, self.SNAPSHOT_KEEP),
+                )
+            return (current_hash, cur.lastrowid), cur.lastrowid
+
+        latest, result = await self._run(save)
+        self._snapshot_cache[wallet_address] = latest
+        if result != "updated_timestamp" and settings.SNAPSHOT_HISTORY:
+            entry = next_history_entry(self._history, wallet_address, parsed_data)
+            if entry is not None:
+                await self._run(
+                    lambda db: db.execute(
+                        "INSERT INTO wallet_history (wallet_address, kind, ts,"
+                        " snapshot_time_ms, body) VALUES (?, ?, ?, ?, ?)",
+                        (
+                            wallet_address,
+                            entry["kind"],
+                            now,
+                            snapshot_time_ms,
+                            json.dumps(entry.get("state", entry.get("diff"))),
+                        ),
+                    )
+                )
+        return result
+
+    async def get_latest_snapshots(self, wallet_address: str, limit: int = 10):
+        """Get latest snapshots for a wallet"""
+
+        def latest(db):
+            rows = db.execute(
+                "SELECT * FROM snapshots WHERE wallet_address = ?"
+                " ORDER BY created_at DESC LIMIT ?",
+                (wallet_address, limit),
+            )
+            return [_snapshot_doc(r) for r in rows]
+
+        return await self._run(latest)
+
+    async def get_recent_snapshots(self, limit: int = 10) -> list[dict]:
+        """Newest wallet states across all wallets."""
+
+        def recent(db):
+            rows = db.execute(
+                "SELECT * FROM snapshots ORDER BY created_at DESC LIMIT ?", (limit,)
+            )
+            return [_snapshot_doc(r) for r in rows]
+
+        return await self._run(recent)
+
+    async def get_wallet_state_at(self, wallet_address: str, ts: datetime):
+        """Wallet state as of ts, from the nearest keyframe and the diffs after it."""
+        return await self._run(_state_at, wallet_address, _epoch(ts))
+
+    async def get_wallet_changes(self, wallet_address: str, since: datetime):
+        """Stream the wallet's changes after `since` (see MongoStorage)."""
+
+        def changes(db):
+            state = _state_at(db, wallet_address, _epoch(since))
+            rows = db.execute(
+                "SELECT kind, ts, snapshot_time_ms, body FROM wallet_history"
+                " WHERE wallet_address = ? AND ts > ? ORDER BY ts, id",
+                (wallet_address, _epoch(since)),
+            ).fetchall()
+            return state or wallet_state({}), rows
+
+        state, rows = await self._run(changes)
+        for row in rows:
+            body = json.loads(row["body"])
+            if row["kind"] == "key":
+                diff = diff_wallet_state(state, body)
+                state = body
+            else:
+                diff = body
+                state = apply_wallet_diff(state, diff)
+            if diff:
+                yield {
+                    "ts": _datetime(row["ts"]),
+                    "snapshot_time_ms": row["snapshot_time_ms"],
+                    "diff": diff,
+                }
+
+    # --- Market data ---
+
+    async def save_trade(self, coin: str, trade_data: dict):
+        """Save whale trade"""
+        doc = {
+            f: trade_data.get(f) for f in ("sz", "px", "side", "usd_val", "ts", "hash")
+        }
+
+        def insert(db):
+            return db.execute(
+                "INSERT INTO whale_trades (coin, usd_val, created_at, doc)"
+                " VALUES (?, ?, ?, ?)",
+                (coin, doc["usd_val"], time.time(), json.dumps(doc)),
+            ).lastrowid
+
+        return await self._run(insert)
+
+    async def save_market_mids(self, mids: dict):
+        """Save mid-price snapshot for key assets"""
+        self._start_market_rollups()
+        subset = {k: v for k, v in mids.items() if k in ["BTC", "ETH", "SOL", "HYPE"]}
+        if not subset:
+            return None
+
+        def insert(db):
+            return db.execute(
+                "INSERT INTO market_prices (ts, mids) VALUES (?, ?)",
+                (time.time(), json.dumps(subset)),
+            ).lastrowid
+
+        return await self._run(insert)
+
+    async def save_market_sentiment(self, coin: str, imbalance: float, sentiment: str):
+        """Save market sentiment snapshot"""
+
+        def insert(db):
+            return db.execute(
+                "INSERT INTO market_sentiment (coin, imbalance, sentiment, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (coin, imbalance, sentiment, time.time()),
+            ).lastrowid
+
+        return await self._run(insert)
+
+    def _start_market_rollups(self):
+        if self._rollup_task is None or self._rollup_task.done():
+            self._rollup_task = asyncio.create_task(self._market_rollups())
+
+    async def _market_rollups(self):
+        """Background job: roll raw ticks up into bars."""
+        while True:
+            await asyncio.sleep(self.ROLLUP_INTERVAL)
+            try:
+                await self.rollup_market_bars()
+            except Exception as e:
+                logger.error(f"Market rollup error: {e}")
+
+    async def rollup_market_bars(self, since: datetime | None = None) -> datetime:
+        """
+        Rebuild the 1-minute and 1-hour bars from the raw ticks since `since`
+        (see MongoStorage.rollup_market_bars). Returns the time the next run
+        continues from.
+        """
+        now = datetime.utcnow()
+        if since is None:
+            since = self._rollup_since or now - self.ROLLUP_LOOKBACK
+        minute = _epoch(bar_start(since, "1m"))
+        hour = _epoch(bar_start(since, "1h"))
+        minute_s, hour_s = BAR_RESOLUTIONS["1m"], BAR_RESOLUTIONS["1h"]
+
+        def rollup(db):
+            # (coin, start) -> [open, high, low, close, ticks, volume, trades]
+            bars = {}
+            for ts, mids in db.execute(
+                "SELECT ts, mids FROM market_prices WHERE ts >= ? ORDER BY ts",
+                (minute,),
+            ):
+                start = ts // minute_s * minute_s
+                for coin, px in json.loads(mids).items():
+                    bar = bars.get((coin, start))
+                    if bar is None:
+                        bars[coin, start] = [px, px, px, px, 1, 0.0, 0]
+                    else:
+                        bar[1] = max(bar[1], px)
+                        bar[2] = min(bar[2], px)
+                        bar[3] = px
+                        bar[4] += 1
+            # Volume of the recorded (whale) trades, onto bars that have prices
+            for coin, start, volume, trades in db.execute(
+                "SELECT coin, CAST(created_at / ? AS INTEGER) * ?, sum(usd_val),"
+                " count(*) FROM whale_trades WHERE created_at >= ? GROUP BY 1, 2",
+                (minute_s, minute_s, minute),
+            ):
+                if (coin, start) in bars:
+                    bars[coin, start][5:] = [volume or 0.0, trades]
+
+            upsert = (
+                f"INSERT INTO market_bars ({', '.join(_BAR_COLUMNS)})"
+                f" VALUES ({', '.join('?' * len(_BAR_COLUMNS))})"
+                " ON CONFLICT (coin, resolution, start) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in _BAR_COLUMNS[3:])
+            )
+            with _transaction(db):
+                db.executemany(
+                    upsert,
+                    [(coin, "1m", start, *bar) for (coin, start), bar in bars.items()],
+                )
+                hourly = {}
+                for coin, start, o, h, lo, c, ticks, volume, trades in db.execute(
+                    "SELECT coin, start, open, high, low, close, ticks, volume,"
+                    " trades FROM market_bars"
+                    " WHERE resolution = '1m' AND start >= ? ORDER BY start",
+                    (hour,),
+                ):
+                    key = (coin, start // hour_s * hour_s)
+                    bar = hourly.get(key)
+                    if bar is None:
+                        hourly[key] = [o, h, lo, c, ticks, volume, trades]
+                    else:
+                        bar[1] = max(bar[1], h)
+                        bar[2] = min(bar[2], lo)
+                        bar[3] = c
+                        bar[4] += ticks
+                        bar[5] += volume
+                        bar[6] += trades
+                db.executemany(
+                    upsert,
+                    [
+                        (coin, "1h", start, *bar)
+                        for (coin, start), bar in hourly.items()
+                    ],
+                )
+
+        await self._run(rollup)
+        self._rollup_since = now
+        return now
+
+    async def _retention(self):
+        """Background job: downsample, then expire old rows in batches."""
+        while True:
+            await asyncio.sleep(self.RETENTION_INTERVAL)
+            try:
+                await self.apply_retention()
+            except Exception as e:
+                logger.error(f"Retention error: {e}")
+
+    async def apply_retention(self) -> dict[str, int]:
+        """Run DOWNSAMPLE and RETENTION once; returns rows expired per table."""
+        now = datetime.utcnow()
+        since = self._downsample_since
+        for rule in DOWNSAMPLE:
+            start = since or now - timedelta(seconds=retention_seconds(rule.source))
+            await self._run(_downsample, rule, _epoch(start))
+        self._downsample_since = now
+
+        expired = {}
+        for rule in RETENTION:
+            cutoff = _epoch(now) - retention_seconds(rule.collection)
+            expired[rule.collection] = 0
+            while True:
+                rows = await self._run(_expiring, rule, cutoff, self.RETENTION_BATCH)
+                if not rows:
+                    break
+                if rule.archive:
+                    await asyncio.to_thread(archive_documents, rule.collection, rows)
+                await self._run(_expire, rule, cutoff, rows)
+                expired[rule.collection] += len(rows)
+                if len(rows) < self.RETENTION_BATCH:
+                    break
+                await asyncio.sleep(self.RETENTION_PAUSE)
+            if expired[rule.collection]:
+                logger.info(
+                    f"Expired {expired[rule.collection]} {rule.collection} rows"
+                )
+        # Forget what the in-process caches remember of deleted rows
+        if expired.get("chat_sessions"):
+            self._chat_cache = ChatCache()
+        if expired.get("tracked_wallets"):
+            self._known_wallets = None
+        return expired
+
+    async def get_market_bars(
+        self,
+        coin: str,
+        start: datetime,
+        end: datetime | None = None,
+        max_points: int = 500,
+        resolution: str | None = None,
+    ) -> list[dict]:
+        """OHLC bars for a coin over [start, end), oldest first (see MongoStorage)."""
+        end = end or datetime.utcnow()
+        resolution = resolution or pick_resolution(start, end, max_points)
+
+        def bars(db):
+            rows = db.execute(
+                f"SELECT {', '.join(_BAR_COLUMNS)} FROM market_bars"
+                " WHERE coin = ? AND resolution = ? AND start >= ? AND start < ?"
+                " ORDER BY start",
+                (coin, resolution, _epoch(bar_start(start, resolution)), _epoch(end)),
+            )
+            return [dict(r, start=_datetime(r["start"])) for r in rows]
+
+        return await self._run(bars)
+
+    # --- Chat ---
+
+    async def save_chat_message(self, session_id: str, role: str, content: str):
+        """Save a chat message to persistent history"""
+        now = time.time()
+
+        def insert(db):
+            return db.execute(
+                "INSERT INTO chat_sessions (session_id, role, content, timestamp)"
+                " VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now),
+            ).lastrowid
+
+        message_id = await self._run(insert)
+        self._chat_cache.append(
+            session_id,
+            {
+                "role": role,
+                "content": content,
+                "timestamp": _datetime(now),
+                "cursor": str(message_id),
+            },
+        )
+        return message_id
+
+    async def _chat_messages(self, session_id: str, limit: int, before=None):
+        """Newest `limit` messages (older than cursor `before`), oldest first."""
+
+        def newest(db):
+            rows = db.execute(
+                "SELECT id, role, content, timestamp FROM chat_sessions"
+                " WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session_id, int(before) if before else 2**63 - 1, limit),
+            ).fetchall()
+            return [
+                {
+                    "role": r["role"],
+                    "content": r["content"],
+                    "timestamp": _datetime(r["timestamp"]),
+                    "cursor": str(r["id"]),
+                }
+                for r in reversed(rows)
+            ]
+
+        return await self._run(newest)
+
+    async def _recent_chat(self, session_id: str, limit: int) -> list[dict]:
+        """Newest `limit` messages, from the session cache when it can answer."""
+        messages = self._chat_cache.get(session_id, limit)
+        if messages is None:
+            fetch = max(limit, self._chat_cache.messages)
+            self._chat_cache.begin_load(session_id)
+            try:
+                messages = await self._chat_messages(session_id, fetch)
+            except Exception:
+                self._chat_cache.end_load(session_id)
+                raise
+            self._chat_cache.put(session_id, messages, complete=len(messages) < fetch)
+            messages = self._chat_cache.get(session_id, limit) or messages[-limit:]
+        return messages
+
+    async def get_chat_history(self, session_id: str, limit: int = 20):
+        """The newest `limit` messages of a session, oldest first, for LLM context"""
+        messages = await self._recent_chat(session_id, limit)
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+    async def get_chat_page(
+        self, session_id: str, limit: int = 50, before: str | None = None
+    ) -> dict:
+        """A page of a session's history, oldest first (see MongoStorage)."""
+        if before is None:
+            messages = await self._recent_chat(session_id, limit)
+        else:
+            messages = await self._chat_messages(session_id, limit, before)
+        return {
+            "messages": [
+                {
+                    "role": m["role"],
+                    "content": m["content"],
+                    "timestamp": m["timestamp"],
+                }
+                for m in messages
+            ],
+            "next_cursor": messages[0]["cursor"] if len(messages) == limit else None,
+        }
+
+    # --- Tracked wallets ---
+
+    async def upsert_discovered_wallets(
+        self, wallets: list[dict], source: str, range_id=None
+    ) -> int:
+        """Upsert a page of discovered wallets; returns how many were new."""
+
+        def upsert(db):
+            if self._known_wallets is None:
+                self._known_wallets = {
+                    a for (a,) in db.execute("SELECT address FROM tracked_wallets")
+                }
+            fresh = {
+                w["address"]: w
+                for w in wallets
+                if w["address"] not in self._known_wallets
+            }
+            now = time.time()
+            inserted = 0
+            with _transaction(db):
+                for address, item in fresh.items():
+                    seen = {
+                        "pnl_str": item.get("pnl"),
+                        "win_rate_str": item.get("win_rate"),
+                        "meta": item.get("meta"),
+                        "last_seen_at": now,
+                    }
+                    cur = db.execute(
+                        "INSERT OR IGNORE INTO tracked_wallets"
+                        " (address, status, discovered_at, updated_at, doc)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (
+                            address,
+                            "discovered",
+                            now,
+                            now,
+                            json.dumps(seen | {"source": source, "range_id": range_id}),
+                        ),
+                    )
+                    if cur.rowcount:
+                        inserted += 1
+                        continue
+                    (doc,) = db.execute(
+                        "SELECT doc FROM tracked_wallets WHERE address = ?", (address,)
+                    ).fetchone()
+                    db.execute(
+                        "UPDATE tracked_wallets SET doc = ?, updated_at = ?"
+                        " WHERE address = ?",
+                        (json.dumps(json.loads(doc) | seen), now, address),
+                    )
+            self._known_wallets.update(fresh)
+            return inserted
+
+        return await self._run(upsert)
+
+    async def get_target_wallets(self, statuses: list[str]) -> list[str]:
+        """Addresses of tracked wallets in any of the given statuses."""
+
+        def targets(db):
+            rows = db.execute(
+                "SELECT address FROM tracked_wallets WHERE status IN"
+                f" ({', '.join('?' * len(statuses))})",
+                statuses,
+            )
+            return [a for (a,) in rows]
+
+        return await self._run(targets)
+
+    async def get_wallets_updated_since(
+        self, since: datetime | None = None
+    ) -> list[dict]:
+        """Tracked wallets written at or after `since` (see MongoStorage)."""
+
+        def changed(db):
+            where, args = (
+                ("", ())
+                if since is None
+                else (
+                    "WHERE updated_at >= ? ORDER BY updated_at",
+                    (_epoch(since),),
+                )
+            )
+            rows = db.execute(
+                f"SELECT address, status, updated_at FROM tracked_wallets {where}",
+                args,
+            )
+            return [dict(r, updated_at=_datetime(r["updated_at"])) for r in rows]
+
+        return await self._run(changed)
+
+    async def set_wallet_status(self, address: str, status: str):
+        """Set a wallet's scan/monitor status, tracking it if it is not yet."""
+
+        def update(db):
+            now = time.time()
+            db.execute(
+                "INSERT INTO tracked_wallets (address, status, updated_at, doc)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (address) DO UPDATE SET status = excluded.status,"
+                " updated_at = excluded.updated_at,"
+                " doc = json_set(doc, '$.last_scan_at', ?)",
+                (address, status, now, json.dumps({"last_scan_at": now}), now),
+            )
+            if self._known_wallets is not None:
+                self._known_wallets.add(address)
+
+        await self._run(update)
+
+    async def get_recent_wallets(self, limit: int = 3) -> list[dict]:
+        """Newest discovered wallets."""
+
+        def recent(db):
+            rows = db.execute(
+                "SELECT * FROM tracked_wallets ORDER BY discovered_at DESC LIMIT ?",
+                (limit,),
+            )
+            return [_wallet_doc(r) for r in rows]
+
+        return await self._run(recent)
+
+    async def count_wallets(self) -> int:
+        return await self._run(
+            lambda db: db.execute("SELECT count(*) FROM tracked_wallets").fetchone()[0]
+        )
+
+    # --- Agents ---
+
+    async def get_agent_config(self, agent_id: str) -> dict | None:
+        def config(db):
+            row = db.execute(
+                "SELECT doc FROM agent_configs WHERE agent_id = ?", (agent_id,)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+        return await self._run(config)
+
+    async def get_agent_configs(self) -> list[dict]:
+        def configs(db):
+            rows = db.execute("SELECT doc FROM agent_configs LIMIT 100")
+            return [json.loads(doc) for (doc,) in rows]
+
+        return await self._run(configs)
+
+    async def save_agent_config(self, agent_id: str, fields: dict):
+        """Set config fields for an agent, creating its config if needed."""
+
+        def save(db):
+            with _transaction(db):
+                row = db.execute(
+                    "SELECT doc FROM agent_configs WHERE agent_id = ?", (agent_id,)
+                ).fetchone()
+                doc = json.loads(row[0]) if row else {"agent_id": agent_id}
+                db.execute(
+                    "INSERT OR REPLACE INTO agent_configs (agent_id, doc) VALUES (?, ?)",
+                    (agent_id, json.dumps(doc | fields)),
+                )
+
+        await self._run(save)
+
+    async def log_task(self, agent: str, task: str, status: str = "completed"):
+        """Record task history for the management UI"""
+
+        def insert(db):
+            return db.execute(
+                "INSERT INTO agent_tasks (agent, task, status, timestamp)"
+                " VALUES (?, ?, ?, ?)",
+                (agent, task, status, time.time()),
+            ).lastrowid
+
+        return await self._run(insert)
+
+    async def get_agent_tasks(self, agent: str | None = None, limit: int = 50):
+        """Newest tasks, optionally for one agent."""
+
+        def tasks(db):
+            where, args = ("WHERE agent = ?", (agent,)) if agent else ("", ())
+            rows = db.execute(
+                "SELECT agent, task, status, timestamp FROM agent_tasks"
+                f" {where} ORDER BY timestamp DESC LIMIT ?",
+                (*args, limit),
+            )
+            return [dict(r, timestamp=_datetime(r["timestamp"])) for r in rows]
+
+        return await self._run(tasks)
+
+    async def close(self):
+        if self._rollup_task is not None:
+            self._rollup_task.cancel()
+            self._rollup_task = None
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+
+        def close(db):
+            db.close()
+            self._conn = None
+
+        if self._conn is not None:
+            await self._run(close)
+        self._retention_task = None
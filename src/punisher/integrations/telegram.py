@@ -9,7 +9,8 @@ from telegram.ext import (
     filters,
 )
 from punisher.config import settings
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_async_queue
+from punisher.bus.queue import PRIORITY_INTERACTIVE
 
 logger = logging.getLogger("punisher.telegram")
 
@@ -17,7 +18,7 @@ logger = logging.getLogger("punisher.telegram")
 class TelegramBot:
     def __init__(self):
         self.token = settings.TELEGRAM_BOT_TOKEN
-        self.queue = MessageQueue()
+        self.queue = get_async_queue()
         self.app = None
         self.running = False
 
@@ -56,10 +57,8 @@ class TelegramBot:
         text = update.message.text
         chat_id = update.effective_chat.id
 
-        import json
-
         payload = {"source": f"telegram:{chat_id}", "content": text}
-        self.queue.push("punisher:inbox", json.dumps(payload))
+        await self.queue.push("punisher:inbox", payload, PRIORITY_INTERACTIVE)
 
     async def response_listener(self):
         """Listen for outgoing messages addressed to telegram"""
@@ -74,11 +73,10 @@ class TelegramBot:
 
                 # In this architecture, we'll monitor a generic 'punisher:telegram:out'
                 # where the orchestrator puts JSON with {chat_id: ..., content: ...}
-                msg_raw = self.queue.pop("punisher:telegram:out", timeout=0)
-                if msg_raw:
-                    import json
-
-                    data = json.loads(msg_raw)
+                # Woken on delivery; the timeout only re-checks self.running
+                for data in await self.queue.pop_many(
+                    "punisher:telegram:out", max_n=20, timeout=1, decode=True
+                ):
                     chat_id = data.get("chat_id")
                     content = data.get("content")
                     if chat_id and content:
@@ -92,5 +90,4 @@ class TelegramBot:
 
             except Exception as e:
                 logger.error(f"Telegram listener error: {e}")
-
-            await asyncio.sleep(0.5)
+                await asyncio.sleep(0.5)
@@ -7,9 +7,8 @@ import asyncio
 import logging
 import random
 import nodriver as uc
-from datetime import datetime, UTC
-from punisher.db.mongo import mongo
-from punisher.bus.queue import MessageQueue
+from punisher.db.backend import get_storage
+from punisher.bus.backend import get_queue
 
 logger = logging.getLogger("punisher.scrapers.coinglass")
 
@@ -17,13 +16,13 @@ logger = logging.getLogger("punisher.scrapers.coinglass")
 class CoinGlassScraper:
     def __init__(self):
         self.base_url = "https://www.coinglass.com/hl/range/{group_id}"
-        self.queue = MessageQueue()
+        self.queue = get_queue()
         self.target_total = 10000
         self.discovered_total = 0
         self.browsing_speed_range = (3, 6)
 
     async def broadcast(self, msg: str):
-        self.queue.push("punisher:cli:out", f"[🕵️] {msg}")
+        self.queue.publish("punisher:cli:out", f"[🕵️] {msg}")
         logger.info(msg)
 
     async def start(self):
@@ -180,33 +179,10 @@ class CoinGlassScraper:
             return False
 
     async def save_wallets(self, wallets_data, range_id):
-        """Save unique wallets to MongoDB"""
-        db = await mongo.get_db()
-        count = 0
-        for item in wallets_data:
-            address = item["address"]
-            res = await db.tracked_wallets.update_one(
-                {"address": address},
-                {
-                    "$set": {
-                        "pnl_str": item.get("pnl"),
-                        "win_rate_str": item.get("win_rate"),
-                        "meta": item.get("meta"),
-                        "last_seen_at": datetime.now(UTC),
-                    },
-                    "$setOnInsert": {
-                        "address": address,
-                        "source": "coinglass_dom_v2",
-                        "range_id": range_id,
-                        "status": "discovered",
-                        "discovered_at": datetime.now(UTC),
-                    },
-                },
-                upsert=True,
-            )
-            if res.upserted_id:
-                count += 1
-        return count
+        """Save unique wallets to MongoDB; returns how many were new"""
+        return await get_storage().upsert_discovered_wallets(
+            wallets_data, "coinglass_dom_v2", range_id
+        )
 
 
 if __name__ == "__main__":
@@ -2,14 +2,18 @@ import asyncio
 import logging
 import uvicorn
 import json
+import uuid
+from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, StreamingResponse
 from punisher.core.orchestrator import AgentOrchestrator
 from punisher.config import settings
-from punisher.bus.queue import MessageQueue
-from punisher.db.mongo import mongo
+from punisher.bus.async_queue import AsyncMessageQueue
+from punisher.bus.backend import get_async_queue
+from punisher.bus.queue import PRIORITY_INTERACTIVE, QueueCompactor
+from punisher.db.backend import get_storage
 from punisher.integrations.telegram import TelegramBot
 from punisher.scheduler.research import ResearchScheduler
 
@@ -20,7 +24,12 @@ logger = logging.getLogger("punisher.server")
 orchestrator = AgentOrchestrator()
 telegram = TelegramBot()
 research_scheduler = ResearchScheduler()
-queue = MessageQueue()
+queue = get_async_queue()
+storage = get_storage()
+# With the broker backend the broker compacts its own write-through store
+compactor = (
+    QueueCompactor(queue.queue) if isinstance(queue, AsyncMessageQueue) else None
+)
 
 
 @asynccontextmanager
@@ -29,14 +38,20 @@ async def lifespan(app: FastAPI):
     t1 = asyncio.create_task(orchestrator.start())
     t2 = asyncio.create_task(telegram.start())
     research_scheduler.start()
+    if compactor:
+        compactor.start()
     yield
     # Shutdown
     orchestrator.stop()
     await telegram.stop()
     research_scheduler.stop()
+    if compactor:
+        compactor.stop()
     await t1
     if t2:
         await t2
+    # Flush buffered writes before the process exits
+    await storage.close()
 
 
 app = FastAPI(title="Punisher", lifespan=lifespan)
@@ -67,9 +82,7 @@ async def read_root():
 
 @app.get("/api/agents/config")
 async def get_all_configs():
-    db = await mongo.get_db()
-    configs = await db.agent_configs.find({}, {"_id": 0}).to_list(length=100)
-    return configs
+    return await storage.get_agent_configs()
 
 
 @app.post("/api/agents/config")
@@ -79,37 +92,33 @@ async def save_config(request: Request):
     if not agent_id:
         return {"error": "Missing agent_id"}
 
-    db = await mongo.get_db()
-    await db.agent_configs.update_one(
-        {"agent_id": agent_id},
+    await storage.save_agent_config(
+        agent_id,
         {
-            "$set": {
-                "system_prompt": data.get("system_prompt"),
-                "temperature": float(data.get("temperature", 0.7)),
-            }
+            "system_prompt": data.get("system_prompt"),
+            "temperature": float(data.get("temperature", 0.7)),
         },
-        upsert=True,
     )
     return {"status": "saved"}
 
 
 @app.get("/api/agents/tasks")
 async def get_tasks(agent: str = None):
-    db = await mongo.get_db()
-    query = {"agent": agent} if agent else {}
-    tasks = (
-        await db.agent_tasks.find(query, {"_id": 0})
-        .sort("timestamp", -1)
-        .limit(50)
-        .to_list(length=50)
-    )
-    return tasks
+    return await storage.get_agent_tasks(agent, limit=50)
 
 
 @app.get("/api/chat/history")
-async def get_chat_history(session_id: str = "default"):
-    history = await mongo.get_chat_history(session_id, limit=50)
-    return history
+async def get_chat_history(
+    session_id: str = "default", limit: int = 50, before: str | None = None
+):
+    # Newest page first; pass next_cursor back as `before` for older messages
+    return await storage.get_chat_page(session_id, limit=limit, before=before)
+
+
+@app.get("/api/market/bars")
+async def get_market_bars(coin: str = "BTC", hours: float = 24, max_points: int = 500):
+    start = datetime.utcnow() - timedelta(hours=hours)
+    return await storage.get_market_bars(coin, start, max_points=max_points)
 
 
 # --- Command & Event API ---
@@ -125,25 +134,40 @@ async def send_command(request: Request):
         return {"error": "No command provided"}
 
     payload = {"source": "web", "content": command, "session_id": session_id}
-    queue.push("punisher:inbox", json.dumps(payload))
+    await queue.push("punisher:inbox", payload, PRIORITY_INTERACTIVE)
     return {"status": "sent"}
 
 
 @app.get("/api/events")
 async def events(request: Request):
+    # Every SSE connection is its own topic consumer, so each tab sees every broadcast
+    consumer = f"web:{uuid.uuid4().hex}"
+
     async def event_generator():
-        while True:
-            msg = queue.pop("punisher:cli:out", timeout=0)
-            if msg:
-                yield f"data: {json.dumps({'type': 'broadcast', 'content': msg})}\n\n"
-
-            resp = queue.pop("punisher:web:out", timeout=0)
-            if resp:
-                yield f"data: {json.dumps({'type': 'response', 'content': resp})}\n\n"
-
-            await asyncio.sleep(0.1)
-            if await request.is_disconnected():
-                break
+        try:
+            while True:
+                # Drain in batches: one statement per channel per tick instead of one per message
+                broadcasts = await queue.subscribe(
+                    "punisher:cli:out", consumer, max_n=100, timeout=0
+                )
+                for msg in broadcasts:
+                    yield f"data: {json.dumps({'type': 'broadcast', 'content': msg})}\n\n"
+
+                responses = await queue.pop_many(
+                    "punisher:web:out", max_n=20, timeout=0
+                )
+                for resp in responses:
+                    yield f"data: {json.dumps({'type': 'response', 'content': resp})}\n\n"
+
+                if await request.is_disconnected():
+                    break
+                if not broadcasts and not responses:
+                    # Sleep until either channel is written; the timeout bounds disconnect detection
+                    await queue.wait(
+                        ["punisher:cli:out", "punisher:web:out"], timeout=1
+                    )
+        finally:
+            await queue.unsubscribe("punisher:cli:out", consumer)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
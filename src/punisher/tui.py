@@ -1,4 +1,4 @@
-import json
+import os
 import httpx
 from datetime import datetime
 
@@ -10,10 +10,11 @@ from textual.containers import Container, Horizontal, Vertical, ScrollableContai
 from textual.message import Message
 from textual.widgets import Header, Footer, Input, Log, DataTable, Static, Label, Select
 
-from punisher.bus.queue import MessageQueue
+from punisher.bus.backend import get_queue
+from punisher.bus.queue import PRIORITY_INTERACTIVE
 
 # Initialize Infrastructure
-queue = MessageQueue()
+queue = get_queue()
 
 
 class NewMessage(Message):
@@ -275,9 +276,11 @@ class PunisherTUI(App):
     @work(thread=True)
     def poll_queue_worker(self) -> None:
         """Isolated sync thread for blocking queue polling."""
+        consumer = f"tui:{os.getpid()}"
         while True:
-            msg = queue.pop("punisher:cli:out", timeout=1)
-            if msg:
+            for msg in queue.subscribe(
+                "punisher:cli:out", consumer, max_n=50, timeout=1
+            ):
                 self.post_message(NewMessage(msg))
 
     @on(NewMessage)
@@ -315,7 +318,7 @@ class PunisherTUI(App):
             "content": cmd,
             "timestamp": datetime.now().isoformat(),
         }
-        queue.push("punisher:inbox", json.dumps(envelope))
+        queue.push("punisher:inbox", envelope, PRIORITY_INTERACTIVE)
 
     @on(Select.Changed)
     def on_model_select(self, event: Select.Changed) -> None:
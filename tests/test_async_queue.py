@@ -0,0 +1,65 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from punisher.bus.async_queue import AsyncMessageQueue
+from punisher.bus.queue import MessageQueue
+
+
+@pytest.mark.asyncio
+async def test_async_pop_wakes_on_in_process_push(tmp_path):
+    db_path = str(tmp_path / "test_async.db")
+    aq = AsyncMessageQueue(db_path)
+    producer = MessageQueue(db_path)
+
+    assert await aq.pop("inbox", timeout=0) is None
+
+    async def push_later():
+        await asyncio.sleep(0.05)
+        producer.push("inbox", "hello")
+
+    start = time.monotonic()
+    task = asyncio.create_task(push_later())
+    msg = await aq.pop("inbox", timeout=5)
+    elapsed = time.monotonic() - start
+    await task
+    aq.close()
+
+    assert msg == "hello"
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+async def test_async_subscribe_wakes_on_foreign_commit(tmp_path):
+    db_path = str(tmp_path / "test_async_foreign.db")
+    aq = AsyncMessageQueue(db_path)
+    assert await aq.subscribe("broadcast", "sse", timeout=0) == []
+
+    def foreign_publish():
+        # A plain connection bypasses the in-process hook, like another process would
+        time.sleep(0.05)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(
+                "INSERT INTO topic_log (topic, payload, created_at) VALUES (?, ?, ?)",
+                ("broadcast", "[POS] BTC", time.time()),
+            )
+
+    start = time.monotonic()
+    writer = asyncio.get_running_loop().run_in_executor(None, foreign_publish)
+    batch = await aq.subscribe("broadcast", "sse", timeout=5)
+    elapsed = time.monotonic() - start
+    await writer
+    aq.close()
+
+    assert batch == ["[POS] BTC"]
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+async def test_async_wait_times_out(tmp_path):
+    aq = AsyncMessageQueue(str(tmp_path / "test_async_wait.db"))
+    assert await aq.wait(["a", "b"], timeout=0.05) is False
+    assert await aq.pop_many("a", timeout=0.05) == []
+    aq.close()
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from punisher.bus.broker import AsyncBrokerClient, BrokerClient, QueueBroker
+from punisher.bus.queue import PRIORITY_BULK, PRIORITY_INTERACTIVE, MessageQueue
+
+
+def start_broker(socket_path, store=None, broker=None):
+    """Run a broker on its own loop thread; returns a stop() callable."""
+    broker = broker or QueueBroker(socket_path, store=store)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(broker.serve())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    client = BrokerClient(socket_path)
+    for _ in range(100):
+        try:
+            client._call("ping")
+            break
+        except OSError:
+            time.sleep(0.02)
+    client.close()
+
+    def stop():
+        loop.call_soon_threadsafe(task.cancel)
+        time.sleep(0.1)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+    return stop
+
+
+def test_broker_queue_and_topics(tmp_path):
+    socket_path = str(tmp_path / "bus.sock")
+    stop = start_broker(socket_path)
+    try:
+        q = BrokerClient(socket_path)
+        q.push_many("out", [f"pos-{i}" for i in range(3)], PRIORITY_BULK)
+        q.push("out", {"chat_id": 1, "content": "answer"}, PRIORITY_INTERACTIVE)
+
+        assert q.pop("out", decode=True) == {"chat_id": 1, "content": "answer"}
+        assert q.pop_many("out", max_n=10) == ["pos-0", "pos-1", "pos-2"]
+        assert q.pop("out") is None
+
+        q.subscribe("broadcast", "a")
+        q.subscribe("broadcast", "b")
+        q.publish_many("broadcast", ["[POS] 1", "[POS] 2"])
+        assert q.subscribe("broadcast", "a") == ["[POS] 1", "[POS] 2"]
+        assert q.subscribe("broadcast", "b") == ["[POS] 1", "[POS] 2"]
+        assert q.subscribe("broadcast", "a") == []
+        q.close()
+    finally:
+        stop()
+
+
+def test_broker_client_does_not_resend_applied_requests(tmp_path):
+    socket_path = str(tmp_path / "bus.sock")
+    broker = QueueBroker(socket_path)
+    append = broker._append
+
+    async def append_then_drop(*args):
+        # The push is applied, then the connection dies before the reply
+        await append(*args)
+        for writer in list(broker._clients):
+            writer.close()
+
+    broker._append = append_then_drop
+    stop = start_broker(socket_path, broker=broker)
+    try:
+        q = BrokerClient(socket_path)
+        with pytest.raises(ConnectionError):
+            q.push("inbox", "once")
+        assert q.pop_many("inbox", max_n=10) == ["once"]
+        q.close()
+    finally:
+        stop()
+
+
+def test_broker_blocking_pop_is_pushed(tmp_path):
+    socket_path = str(tmp_path / "bus.sock")
+    stop = start_broker(socket_path)
+    try:
+        consumer = BrokerClient(socket_path)
+        producer = BrokerClient(socket_path)
+
+        def push_later():
+            time.sleep(0.1)
+            producer.push("inbox", "hello")
+
+        threading.Thread(target=push_later).start()
+        start = time.monotonic()
+        assert consumer.pop("inbox", timeout=5) == "hello"
+        # Delivered on push, well before the timeout
+        assert time.monotonic() - start < 1
+    finally:
+        stop()
+
+
+def test_broker_write_through_survives_restart(tmp_path):
+    socket_path = str(tmp_path / "bus.sock")
+    db_path = str(tmp_path / "queue.db")
+
+    stop = start_broker(socket_path, MessageQueue(db_path))
+    q = BrokerClient(socket_path)
+    q.push_many("inbox", ["one", "two", "three"])
+    assert q.pop("inbox") == "one"
+    q.close()
+    stop()
+
+    stop = start_broker(socket_path, MessageQueue(db_path))
+    try:
+        q = BrokerClient(socket_path)
+        assert q.pop_many("inbox", max_n=10) == ["two", "three"]
+        q.close()
+    finally:
+        stop()
+
+
+@pytest.mark.asyncio
+async def test_async_broker_client(tmp_path):
+    socket_path = str(tmp_path / "bus.sock")
+    broker = QueueBroker(socket_path)
+    server = asyncio.create_task(broker.serve())
+    await asyncio.sleep(0.1)
+
+    aq = AsyncBrokerClient(socket_path)
+    producer = AsyncBrokerClient(socket_path)
+    try:
+        # A parked pop does not block other calls on the same connection
+        pending = asyncio.create_task(aq.pop("inbox", timeout=5, decode=True))
+        assert await aq.pop("other", timeout=0) is None
+        await producer.push("inbox", {"source": "web", "content": "hi"})
+        assert await pending == {"source": "web", "content": "hi"}
+
+        assert await aq.wait(["inbox"], timeout=0.05) is False
+        assert await aq.pop_many("inbox", timeout=0) == []
+    finally:
+        aq.close()
+        producer.close()
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+        await asyncio.sleep(0.05)  # let the closed connections finish
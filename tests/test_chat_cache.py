@@ -0,0 +1,38 @@
+from punisher.db.cache import ChatCache
+
+
+def message(n):
+    return {"role": "user", "content": str(n), "timestamp": n, "cursor": str(n)}
+
+
+def test_serves_newest_and_tracks_appends():
+    cache = ChatCache(sessions=2, messages=3)
+    assert cache.get("a", 2) is None
+
+    cache.put("a", [message(1), message(2)], complete=True)
+    assert [m["content"] for m in cache.get("a", 10)] == ["1", "2"]  # whole history
+
+    cache.append("a", message(3))
+    cache.append("a", message(4))  # evicts 1: no longer complete
+    assert [m["content"] for m in cache.get("a", 3)] == ["2", "3", "4"]
+    assert cache.get("a", 4) is None
+
+    cache.append("b", message(1))  # not cached: ignored
+    assert cache.get("b", 1) is None
+
+
+def test_lru_eviction_and_appends_during_load():
+    cache = ChatCache(sessions=2, messages=3)
+    cache.put("a", [message(1)], complete=True)
+    cache.put("b", [message(1)], complete=True)
+    cache.get("a", 1)
+    cache.put("c", [message(1)], complete=True)  # evicts b, least recently used
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+
+    # A message saved while the load ran is kept; one the load saw is not doubled
+    cache.begin_load("d")
+    cache.append("d", message(2))
+    cache.append("d", message(3))
+    cache.put("d", [message(1), message(2)], complete=True)
+    assert [m["content"] for m in cache.get("d", 3)] == ["1", "2", "3"]
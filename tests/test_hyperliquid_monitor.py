@@ -0,0 +1,313 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+import pytest
+
+from punisher.db.sqlite import SQLiteStorage
+
+from punisher.crypto import hyperliquid
+from punisher.crypto.hyperliquid import (
+    HyperliquidMonitor,
+    HyperliquidPoller,
+    TokenBucket,
+    WalletRegistry,
+    WalletScheduler,
+    shard_wallets,
+)
+
+
+class FakeQueue:
+    def publish_many(self, channel, messages, priority):
+        pass
+
+
+class FakeWebSocket:
+    """Replays `incoming`, then waits; records everything sent."""
+
+    def __init__(self, incoming):
+        self.incoming = asyncio.Queue()
+        for msg in incoming:
+            self.incoming.put_nowait(json.dumps(msg))
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(json.loads(msg))
+
+    async def recv(self):
+        return await self.incoming.get()
+
+    async def close(self):
+        pass
+
+
+def wallet(i):
+    return f"0x{i:040X}"
+
+
+def test_shard_wallets_is_bounded_and_stable():
+    wallets = [wallet(i) for i in range(100)]
+    shards, overflow = shard_wallets(wallets, 4, 30)
+    assert sorted(w for shard in shards for w in shard) == sorted(wallets)
+    assert overflow == []
+    assert all(len(shard) <= 30 for shard in shards)
+
+    # New wallets leave (almost) everyone on their connection
+    grown, _ = shard_wallets(wallets + [wallet(i) for i in range(100, 110)], 4, 30)
+    moved = sum(w not in grown[i] for i, shard in enumerate(shards) for w in shard)
+    assert moved <= 10
+
+    shards, overflow = shard_wallets(wallets, 2, 40)
+    assert [len(shard) for shard in shards] == [40, 40]
+    assert len(overflow) == 20
+
+
+@pytest.mark.asyncio
+async def test_multiplexed_connection_routes_by_user(monkeypatch):
+    monkeypatch.setattr(hyperliquid, "get_queue", FakeQueue)
+    monitor = HyperliquidMonitor(mode="multiplex")
+    monitor.running = True
+    monitor.shards = [set()]
+    monitor.reshard([wallet(1), wallet(2)])
+    received = []
+
+    async def process_wallet_data(address, raw_data):
+        received.append((address, raw_data["data"]["n"]))
+        if len(received) == 2:
+            monitor.running = False
+
+    monitor.process_wallet_data = process_wallet_data
+    ws = FakeWebSocket(
+        [
+            {"channel": "webData2", "data": {"user": wallet(2).lower(), "n": 1}},
+            {"channel": "webData2", "data": {"user": wallet(9).lower(), "n": 2}},
+            {"channel": "webData2", "data": {"user": wallet(1).lower(), "n": 3}},
+        ]
+    )
+    await asyncio.wait_for(monitor.listen_multiplexed(ws, 0), timeout=1)
+
+    assert received == [(wallet(2), 1), (wallet(1), 3)]
+    assert sorted(m["subscription"]["user"] for m in ws.sent) == [wallet(1), wallet(2)]
+
+    # A re-shard only sends the difference
+    ws.sent.clear()
+    subscribed = {wallet(1).lower(): wallet(1), wallet(2).lower(): wallet(2)}
+    await monitor.sync_subscriptions(ws, {wallet(2), wallet(3)}, subscribed)
+    assert ws.sent == [
+        {
+            "method": "unsubscribe",
+            "subscription": {"type": "webData2", "user": wallet(1)},
+        },
+        {
+            "method": "subscribe",
+            "subscription": {"type": "webData2", "user": wallet(3)},
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rotation_keeps_socket_and_replays_after_failure(monkeypatch):
+    monkeypatch.setattr(hyperliquid, "get_queue", FakeQueue)
+    monitor = HyperliquidMonitor([wallet(1), wallet(2)], mode="rotate")
+    sockets, listened = [], []
+
+    async def unchanged():
+        return False
+
+    async def connect():
+        sockets.append(FakeWebSocket([]))
+        return sockets[-1]
+
+    async def listen(ws, address, seconds):
+        listened.append((len(sockets), address))
+        if len(listened) == 2:
+            raise ConnectionError("dropped")
+        if len(listened) == 3:
+            monitor.running = False
+
+    async def no_delay():
+        pass
+
+    monitor.refresh_wallets = unchanged
+    monitor.connect_with_stealth = connect
+    monitor.listen = listen
+    monitor.human_delay = no_delay
+    monitor.reconnect_delay = lambda attempt: 0
+    await asyncio.wait_for(monitor.start(), timeout=1)
+
+    def sent(ws):
+        return [
+            (m["method"], m["subscription"]["type"], m["subscription"].get("user"))
+            for m in ws.sent
+        ]
+
+    assert listened == [(1, wallet(1)), (1, wallet(2)), (2, wallet(2))]
+    # Rotation re-subscribes on the same socket; allMids stays
+    assert sent(sockets[0]) == [
+        ("subscribe", "allMids", None),
+        ("subscribe", "webData2", wallet(1)),
+        ("unsubscribe", "webData2", wallet(1)),
+        ("subscribe", "webData2", wallet(2)),
+    ]
+    # The reconnect replays both subscriptions
+    assert sent(sockets[1]) == [
+        ("subscribe", "allMids", None),
+        ("subscribe", "webData2", wallet(2)),
+    ]
+
+
+def refreshed(value, notional=0.0):
+    return {"summary": {"account_value": value, "total_ntl_pos": notional}}
+
+
+def test_scheduler_serves_furthest_behind_sla_and_decays_idle_wallets():
+    scheduler = WalletScheduler({"hot": 60, "warm": 900, "cold": 3600})
+    whale, dormant, new = wallet(1), wallet(2), wallet(3)
+    scheduler.sync([whale, dormant], now=0)
+    assert {scheduler.next(now=0), scheduler.next(now=0)} == {whale, dormant}
+    assert scheduler.next(now=0) is None
+
+    scheduler.record(whale, refreshed(50e6, 80e6), changed=True, now=0)
+    scheduler.record(dormant, refreshed(2e3), changed=True, now=0)
+    assert scheduler.stats[whale].tier == "hot"
+    assert scheduler.stats[dormant].tier == "cold"
+    assert scheduler.wait(now=0) == 60
+
+    # A new wallet is due at once, but the whale is further behind its SLA
+    scheduler.sync([whale, dormant, new], now=10)
+    assert scheduler.next(now=70) == whale
+    assert scheduler.next(now=70) == new
+    assert scheduler.next(now=70) is None
+
+    metrics = scheduler.metrics(now=4000)
+    assert metrics["hot"]["wallets"] == 1
+    assert metrics["hot"]["max_behind"] == 4000 - 0 - 60
+    assert metrics["cold"]["never_refreshed"] == 1
+
+    # A mid-size wallet that stops changing decays to a lower tier
+    scheduler.record(new, refreshed(1e5, 2e5), changed=True, now=100)
+    for i in range(4):
+        scheduler.record(new, refreshed(1e5, 2e5), changed=True, now=200 + i)
+    assert scheduler.stats[new].tier == "hot"
+    for i in range(10):
+        scheduler.record(new, refreshed(1e5, 2e5), changed=False, now=300 + i)
+    assert scheduler.stats[new].tier == "warm"
+
+    scheduler.sync([whale], now=500)
+    assert set(scheduler.stats) == {whale}
+
+
+@pytest.mark.asyncio
+async def test_registry_refreshes_incrementally_in_stable_order(tmp_path):
+    storage = SQLiteStorage(tmp_path / "punisher.db")
+    reads = []
+
+    class Recording:
+        async def get_wallets_updated_since(self, since):
+            reads.append(since)
+            return await storage.get_wallets_updated_since(since)
+
+    registry = WalletRegistry(static=["0xstatic"])
+    await storage.upsert_discovered_wallets(
+        [{"address": "0x1"}, {"address": "0x2"}], "test"
+    )
+    assert await registry.refresh(Recording())
+    assert registry.wallets() == ["0xstatic", "0x1", "0x2"]
+    assert not await registry.refresh(Recording())
+
+    await storage.set_wallet_status("0x1", "ignored")
+    await storage.upsert_discovered_wallets([{"address": "0x3"}], "test")
+    assert await registry.refresh(Recording())
+    assert registry.wallets() == ["0xstatic", "0x2", "0x3"]
+    assert "0x1" not in registry and "0x3" in registry
+    # The first read is a full load; later ones only ask for recent writes
+    assert reads[0] is None
+    assert all(since is not None for since in reads[1:])
+
+    registry.FULL_RELOAD_INTERVAL = 0
+    await storage.set_wallet_status("0x1", "monitoring")
+    assert await registry.refresh(Recording())
+    assert registry.wallets() == ["0xstatic", "0x2", "0x3", "0x1"]
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_by_weight():
+    bucket = TokenBucket(rate=100, capacity=10)
+    started = time.monotonic()
+    await bucket.acquire(10)
+    assert time.monotonic() - started < 0.05
+    await asyncio.gather(bucket.acquire(10), bucket.acquire(10))
+    assert time.monotonic() - started >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_poller_feeds_snapshots_like_the_socket(monkeypatch):
+    monkeypatch.setattr(hyperliquid, "get_queue", FakeQueue)
+    monitor = HyperliquidMonitor()
+    in_flight, peak, requests = 0, 0, []
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        body = json.loads(request.content)
+        # openOrders answers after wallet 3's failed clearinghouseState
+        await asyncio.sleep(0.05 if body["type"] == "openOrders" else 0.01)
+        in_flight -= 1
+        requests.append((body["type"], body["user"]))
+        if body["user"] == wallet(3):
+            return httpx.Response(500)
+        if body["type"] == "openOrders":
+            return httpx.Response(200, json=[{"oid": 7, "coin": "BTC"}])
+        return httpx.Response(
+            200, json={"marginSummary": {"accountValue": "1000"}, "time": 1}
+        )
+
+    processed = {}
+
+    async def process_wallet_data(address, raw_data):
+        processed[address] = raw_data["data"]
+
+    monitor.process_wallet_data = process_wallet_data
+    poller = HyperliquidPoller(
+        monitor,
+        weight_per_minute=60000,
+        concurrency=2,
+        transport=httpx.MockTransport(handler),
+    )
+    assert await poller.poll([wallet(1), wallet(2), wallet(3)]) == 2
+    await poller.close()
+
+    assert sorted(requests) == sorted(
+        (kind, wallet(i))
+        for kind in ("clearinghouseState", "openOrders")
+        for i in (1, 2, 3)
+    )
+    assert peak <= 2
+    assert set(processed) == {wallet(1), wallet(2)}
+    parsed = hyperliquid.parse_hyperliquid_data(processed[wallet(1)])
+    assert parsed["summary"]["account_value"] == 1000.0
+    assert parsed["orders"][0]["order_id"] == 7
+
+
+def test_scheduler_serves_only_the_asked_tiers():
+    scheduler = WalletScheduler({"hot": 60, "warm": 900, "cold": 3600})
+    scheduler.sync([wallet(1)], now=0)
+    assert scheduler.next(now=0, tiers=["hot", "warm"]) is None
+    assert scheduler.wait(now=0, tiers=[]) is None
+    assert scheduler.next(now=0, tiers=["cold"]) == wallet(1)
+
+
+def test_scheduler_slas_override_the_defaults(monkeypatch):
+    monkeypatch.setattr(hyperliquid.settings, "HYPERLIQUID_TIER_SLAS", {"hot": 30})
+    scheduler = WalletScheduler()
+    assert scheduler.slas == {**WalletScheduler.DEFAULT_SLAS, "hot": 30}
+    scheduler.sync([wallet(1)], now=0)
+    assert scheduler.next(now=0) == wallet(1)
+    assert scheduler.metrics(now=0)["cold"]["wallets"] == 1
+
+    with pytest.raises(ValueError):
+        WalletScheduler({"lukewarm": 60})
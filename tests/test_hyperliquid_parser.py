@@ -0,0 +1,85 @@
+from punisher.bench.snapshot import legacy_state_hash, make_snapshot, run_suite
+from punisher.crypto.hyperliquid_parser import (
+    apply_wallet_diff,
+    diff_wallet_state,
+    is_fingerprint,
+    snapshot_fingerprint,
+    wallet_state,
+)
+
+
+def fingerprint(snap):
+    return snapshot_fingerprint(snap["summary"], snap["positions"], snap["orders"])
+
+
+def test_fingerprint_is_canonical():
+    snap = make_snapshot(5, 8)
+    digest = fingerprint(snap)
+    assert is_fingerprint(digest)
+
+    # Order of positions/orders and dict keys does not matter
+    shuffled = {
+        "summary": snap["summary"],
+        "positions": [dict(reversed(p.items())) for p in reversed(snap["positions"])],
+        "orders": list(reversed(snap["orders"])),
+    }
+    assert fingerprint(shuffled) == digest
+
+    # Float noise does not matter, ints and floats hash alike
+    noisy = make_snapshot(5, 8)
+    noisy["summary"]["account_value"] += 1e-9
+    noisy["positions"][0]["leverage"] = float(noisy["positions"][0]["leverage"])
+    assert fingerprint(noisy) == digest
+    assert snapshot_fingerprint(
+        {"account_value": 0.1 + 0.2, "total_ntl_pos": -0.0}, [], []
+    ) == snapshot_fingerprint({"account_value": 0.3, "total_ntl_pos": 0}, [], [])
+
+
+def test_fingerprint_detects_state_changes():
+    digest = fingerprint(make_snapshot(5, 8))
+
+    moved = make_snapshot(5, 8)
+    moved["positions"][2]["size"] *= 1.001
+    assert fingerprint(moved) != digest
+
+    cancelled = make_snapshot(5, 8)
+    cancelled["orders"].pop()
+    assert fingerprint(cancelled) != digest
+
+
+def test_legacy_hashes_are_not_fingerprints():
+    snap = make_snapshot(2, 2)
+    assert not is_fingerprint(
+        legacy_state_hash(snap["summary"], snap["positions"], snap["orders"])
+    )
+    assert not is_fingerprint(None)
+
+
+def test_hash_bench_quick():
+    report = run_suite(quick=True)
+    for r in report["results"]:
+        assert r["fingerprint_bytes"] == 32
+        assert r["fingerprint_us"] > 0
+
+
+def test_wallet_diff_round_trips():
+    prev = wallet_state(make_snapshot(5, 8, seed=1))
+    curr = wallet_state(make_snapshot(5, 8, seed=1))
+    assert diff_wallet_state(prev, curr) == {}
+
+    curr["summary"]["account_value"] += 1
+    curr["positions"][0]["size"] *= 2
+    del curr["positions"][1]
+    curr["orders"] = curr["orders"][2:] + [dict(curr["orders"][0], order_id=1)]
+    diff = diff_wallet_state(prev, curr)
+    assert set(diff["summary"]) == {"account_value"}
+    assert diff["positions"] == {
+        "set": [curr["positions"][0]],
+        "del": [prev["positions"][1]["coin"]],
+    }
+    assert len(diff["orders"]["set"]) == 1
+    assert len(diff["orders"]["del"]) == 2
+
+    rebuilt = apply_wallet_diff(prev, diff)
+    assert rebuilt["summary"] == curr["summary"]
+    assert fingerprint(rebuilt) == fingerprint(curr)
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+from punisher.db.bars import bar_start, pick_resolution
+
+
+def test_bar_start_aligns_to_resolution():
+    ts = datetime(2024, 3, 1, 13, 47, 29, 500)
+    assert bar_start(ts, "1m") == datetime(2024, 3, 1, 13, 47)
+    assert bar_start(ts, "1h") == datetime(2024, 3, 1, 13)
+    assert bar_start(datetime(2024, 3, 1, 13), "1h") == datetime(2024, 3, 1, 13)
+
+
+def test_pick_resolution_fits_point_budget():
+    end = datetime(2024, 3, 1)
+    assert pick_resolution(end - timedelta(hours=6), end) == "1m"
+    assert pick_resolution(end - timedelta(days=1), end) == "1h"
+    assert pick_resolution(end - timedelta(days=1), end, max_points=1440) == "1m"
+    # Longer than max_points hourly bars still reads hourly bars
+    assert pick_resolution(end - timedelta(days=365), end) == "1h"
@@ -0,0 +1,99 @@
+import logging
+
+import pytest
+
+from punisher.db.mongo import (
+    INDEXES,
+    QUERY_PATHS,
+    TIMESERIES,
+    MongoStorage,
+    has_collscan,
+)
+
+
+class RecordingCollection:
+    def __init__(self, name, created):
+        self.name = name
+        self.created = created
+
+    async def create_index(self, keys, **options):
+        self.created.append((self.name, keys, options))
+
+
+class RecordingDB:
+    """Creates indexes into a list; explains report a COLLSCAN on chat_sessions."""
+
+    def __init__(self, existing=None):
+        self.created = []
+        self.collections = []
+        self.existing = existing or {}
+
+    async def list_collections(self):
+        for name, kind in self.existing.items():
+            yield {"name": name, "type": kind}
+
+    async def create_collection(self, name, **options):
+        self.collections.append((name, options))
+
+    def __getitem__(self, name):
+        return RecordingCollection(name, self.created)
+
+    async def command(self, command):
+        if "collMod" in command:
+            self.collections.append((command["collMod"], command))
+            return {}
+        find = command["explain"]
+        if find["find"] == "chat_sessions":
+            plan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+        else:
+            plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        return {"queryPlanner": {"winningPlan": plan}}
+
+
+def test_has_collscan_walks_nested_plans():
+    assert not has_collscan({"stage": "LIMIT", "inputStage": {"stage": "IXSCAN"}})
+    assert has_collscan(
+        {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}
+    )
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_and_reports_scans(caplog):
+    storage = MongoStorage()
+    storage._db = RecordingDB()
+
+    with caplog.at_level(logging.WARNING, logger="punisher.db.mongo"):
+        await storage.ensure_indexes()
+
+    assert len(storage._db.created) == len(INDEXES)
+    assert (
+        "tracked_wallets",
+        [("address", 1)],
+        {"unique": True},
+    ) in storage._db.created
+
+    scans = [r.message for r in caplog.records if "Collection scan" in r.message]
+    assert len(scans) == sum(1 for c, _, _ in QUERY_PATHS if c == "chat_sessions")
+    assert "chat_sessions" in scans[0]
+
+
+@pytest.mark.asyncio
+async def test_market_data_goes_to_timeseries_with_ttl(caplog):
+    storage = MongoStorage()
+    # A pre-existing regular market_prices is kept and expired by TTL index
+    storage._db = RecordingDB(
+        existing={"market_prices": "collection", "whale_trades": "timeseries"}
+    )
+
+    with caplog.at_level(logging.WARNING, logger="punisher.db.mongo"):
+        await storage._ensure_timeseries()
+
+    options, ttl = TIMESERIES["market_sentiment"]
+    assert storage._db.collections == [
+        ("whale_trades", {"collMod": "whale_trades", "expireAfterSeconds": 30 * 86400}),
+        ("market_sentiment", {"timeseries": options, "expireAfterSeconds": ttl}),
+    ]
+    assert storage._db.created == [
+        ("market_prices", "ts", {"expireAfterSeconds": TIMESERIES["market_prices"][1]})
+    ]
+    assert any("regular collection" in r.message for r in caplog.records)
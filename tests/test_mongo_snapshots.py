@@ -0,0 +1,305 @@
+import gzip
+import itertools
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from punisher.db.history import next_history_entry
+from punisher.db.mongo import MongoStorage
+from punisher.db.retention import retention_for
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda d: d[field], reverse=order < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        self._it = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+OPERATORS = {
+    "$in": lambda value, arg: value in arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+}
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif isinstance(cond, dict):
+            if not all(OPERATORS[op](doc.get(key), arg) for op, arg in cond.items()):
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    """Just enough of a motor collection, counting round trips."""
+
+    def __init__(self):
+        self.docs = []
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    def find(self, query, projection=None):
+        self.calls += 1
+        return FakeCursor([dict(d) for d in self.docs if matches(d, query)])
+
+    async def insert_one(self, doc):
+        self.calls += 1
+        doc = dict(doc, _id=next(self._ids))
+        self.docs.append(doc)
+        return InsertResult(doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        for doc in docs:
+            doc.setdefault("_id", next(self._ids))
+            self.docs.append(dict(doc))
+
+    async def bulk_write(self, ops, ordered=True):
+        self.calls += 1
+        for op in ops:
+            for doc in self.docs:
+                if matches(doc, op._filter):
+                    doc.update(op._doc["$set"])
+
+    async def delete_many(self, query):
+        self.calls += 1
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+
+class FakeDB:
+    def __init__(self):
+        self.hyperliquid_snapshots = FakeCollection()
+        self.wallet_history = FakeCollection()
+        self.chat_sessions = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def snapshot(account_value, ts):
+    return {
+        "summary": {"account_value": account_value, "total_ntl_pos": 0.0},
+        "positions": [{"coin": "BTC", "szi": 1.0}],
+        "orders": [],
+        "ts": ts,
+    }
+
+
+@pytest.mark.asyncio
+async def test_unchanged_snapshots_skip_round_trips():
+    storage = MongoStorage()
+    storage._db = FakeDB()
+    snapshots = storage._db.hyperliquid_snapshots
+
+    first_id = await storage.save_wallet_snapshot("0xabc", snapshot(100.0, 1))
+    calls = snapshots.calls  # cold cache: one find + one insert
+    assert calls == 2
+
+    for ts in range(2, 50):
+        result = await storage.save_wallet_snapshot("0xabc", snapshot(100.0, ts))
+        assert result == "updated_timestamp"
+    assert snapshots.calls == calls  # served from cache, touches buffered
+
+    assert await storage.flush_snapshot_touches() == 1  # coalesced
+    assert snapshots.docs[0]["_id"] == first_id
+    assert snapshots.docs[0]["snapshot_time_ms"] == 49
+
+    storage._maintenance_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_pruning_runs_in_background_pass():
+    storage = MongoStorage()
+    storage._db = FakeDB()
+    snapshots = storage._db.hyperliquid_snapshots
+
+    for i in range(storage.SNAPSHOT_KEEP + 5):
+        await storage.save_wallet_snapshot("0xabc", snapshot(float(i), i))
+    assert len(snapshots.docs) == storage.SNAPSHOT_KEEP + 5
+
+    assert await storage.prune_snapshots() == 5
+    kept = sorted(d["account_value"] for d in snapshots.docs)
+    assert kept == [float(i) for i in range(5, storage.SNAPSHOT_KEEP + 5)]
+
+    storage._maintenance_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_legacy_state_hash_still_matches():
+    from punisher.bench.snapshot import legacy_state_hash
+
+    storage = MongoStorage()
+    storage._db = FakeDB()
+    snapshots = storage._db.hyperliquid_snapshots
+
+    snap = snapshot(100.0, 1)
+    legacy = legacy_state_hash(snap["summary"], snap["positions"], snap["orders"])
+    await snapshots.insert_one(
+        {
+            "wallet_address": "0xabc",
+            "account_value": 100.0,
+            "total_ntl_pos": 0.0,
+            "positions": snap["positions"],
+            "open_orders": [],
+            "state_hash": legacy,
+            "updated_at": datetime.utcnow(),
+        }
+    )
+
+    # A legacy latest document still matches an unchanged state
+    assert await storage.save_wallet_snapshot("0xabc", snap) == "updated_timestamp"
+    assert len(snapshots.docs) == 1
+    storage._maintenance_task.cancel()
+
+
+def test_keyframe_cadence():
+    from punisher.config import settings
+
+    history = {}
+    kinds = [
+        next_history_entry(history, "0xabc", snapshot(100.0 + i, i))["kind"]
+        for i in range(2 * settings.SNAPSHOT_KEYFRAME_EVERY + 1)
+    ]
+    keyframes = [i for i, kind in enumerate(kinds) if kind == "key"]
+    every = settings.SNAPSHOT_KEYFRAME_EVERY
+    assert keyframes == [0, every, 2 * every]
+
+
+@pytest.mark.asyncio
+async def test_wallet_history_time_travel(monkeypatch):
+    from punisher.config import settings
+
+    monkeypatch.setattr(settings, "SNAPSHOT_KEYFRAME_EVERY", 3)
+    storage = MongoStorage()
+    storage._db = FakeDB()
+    history = storage._db.wallet_history
+
+    base = datetime(2024, 1, 1)
+    times = []
+    for i in range(7):
+        times.append(base + timedelta(minutes=i))
+        snap = snapshot(100.0 + i, i)
+        if i >= 4:
+            snap["positions"] = []  # position closed
+        await storage._record_history("0xabc", snap, times[-1])
+    await storage.writes.flush()
+
+    assert [d["kind"] for d in history.docs] == ["key", "delta", "delta"] * 2 + ["key"]
+    assert history.docs[4]["diff"] == {
+        "summary": {"account_value": 104.0},
+        "positions": {"del": ["BTC"]},
+    }
+
+    state = await storage.get_wallet_state_at("0xabc", times[5])
+    assert state["summary"]["account_value"] == 105.0
+    assert state["positions"] == []
+    state = await storage.get_wallet_state_at("0xabc", times[2])
+    assert state["positions"] == [{"coin": "BTC", "szi": 1.0}]
+    assert await storage.get_wallet_state_at("0xabc", base - timedelta(1)) is None
+
+    changes = [c async for c in storage.get_wallet_changes("0xabc", times[3])]
+    assert [c["diff"]["summary"]["account_value"] for c in changes] == [
+        104.0,
+        105.0,
+        106.0,
+    ]
+    await storage.writes.close()
+
+
+@pytest.mark.asyncio
+async def test_retention_expires_in_archived_batches(tmp_path, monkeypatch):
+    from punisher.config import settings
+
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", tmp_path)
+    storage = MongoStorage()
+    storage.RETENTION_BATCH = 2
+    storage.RETENTION_PAUSE = 0
+    db = FakeDB()
+    db.chat_sessions = chat = FakeCollection()
+    base = datetime(2024, 1, 1)
+    for i in range(6):
+        await chat.insert_one(
+            {"session_id": "s", "content": f"m{i}", "timestamp": base + timedelta(i)}
+        )
+    chat.calls = 0
+
+    cutoff = base + timedelta(days=4, hours=12)
+    rule = retention_for("chat_sessions")
+    assert await storage._expire(db, rule, cutoff) == 5
+
+    assert [d["content"] for d in chat.docs] == ["m5"]
+    # find + delete per batch, oldest first, the last batch short
+    assert chat.calls == 6
+    (archive,) = tmp_path.iterdir()
+    with gzip.open(archive, "rt") as f:
+        assert [json.loads(line)["content"] for line in f] == [
+            "m0",
+            "m1",
+            "m2",
+            "m3",
+            "m4",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_chat_paging_keeps_messages_sharing_a_millisecond():
+    storage = MongoStorage()
+    storage._db = FakeDB()
+    now = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    storage._db.chat_sessions.docs = [
+        {
+            "_id": ObjectId(),
+            "session_id": "s1",
+            "role": "user",
+            "content": str(n),
+            "timestamp": now if n else now - timedelta(seconds=1),
+        }
+        for n in range(5)
+    ]
+
+    page = await storage.get_chat_page("s1", limit=2)
+    assert [m["content"] for m in page["messages"]] == ["3", "4"]
+    page = await storage.get_chat_page("s1", limit=2, before=page["next_cursor"])
+    assert [m["content"] for m in page["messages"]] == ["1", "2"]
+    page = await storage.get_chat_page("s1", limit=2, before=page["next_cursor"])
+    assert [m["content"] for m in page["messages"]] == ["0"]
+    assert page["next_cursor"] is None
@@ -0,0 +1,101 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+from punisher.db.mongo import MongoStorage
+
+
+class AsyncDocs:
+    def __init__(self, docs):
+        self._it = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class UpsertResult:
+    def __init__(self, upserted_count):
+        self.upserted_count = upserted_count
+
+
+class WalletCollection:
+    def __init__(self, addresses):
+        self.addresses = set(addresses)
+        self.finds = 0
+        self.bulk_writes = []
+        # address -> error code its next upsert fails with
+        self.failures = {}
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return AsyncDocs([{"address": a} for a in self.addresses])
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_writes.append((len(ops), ordered))
+        errors = [
+            {"index": i, "code": self.failures.pop(op._filter["address"])}
+            for i, op in enumerate(ops)
+            if op._filter["address"] in self.failures
+        ]
+        failed = {ops[e["index"]]._filter["address"] for e in errors}
+        new = {op._filter["address"] for op in ops} - self.addresses - failed
+        self.addresses |= new
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nUpserted": len(new)})
+        return UpsertResult(len(new))
+
+
+class WalletDB:
+    def __init__(self, addresses=()):
+        self.tracked_wallets = WalletCollection(addresses)
+
+
+def page(*addresses):
+    return [{"address": a, "pnl": "+$1M", "win_rate": "70%"} for a in addresses]
+
+
+@pytest.mark.asyncio
+async def test_page_is_one_unordered_bulk_write():
+    storage = MongoStorage()
+    storage._db = WalletDB(addresses=["0xa"])
+    wallets = storage._db.tracked_wallets
+
+    new = await storage.upsert_discovered_wallets(
+        page("0xa", "0xb", "0xc", "0xc"), "test", 1
+    )
+    assert new == 2
+    assert wallets.finds == 1  # known set warmed once
+    assert wallets.bulk_writes == [(2, False)]  # known and repeated rows dropped
+
+
+@pytest.mark.asyncio
+async def test_known_only_page_skips_the_database():
+    storage = MongoStorage()
+    storage._db = WalletDB()
+    wallets = storage._db.tracked_wallets
+
+    assert await storage.upsert_discovered_wallets(page("0xa", "0xb"), "test") == 2
+    assert await storage.upsert_discovered_wallets(page("0xb", "0xa"), "test") == 0
+    assert wallets.finds == 1
+    assert len(wallets.bulk_writes) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_upserts_are_retried():
+    storage = MongoStorage()
+    storage._db = WalletDB()
+    wallets = storage._db.tracked_wallets
+    # 0xb: a concurrent writer won the race; 0xc: a real failure
+    wallets.failures = {"0xb": 11000, "0xc": 121}
+
+    assert await storage.upsert_discovered_wallets(page("0xa", "0xb", "0xc"), "t") == 1
+    assert storage._known_wallets == {"0xa", "0xb"}
+
+    assert await storage.upsert_discovered_wallets(page("0xa", "0xb", "0xc"), "t") == 1
+    assert wallets.bulk_writes[-1] == (1, False)  # only 0xc is written again
+    assert "0xc" in wallets.addresses
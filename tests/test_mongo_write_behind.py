@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from punisher.db.mongo import MongoStorage, WriteBehind
+
+
+class BatchCollection:
+    def __init__(self, name, ids, delay=0.0, fail_at=None):
+        self.name = name
+        self.batches = []
+        self._ids = ids
+        self.delay = delay
+        self.fail_at = fail_at
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(self.delay)
+        self.batches.append([d["n"] for d in docs])
+        for i, doc in enumerate(docs):
+            if i == self.fail_at:
+                raise BulkWriteError({"nInserted": i, "writeErrors": []})
+            doc["_id"] = next(self._ids)
+
+
+class BatchDB:
+    def __init__(self, **options):
+        self.ids = itertools.count(1)
+        self.collections = {}
+        self.options = options
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = BatchCollection(name, self.ids, **self.options)
+        return self.collections[name]
+
+
+def make_buffer(db, **limits):
+    async def get_db():
+        return db
+
+    buffer = WriteBehind(get_db)
+    for key, value in limits.items():
+        setattr(buffer, key, value)
+    return buffer
+
+
+@pytest.mark.asyncio
+async def test_inserts_are_batched_per_collection_in_order():
+    db = BatchDB()
+    buffer = make_buffer(db, FLUSH_INTERVAL=60)
+
+    handles = [await buffer.insert("chat", {"n": n}) for n in range(5)]
+    await buffer.insert("tasks", {"n": 0})
+    assert db.collections == {}  # nothing written inline
+
+    assert await buffer.flush() == 6
+    assert db["chat"].batches == [[0, 1, 2, 3, 4]]
+    assert db["tasks"].batches == [[0]]
+    assert [await h for h in handles] == [1, 2, 3, 4, 5]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_flushes_by_size_and_interval():
+    db = BatchDB()
+    buffer = make_buffer(db, FLUSH_SIZE=3, FLUSH_INTERVAL=0.05)
+
+    for n in range(3):
+        await buffer.insert("chat", {"n": n})
+    await asyncio.sleep(0.01)  # size trigger wakes the flusher
+    assert db["chat"].batches == [[0, 1, 2]]
+
+    handle = await buffer.insert("chat", {"n": 3})
+    await asyncio.wait_for(handle, 1)  # written by the interval flush
+    assert db["chat"].batches[-1] == [3]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_and_failures_reach_handles():
+    db = BatchDB(fail_at=1)
+    buffer = make_buffer(db, FLUSH_INTERVAL=60)
+
+    first = await buffer.insert("chat", {"n": 0})
+    second = await buffer.insert("chat", {"n": 1})
+    await buffer.close()
+
+    assert await first == 1
+    with pytest.raises(BulkWriteError):
+        await second
+    assert buffer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_applies_backpressure():
+    db = BatchDB(delay=0.05)
+    buffer = make_buffer(db, FLUSH_SIZE=1000, FLUSH_INTERVAL=60, MAX_PENDING=4)
+
+    for n in range(4):
+        await buffer.insert("chat", {"n": n})
+    # The fifth insert waits for a flush to make room
+    await asyncio.wait_for(buffer.insert("chat", {"n": 4}), 1)
+    assert db["chat"].batches == [[0, 1, 2, 3]]
+    assert buffer.pending == 1
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_during_a_flush_loses_nothing():
+    db = BatchDB(delay=0.1)
+    buffer = make_buffer(db, FLUSH_INTERVAL=0.01)
+
+    handles = [await buffer.insert("chat", {"n": n}) for n in range(3)]
+    await asyncio.sleep(0.05)  # the flusher is inside insert_many
+    await buffer.close()
+
+    assert db["chat"].batches == [[0, 1, 2]]
+    assert [await h for h in handles] == [1, 2, 3]
+    assert buffer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_maintenance_leaves_in_flight_flushes_alone():
+    db = BatchDB(delay=0.1)
+    storage = MongoStorage()
+    storage._db = db
+    storage.TOUCH_FLUSH_INTERVAL = 0.001
+    storage.writes.FLUSH_INTERVAL = 0.01
+
+    handles = [await storage.writes.insert("chat", {"n": n}) for n in range(3)]
+    await asyncio.sleep(0.05)  # the flusher is inside insert_many
+    maintenance = asyncio.create_task(storage._snapshot_maintenance())
+    ids = await asyncio.wait_for(asyncio.gather(*handles), 1)
+    maintenance.cancel()
+
+    assert ids == [1, 2, 3]
+    assert [n for batch in db["chat"].batches for n in batch] == [0, 1, 2]
+    assert storage.writes.pending == 0
+    await storage.writes.close()
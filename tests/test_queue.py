@@ -1,5 +1,8 @@
 import pytest
+import json
 import os
+import sqlite3
+import time
 from punisher.bus.queue import MessageQueue
 
 
@@ -26,3 +29,311 @@ def test_queue_json(tmp_path):
     # Pop returns string, need to parse if we want dict
     msg = q.pop("json_channel", timeout=1)
     assert '"foo": "bar"' in msg
+
+
+def test_queue_fifo_across_instances(tmp_path):
+    db_path = str(tmp_path / "test_queue_fifo.db")
+    producer = MessageQueue(db_path)
+    consumer = MessageQueue(db_path)
+
+    for i in range(5):
+        producer.push("fifo", f"msg-{i}")
+
+    assert [consumer.pop("fifo") for _ in range(5)] == [f"msg-{i}" for i in range(5)]
+    assert consumer.pop("fifo") is None
+
+
+def test_queue_concurrent_consumers_no_duplicates(tmp_path):
+    import threading
+
+    q = MessageQueue(str(tmp_path / "test_queue_threads.db"))
+    for i in range(200):
+        q.push("work", str(i))
+
+    seen = []
+    lock = threading.Lock()
+
+    def consume():
+        while (msg := q.pop("work")) is not None:
+            with lock:
+                seen.append(msg)
+
+    threads = [threading.Thread(target=consume) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(seen, key=int) == [str(i) for i in range(200)]
+
+
+def test_queue_push_many_pop_many(tmp_path):
+    q = MessageQueue(str(tmp_path / "test_queue_batch.db"))
+
+    q.push_many("batch", [f"pos-{i}" for i in range(30)] + [{"kind": "wallet"}])
+
+    first = q.pop_many("batch", max_n=20)
+    rest = q.pop_many("batch", max_n=20, timeout=1)
+    assert first == [f"pos-{i}" for i in range(20)]
+    assert rest[:10] == [f"pos-{i}" for i in range(20, 30)]
+    assert '"kind": "wallet"' in rest[10]
+    assert q.pop_many("batch", max_n=20) == []
+
+
+def test_queue_push_many_is_atomic(tmp_path):
+    import sqlite3
+
+    q = MessageQueue(str(tmp_path / "test_queue_atomic.db"))
+
+    # NULL payload violates NOT NULL: the whole batch must roll back
+    with pytest.raises(sqlite3.IntegrityError):
+        q.push_many("atomic", ["ok-1", None, "ok-2"])
+
+    assert q.pop("atomic") is None
+
+
+def test_topic_fan_out_to_every_consumer(tmp_path):
+    db_path = str(tmp_path / "test_topic.db")
+    q = MessageQueue(db_path)
+
+    # Register both consumers before anything is published
+    assert q.subscribe("broadcast", "dashboard") == []
+    assert q.subscribe("broadcast", "tui") == []
+
+    q.publish_many("broadcast", ["[WALLET] a", "[POS] b"])
+    q.publish("broadcast", {"kind": "intel"})
+
+    dash = q.subscribe("broadcast", "dashboard")
+    tui = q.subscribe("broadcast", "tui", timeout=1)
+    assert dash == tui
+    assert dash[:2] == ["[WALLET] a", "[POS] b"]
+    assert q.subscribe("broadcast", "dashboard") == []
+
+    # Topics never feed the destructive queue
+    assert q.pop("broadcast") is None
+
+
+def test_topic_cursor_survives_restart(tmp_path):
+    db_path = str(tmp_path / "test_topic_cursor.db")
+    q = MessageQueue(db_path)
+    q.subscribe("broadcast", "listen")
+    q.publish_many("broadcast", ["one", "two", "three"])
+    assert q.subscribe("broadcast", "listen", max_n=1) == ["one"]
+
+    restarted = MessageQueue(db_path)
+    assert restarted.subscribe("broadcast", "listen") == ["two", "three"]
+    # A brand-new consumer starts at the tail unless asked otherwise
+    assert restarted.subscribe("broadcast", "late") == []
+    assert restarted.subscribe("broadcast", "replay", start="earliest") == [
+        "one",
+        "two",
+        "three",
+    ]
+
+
+def test_topic_retention(tmp_path):
+    from punisher.bus.queue import RetentionPolicy
+
+    q = MessageQueue(
+        str(tmp_path / "test_topic_retention.db"),
+        retention={"capped": RetentionPolicy(max_count=3, max_age=None)},
+    )
+    q.publish_many("capped", [str(i) for i in range(10)])
+
+    assert q.trim_topic("capped") == 7
+    assert q.subscribe("capped", "reader", start="earliest") == ["7", "8", "9"]
+
+
+def test_queue_ttl_and_depth_compaction(tmp_path):
+    import sqlite3
+    from punisher.bus.queue import RetentionPolicy
+
+    db_path = str(tmp_path / "test_queue_compact.db")
+    q = MessageQueue(
+        db_path,
+        retention={
+            "telemetry": RetentionPolicy(max_count=5, max_age=None),
+            "replies": RetentionPolicy(max_count=None, max_age=60),
+        },
+    )
+    q.push_many("telemetry", [str(i) for i in range(20)])
+    q.push_many("replies", ["stale", "fresh"])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "UPDATE queue SET created_at = datetime('now', '-1 hour') WHERE payload = 'stale'"
+        )
+
+    stats = q.compact(batch_size=4)
+
+    assert stats["queue_removed"] == 16
+    assert q.pop_many("telemetry") == [str(i) for i in range(15, 20)]
+    assert q.pop_many("replies") == ["fresh"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_compaction_keeps_unconsumed_work(tmp_path):
+    import sqlite3
+
+    db_path = str(tmp_path / "test_queue_keep.db")
+    q = MessageQueue(db_path)
+    q.push("punisher:inbox", "old command")
+    q.publish_many("punisher:cli:out", ["stale", "fresh"])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE queue SET created_at = datetime('now', '-2 days')")
+        conn.execute(
+            "UPDATE topic_log SET created_at = created_at - 2 * 86400"
+            " WHERE payload = 'stale'"
+        )
+
+    stats = q.compact()
+
+    # Work queues have no default limit; the telemetry topic is bounded
+    assert stats == {"queue_removed": 0, "topic_removed": 1}
+    assert q.pop("punisher:inbox") == "old command"
+    assert q.subscribe("punisher:cli:out", "reader", start="earliest") == ["fresh"]
+
+
+def test_queue_priority_with_fair_share(tmp_path):
+    from punisher.bus.queue import PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+    q = MessageQueue(str(tmp_path / "test_queue_priority.db"), fair_share=4)
+    q.push_many("out", [f"pos-{i}" for i in range(10)], PRIORITY_BULK)
+    q.push("out", "answer", PRIORITY_INTERACTIVE)
+
+    # Interactive traffic jumps the telemetry backlog...
+    assert q.pop("out") == "answer"
+    # ...but every 4th dequeue still serves the oldest message
+    popped = [q.pop("out") for _ in range(4)]
+    assert popped == ["pos-0", "pos-1", "pos-2", "pos-3"]
+
+    q.push_many("out", [f"chat-{i}" for i in range(8)], PRIORITY_INTERACTIVE)
+    batch = q.pop_many("out", max_n=8)
+    # 2 of 8 slots are reserved for the oldest rows; interactive rows come first
+    assert batch == [f"chat-{i}" for i in range(6)] + ["pos-4", "pos-5"]
+
+
+def test_topic_priority_lanes(tmp_path):
+    from punisher.bus.queue import PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+    q = MessageQueue(str(tmp_path / "test_topic_lanes.db"), fair_share=5)
+    q.subscribe("broadcast", "sse")
+    q.publish_many("broadcast", [f"[POS] {i}" for i in range(50)], PRIORITY_BULK)
+    q.publish("broadcast", "answer", PRIORITY_INTERACTIVE)
+
+    first = q.subscribe("broadcast", "sse", max_n=10)
+    assert first[0] == "answer"
+    assert first[1:] == [f"[POS] {i}" for i in range(9)]
+
+    rest = []
+    while batch := q.subscribe("broadcast", "sse", max_n=10):
+        rest.extend(batch)
+    assert rest == [f"[POS] {i}" for i in range(9, 50)]
+
+
+def test_topic_cursor_migration(tmp_path):
+    import sqlite3
+    import time
+
+    db_path = str(tmp_path / "test_topic_migrate.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE topic_log (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "topic TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE topic_cursors (topic TEXT NOT NULL, consumer TEXT NOT NULL, "
+            "last_id INTEGER NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (topic, consumer))"
+        )
+        conn.executemany(
+            "INSERT INTO topic_log (topic, payload, created_at) VALUES (?, ?, ?)",
+            [("broadcast", m, time.time()) for m in ("seen", "unseen")],
+        )
+        conn.execute(
+            "INSERT INTO topic_cursors VALUES ('broadcast', 'tui', 1, ?)",
+            (time.time(),),
+        )
+
+    q = MessageQueue(db_path)
+    assert q.subscribe("broadcast", "tui") == ["unseen"]
+
+
+def test_codec_roundtrip_and_decode(tmp_path):
+    from punisher.bus.codec import Codec
+
+    q = MessageQueue(
+        str(tmp_path / "test_codec.db"), codec=Codec(compress_threshold=256)
+    )
+    big = {"content": "wallet summary " * 500, "session_id": "s1"}
+    q.push("inbox", {"source": "web", "content": "hi"})
+    q.push("inbox", big)
+    q.push("inbox", "plain text")
+
+    assert q.pop("inbox", decode=True) == {"source": "web", "content": "hi"}
+    assert json.loads(q.pop("inbox")) == big  # text API still returns JSON
+    assert q.pop("inbox", decode=True) == "plain text"
+
+    q.subscribe("broadcast", "tui")
+    q.publish("broadcast", "[POS] " + "x" * 1000)
+    q.publish("broadcast", big)
+    assert q.subscribe("broadcast", "tui", decode=True) == ["[POS] " + "x" * 1000, big]
+
+    # Large payloads are stored compressed
+    size = (
+        q._conn("broadcast").execute("SELECT length(payload) FROM topic_log").fetchall()
+    )
+    assert all(n < 500 for (n,) in size)
+
+
+def test_codec_reads_legacy_rows(tmp_path):
+    db_path = str(tmp_path / "test_codec_legacy.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE queue (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "channel TEXT NOT NULL, payload TEXT NOT NULL, status TEXT DEFAULT 'new', "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        conn.execute(
+            "INSERT INTO queue (channel, payload) VALUES ('inbox', ?)",
+            (json.dumps({"source": "cli", "content": "old"}),),
+        )
+        conn.executemany(
+            "INSERT INTO queue (channel, payload) VALUES ('inbox', ?)",
+            [(json.dumps({"source": "cli", "content": "older"}),), ("plain text",)],
+        )
+
+    q = MessageQueue(db_path)
+    q.push("inbox", {"source": "cli", "content": "new"})
+    assert json.loads(q.pop("inbox")) == {"source": "cli", "content": "old"}
+    # decode=True gives legacy dicts back as dicts too
+    assert q.pop("inbox", decode=True) == {"source": "cli", "content": "older"}
+    assert q.pop("inbox", decode=True) == "plain text"
+    assert q.pop("inbox", decode=True) == {"source": "cli", "content": "new"}
+
+
+def test_sharded_channels_have_independent_write_locks(tmp_path):
+    from punisher.bus.sharding import ShardRouter
+
+    db_path = str(tmp_path / "queue.db")
+    router = ShardRouter(db_path, shards=2, mapping={"punisher:inbox": "inbox"})
+    q = MessageQueue(db_path, router=router)
+    assert router.path_for("punisher:inbox") == str(tmp_path / "queue.inbox.db")
+    assert len(q.paths) == 3
+
+    # A telemetry writer holding its shard's lock does not block the inbox
+    telemetry = q._conn("punisher:cli:out")
+    telemetry.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.time()
+        q.push("punisher:inbox", {"source": "web", "content": "status"})
+        assert time.time() - start < 1
+    finally:
+        telemetry.execute("ROLLBACK")
+
+    # Same API on top: topics and queues route to their shard transparently
+    q.subscribe("punisher:cli:out", "tui")
+    q.publish("punisher:cli:out", "[POS] BTC")
+    assert q.subscribe("punisher:cli:out", "tui") == ["[POS] BTC"]
+    assert q.pop("punisher:inbox", decode=True)["content"] == "status"
+    assert q.compact() == {"queue_removed": 0, "topic_removed": 0}
@@ -0,0 +1,47 @@
+from punisher.bench.queue import Scenario, run_empty_poll, run_scenario
+
+
+def test_bench_thread_scenario_delivers_everything(tmp_path):
+    result = run_scenario(
+        Scenario("smoke", producers=2, consumers=2, channels=2, messages=100),
+        str(tmp_path / "bench.db"),
+    )
+
+    assert result["delivered"] == 100
+    assert result["msgs_per_s"] > 0
+    assert result["p50_ms"] <= result["p99_ms"]
+    assert result["db_growth_bytes"] >= 0
+
+
+def test_bench_process_scenario_delivers_everything(tmp_path):
+    result = run_scenario(
+        Scenario(
+            "smoke-proc",
+            producers=2,
+            consumers=2,
+            mode="process",
+            messages=40,
+            batch=10,
+        ),
+        str(tmp_path / "bench_proc.db"),
+    )
+
+    assert result["delivered"] == 40
+
+
+def test_bench_empty_poll(tmp_path):
+    result = run_empty_poll(str(tmp_path / "bench_empty.db"), polls=100)
+    assert result["polls_per_s"] > 0
+
+
+def test_bench_connect_per_call_baseline(tmp_path):
+    result = run_scenario(
+        Scenario("baseline", messages=50, backend="connect-per-call"),
+        str(tmp_path / "bench_baseline.db"),
+    )
+    assert result["delivered"] == 50
+
+    result = run_empty_poll(
+        str(tmp_path / "bench_baseline_empty.db"), polls=20, backend="connect-per-call"
+    )
+    assert result["name"] == "empty-poll-connect-per-call"
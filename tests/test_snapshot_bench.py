@@ -0,0 +1,22 @@
+from punisher.bench.snapshot import SIZES, legacy_state_hash, make_snapshot, run_suite
+from punisher.crypto.hyperliquid_parser import snapshot_fingerprint
+
+
+def test_bench_snapshot_suite_covers_every_size():
+    report = run_suite(quick=True)
+
+    assert report["suite"] == "snapshot-hash"
+    assert [(r["positions"], r["orders"]) for r in report["results"]] == SIZES
+    for result in report["results"]:
+        assert result["legacy_us"] > 0
+        assert result["fingerprint_us"] > 0
+
+
+def test_bench_snapshots_are_deterministic():
+    snap = make_snapshot(10, 25, seed=3)
+    again = make_snapshot(10, 25, seed=3)
+    args = (snap["summary"], snap["positions"], snap["orders"])
+    again_args = (again["summary"], again["positions"], again["orders"])
+
+    assert legacy_state_hash(*args) == legacy_state_hash(*again_args)
+    assert snapshot_fingerprint(*args) == snapshot_fingerprint(*again_args)
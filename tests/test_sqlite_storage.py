@@ -0,0 +1,201 @@
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from punisher.config import settings
+from punisher.db.sqlite import SQLiteStorage
+
+
+def snapshot(account_value, ts, positions=None):
+    return {
+        "summary": {"account_value": account_value, "total_ntl_pos": 0.0},
+        "positions": [{"coin": "BTC", "size": 1.0}] if positions is None else positions,
+        "orders": [],
+        "ts": ts,
+    }
+
+
+@pytest_asyncio.fixture
+async def storage(tmp_path):
+    storage = SQLiteStorage(tmp_path / "punisher.db")
+    yield storage
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_wallet_snapshots_and_history(storage):
+    first = await storage.save_wallet_snapshot("0xabc", snapshot(100.0, 1))
+    assert await storage.save_wallet_snapshot("0xabc", snapshot(100.0, 2)) == (
+        "updated_timestamp"
+    )
+    await storage.save_wallet_snapshot("0xabc", snapshot(110.0, 3, positions=[]))
+
+    latest = await storage.get_latest_snapshots("0xabc")
+    assert [s["account_value"] for s in latest] == [110.0, 100.0]
+    assert latest[1]["_id"] == first
+    assert latest[1]["snapshot_time_ms"] == 2
+    assert (await storage.get_recent_snapshots(1))[0]["positions"] == []
+
+    now = datetime.utcnow() + timedelta(seconds=1)
+    state = await storage.get_wallet_state_at("0xabc", now)
+    assert state["summary"]["account_value"] == 110.0
+    assert state["positions"] == []
+
+    changes = [c async for c in storage.get_wallet_changes("0xabc", now - timedelta(1))]
+    assert changes[-1]["diff"]["positions"] == {"del": ["BTC"]}
+
+
+@pytest.mark.asyncio
+async def test_market_bars_roll_up(storage):
+    for px in [100.0, 105.0, 95.0, 101.0]:
+        await storage.save_market_mids({"BTC": px, "DOGE": 0.1})
+    await storage.save_trade("BTC", {"usd_val": 60_000.0})
+    storage._rollup_task.cancel()
+
+    # Pin the ticks inside one minute, in insertion order
+    minute = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(hours=1)
+    epoch = (minute - datetime(1970, 1, 1)).total_seconds()
+    await storage._run(
+        lambda db: (
+            db.execute("UPDATE market_prices SET ts = ? + rowid", (epoch,)),
+            db.execute("UPDATE whale_trades SET created_at = ?", (epoch,)),
+        )
+    )
+
+    await storage.rollup_market_bars(minute)
+    await storage.rollup_market_bars(minute)  # idempotent
+
+    for resolution in ["1m", "1h"]:
+        bars = await storage.get_market_bars("BTC", minute, resolution=resolution)
+        assert len(bars) == 1
+        bar = bars[0]
+        assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (
+            100.0,
+            105.0,
+            95.0,
+            101.0,
+        )
+        assert bar["ticks"] == 4
+        assert bar["volume"] == 60_000.0 and bar["trades"] == 1
+    assert (await storage.get_market_bars("BTC", minute))[0]["start"] == minute
+    assert await storage.get_market_bars("SOL", minute) == []
+
+
+@pytest.mark.asyncio
+async def test_wallets_chat_and_agents(storage):
+    page = [{"address": a, "pnl": "+$1M"} for a in ["0xa", "0xb"]]
+    assert await storage.upsert_discovered_wallets(page, "test", 1) == 2
+    assert await storage.upsert_discovered_wallets(page, "test", 1) == 0
+    await storage.set_wallet_status("0xa", "monitoring")
+    await storage.set_wallet_status("0xstatic", "monitoring")
+    assert sorted(await storage.get_target_wallets(["monitoring"])) == [
+        "0xa",
+        "0xstatic",
+    ]
+    assert await storage.count_wallets() == 3
+    recent = await storage.get_recent_wallets(1)
+    assert recent[0]["pnl_str"] == "+$1M"
+    assert isinstance(recent[0]["discovered_at"], datetime)
+
+    await storage.save_chat_message("s1", "user", "hi")
+    await storage.save_chat_message("s1", "assistant", "hello")
+    assert await storage.get_chat_history("s1") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+    await storage.save_agent_config(
+        "satoshi", {"system_prompt": "x", "temperature": 0.1}
+    )
+    await storage.save_agent_config("satoshi", {"system_prompt": "y"})
+    assert await storage.get_agent_config("satoshi") == {
+        "agent_id": "satoshi",
+        "system_prompt": "y",
+        "temperature": 0.1,
+    }
+    await storage.log_task("satoshi", "scrape")
+    tasks = await storage.get_agent_tasks("satoshi")
+    assert tasks[0]["task"] == "scrape"
+
+
+@pytest.mark.asyncio
+async def test_chat_history_is_newest_n_with_paging(storage):
+    for n in range(7):
+        await storage.save_chat_message("s1", "user", str(n))
+
+    history = await storage.get_chat_history("s1", limit=3)
+    assert [m["content"] for m in history] == ["4", "5", "6"]
+
+    page = await storage.get_chat_page("s1", limit=3)
+    assert [m["content"] for m in page["messages"]] == ["4", "5", "6"]
+    page = await storage.get_chat_page("s1", limit=3, before=page["next_cursor"])
+    assert [m["content"] for m in page["messages"]] == ["1", "2", "3"]
+    page = await storage.get_chat_page("s1", limit=3, before=page["next_cursor"])
+    assert [m["content"] for m in page["messages"]] == ["0"]
+    assert page["next_cursor"] is None
+
+    # Hot session: served from the cache, which sees new messages
+    await storage.save_chat_message("s1", "assistant", "7")
+    await storage._run(lambda db: db.execute("DELETE FROM chat_sessions"))
+    history = await storage.get_chat_history("s1", limit=2)
+    assert [m["content"] for m in history] == ["6", "7"]
+
+
+@pytest.mark.asyncio
+async def test_retention_downsamples_archives_and_expires(
+    storage, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", tmp_path / "archive")
+    monkeypatch.setattr(storage, "RETENTION_BATCH", 2)
+    monkeypatch.setattr(storage, "RETENTION_PAUSE", 0)
+    now = time.time()
+    hour = now // 3600 * 3600
+    await storage.save_market_sentiment("BTC", 0.2, "bullish")
+    await storage.save_market_sentiment("BTC", 0.6, "bullish")
+    for i in range(3):
+        await storage.save_chat_message("old", "user", f"m{i}")
+    await storage.save_chat_message("new", "user", "hi")
+    await storage.upsert_discovered_wallets([{"address": "0x1"}], "test")
+    await storage.upsert_discovered_wallets([{"address": "0x2"}], "test")
+    await storage.set_wallet_status("0x2", "monitoring")
+
+    def age(db):
+        db.execute("UPDATE market_sentiment SET created_at = ?", (hour + 1,))
+        db.execute(
+            "UPDATE chat_sessions SET timestamp = ? WHERE session_id = 'old'",
+            (now - 200 * 86400,),
+        )
+        db.execute("UPDATE tracked_wallets SET discovered_at = ?", (now - 100 * 86400,))
+
+    await storage._run(age)
+    expired = await storage.apply_retention()
+    assert expired["chat_sessions"] == 3
+    assert expired["tracked_wallets"] == 1
+
+    hourly = await storage._run(
+        lambda db: [
+            dict(r) for r in db.execute("SELECT * FROM market_sentiment_hourly")
+        ]
+    )
+    assert hourly == [
+        {
+            "coin": "BTC",
+            "start": hour,
+            "imbalance_avg": pytest.approx(0.4),
+            "imbalance_min": 0.2,
+            "imbalance_max": 0.6,
+            "samples": 2,
+        }
+    ]
+    # Archived chat is gzipped JSON lines, one member per batch
+    (archive,) = (tmp_path / "archive").iterdir()
+    with gzip.open(archive, "rt") as f:
+        archived = [json.loads(line) for line in f]
+    assert [m["content"] for m in archived] == ["m0", "m1", "m2"]
+    assert await storage.get_chat_history("old") == []
+    assert [m["content"] for m in await storage.get_chat_history("new")] == ["hi"]
+    assert await storage.get_target_wallets(["discovered", "monitoring"]) == ["0x2"]